@@ -160,7 +160,7 @@ class AdvancedHybridAI:
         """
         Advanced task classification using AI analysis
         """
-        logger.info(f"🔍 Advanced Task Classification: {user_input[:50]}...")
+        logger.debug("🔍 Advanced Task Classification: %.50s...", user_input)
         
         # Use Groq for quick classification analysis
         classification_prompt = f"""Analyze this user message and classify it across multiple dimensions. Return ONLY a JSON object.
@@ -630,8 +630,8 @@ Check LinkedIn notifications: {{"intent": "check_linkedin_notifications", "accou
 Check Gmail inbox: {{"intent": "check_gmail_inbox", "user_email": "brainlyarpit8649@gmail.com", "include_unread_only": false}}
 Check Gmail unread: {{"intent": "check_gmail_unread", "user_email": "brainlyarpit8649@gmail.com"}}
 Email inbox check: {{"intent": "email_inbox_check", "user_email": "brainlyarpit8649@gmail.com", "check_type": "unread"}}
-Scrape price: {{"intent": "scrape_price", "product": "product name", "platform": "amazon/flipkart/ebay", "search_query": "search terms"}}
-Scrape product listings: {{"intent": "scrape_product_listings", "category": "category", "platform": "website", "filters": {{"price_range": "range", "brand": "brand"}}}}
+Scrape price: {{"intent": "scrape_price", "product": "product name", "platform": "amazon/flipkart/ebay", "search_query": "search terms", "url": "product page URL if the user gave one"}}
+Scrape product listings: {{"intent": "scrape_product_listings", "category": "category", "platform": "website", "filters": {{"price_range": "range", "brand": "brand"}}, "url": "listing page URL if the user gave one"}}
 LinkedIn job alerts: {{"intent": "linkedin_job_alerts", "job_title": "title", "location": "location"}}
 Check website updates: {{"intent": "check_website_updates", "website": "website_name", "section": "section to monitor"}}
 Monitor competitors: {{"intent": "monitor_competitors", "company": "company_name", "data_type": "pricing/products/news"}}
@@ -663,7 +663,7 @@ Return ONLY the JSON object."""
         """
         Main processing function with advanced routing
         """
-        logger.info(f"🚀 Advanced Hybrid Processing: {user_input[:50]}...")
+        logger.debug("🚀 Advanced Hybrid Processing: %.50s...", user_input)
         
         # Step 1: Advanced task classification
         classification = await self.analyze_task_classification(user_input, session_id)
@@ -674,8 +674,8 @@ Return ONLY the JSON object."""
         # Step 3: Update conversation history
         self._update_conversation_history(session_id, user_input, classification)
         
-        logger.info(f"🧠 Classification: {classification.primary_intent} | Routing: {routing_decision.primary_model.value} | Confidence: {routing_decision.confidence:.2f}")
-        logger.info(f"💡 Reasoning: {routing_decision.reasoning}")
+        logger.info("🧠 Classification: %s | Routing: %s | Confidence: %.2f", classification.primary_intent, routing_decision.primary_model.value, routing_decision.confidence)
+        logger.debug("💡 Reasoning: %s", routing_decision.reasoning)
         
         # Step 4: Execute routing decision
         try:
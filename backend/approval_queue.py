@@ -0,0 +1,234 @@
+import os
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from job_queue import MongoJobQueue
+from webhook_handler import build_webhook_payload, deliver_webhook, N8N_BATCH_MODE, N8N_BATCH_MAX_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Errors from send_to_n8n that are worth another attempt
+TRANSIENT_WEBHOOK_ERRORS = {"timeout", "unexpected_error", "exception"}
+
+# Message approval states during which a new approval must not enqueue again
+IN_FLIGHT_STATUSES = ["queued", "processing", "retrying"]
+
+class ApprovalQueue(MongoJobQueue):
+    """
+    Transactional outbox of approved actions waiting to be delivered to n8n.
+    /api/approve records the approval and writes the outbox entry together;
+    background workers deliver entries at least once, sending a stable
+    idempotency key, and write the outcome back to the originating
+    chat_messages record in the same transaction that closes the entry.
+    """
+
+    def __init__(self, db):
+        # In batch mode enough jobs must be in flight at once to fill a batch
+        default_concurrency = max(8, N8N_BATCH_MAX_SIZE) if N8N_BATCH_MODE else 8
+        super().__init__(
+            db.webhook_outbox,
+            name="approval",
+            concurrency=int(os.getenv("APPROVAL_WORKER_CONCURRENCY", str(default_concurrency))),
+            max_attempts=int(os.getenv("APPROVAL_MAX_ATTEMPTS", "5")),
+            backoff_base=float(os.getenv("APPROVAL_BACKOFF_BASE_SECONDS", "2")),
+            backoff_max=float(os.getenv("APPROVAL_BACKOFF_MAX_SECONDS", "300")),
+            visibility_timeout=float(os.getenv("APPROVAL_LEASE_SECONDS", "120")),
+            transactional=os.getenv("APPROVAL_USE_TRANSACTIONS", "true").lower() == "true"
+        )
+        self.db = db
+
+    async def ensure_indexes(self):
+        await super().ensure_indexes()
+        await self.collection.create_index("message_id")
+        await self.db.chat_messages.create_index([("approval_status", 1), ("approval_queued_at", 1)])
+
+    async def enqueue_approval(self, message: Dict[str, Any], final_data: dict, edited_data: Optional[dict] = None) -> Dict[str, Any]:
+        """
+        Record an approval and write its outbox entry.
+
+        Returns the entry for this message; if a delivery is already queued or
+        running for it, that entry is returned instead of creating a duplicate.
+        """
+        job_id = str(uuid.uuid4())
+        # Frozen at approval time so every replay sends identical data
+        payload = build_webhook_payload(final_data, message["user_id"], message["session_id"], message["id"])
+
+        async def writes(session):
+            # Atomic state transition so a double click cannot enqueue twice
+            updated = await self.db.chat_messages.find_one_and_update(
+                {"id": message["id"], "approval_status": {"$nin": IN_FLIGHT_STATUSES}},
+                {"$set": {
+                    "approved": True,
+                    "edited_data": edited_data,
+                    "approval_status": "queued",
+                    "approval_job_id": job_id,
+                    "approval_queued_at": datetime.utcnow()
+                }},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if updated is None:
+                return None
+
+            return await self.enqueue(
+                {"webhook_data": payload},
+                job_id=job_id,
+                session=session,
+                idempotency_key=job_id,
+                message_id=message["id"],
+                user_id=message["user_id"],
+                session_id=message["session_id"]
+            )
+
+        job = await self.run_atomically(writes)
+        # The in-transaction wakeup may fire before commit, so wake workers again
+        self.notify()
+        if job is None:
+            current = await self.db.chat_messages.find_one({"id": message["id"]})
+            logger.info(f"Approval for message {message['id']} already in flight")
+            return await self.get_job(current.get("approval_job_id")) if current else None
+
+        return job
+
+    async def reconcile_orphans(self, older_than_seconds: float = 60.0) -> int:
+        """
+        Recreate outbox entries for approvals that were recorded without one.
+        Only possible when transactions are unavailable and the process died
+        between the two writes; returns the number of entries recreated.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=older_than_seconds)
+        recreated = 0
+
+        cursor = self.db.chat_messages.find({
+            "approval_status": {"$in": IN_FLIGHT_STATUSES},
+            "approval_queued_at": {"$lte": cutoff}
+        })
+        async for message in cursor:
+            job_id = message.get("approval_job_id")
+            if job_id and await self.get_job(job_id):
+                continue
+
+            job_id = job_id or str(uuid.uuid4())
+            final_data = message.get("edited_data") or message.get("intent_data") or {}
+            payload = build_webhook_payload(final_data, message["user_id"], message["session_id"], message["id"])
+            try:
+                await self.enqueue(
+                    {"webhook_data": payload},
+                    job_id=job_id,
+                    idempotency_key=job_id,
+                    message_id=message["id"],
+                    user_id=message["user_id"],
+                    session_id=message["session_id"]
+                )
+            except DuplicateKeyError:
+                # Another replica recreated it between our lookup and insert
+                continue
+            await self.db.chat_messages.update_one(
+                {"id": message["id"]},
+                {"$set": {"approval_job_id": job_id, "approval_status": "queued"}}
+            )
+            recreated += 1
+
+        if recreated:
+            logger.warning(f"Recreated {recreated} missing outbox entries")
+        return recreated
+
+    async def migrate_legacy_jobs(self) -> int:
+        """
+        Move undelivered jobs from approval_jobs, where approvals were queued
+        before the outbox, into webhook_outbox. Each keeps its id and attempt
+        count and gets the payload and idempotency key outbox entries carry;
+        returns the number of jobs moved.
+        """
+        legacy = self.db.approval_jobs
+        now = datetime.utcnow()
+        moved = 0
+
+        async for job in legacy.find({"status": {"$in": ["pending", "processing"]}}):
+            job.pop("_id", None)
+            intent_data = (job.get("payload") or {}).get("intent_data") or {}
+            entry = {
+                **job,
+                "payload": {"webhook_data": build_webhook_payload(intent_data, job["user_id"], job["session_id"], job["message_id"])},
+                "idempotency_key": job["id"],
+                "status": "pending",
+                # A job an old worker still holds becomes due when that lease runs out
+                "next_attempt_at": max(now, job.get("locked_until") or now),
+                "locked_until": None,
+                "worker_id": None,
+                "updated_at": now
+            }
+            try:
+                await self.collection.insert_one(entry)
+            except DuplicateKeyError:
+                pass  # already moved by another replica
+            await legacy.delete_one({"id": job["id"]})
+            moved += 1
+
+        if moved:
+            self.notify()
+            logger.warning(f"Moved {moved} undelivered approval jobs from approval_jobs to the outbox")
+        return moved
+
+    async def get_status(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """Delivery status for a message's latest approval"""
+        message = await self.db.chat_messages.find_one({"id": message_id})
+        if not message:
+            return None
+
+        job = None
+        if message.get("approval_job_id"):
+            job = await self.get_job(message["approval_job_id"])
+
+        return {
+            "message_id": message_id,
+            "approved": message.get("approved"),
+            "status": job["status"] if job else message.get("approval_status"),
+            "job_id": job["id"] if job else None,
+            "attempts": job["attempts"] if job else 0,
+            "next_attempt_at": job.get("next_attempt_at") if job and job["status"] == "pending" else None,
+            "last_error": job.get("last_error") if job else None,
+            "n8n_response": message.get("n8n_response")
+        }
+
+    async def process(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        await self.db.chat_messages.update_one(
+            {"id": job["message_id"], "approval_job_id": job["id"]},
+            {"$set": {"approval_status": "processing"}}
+        )
+        return await deliver_webhook(job["payload"]["webhook_data"], idempotency_key=job["idempotency_key"])
+
+    def is_transient_failure(self, result: Dict[str, Any]) -> bool:
+        if result.get("error") in TRANSIENT_WEBHOOK_ERRORS:
+            return True
+        status_code = result.get("status_code") or 0
+        return result.get("error") == "http_error" and (status_code >= 500 or status_code == 429)
+
+    async def on_finished(self, job: Dict[str, Any], status: str, result: Dict[str, Any], session=None):
+        approval_status = {"completed": "delivered", "pending": "retrying"}.get(status, status)
+        update = {"approval_status": approval_status, "n8n_response": result}
+        if status != "pending":
+            update["delivered_at" if status == "completed" else "failed_at"] = datetime.utcnow()
+
+        await self.db.chat_messages.update_one(
+            {"id": job["message_id"], "approval_job_id": job["id"]},
+            {"$set": update},
+            session=session
+        )
+        logger.info(f"Approval job {job['id']} for message {job['message_id']}: {approval_status} (attempt {job['attempts']})")
+
+    async def start(self):
+        await super().start()
+        try:
+            await self.migrate_legacy_jobs()
+        except Exception as e:
+            logger.error(f"Approval job migration failed: {e}")
+        try:
+            await self.reconcile_orphans()
+        except Exception as e:
+            logger.error(f"Outbox reconciliation failed: {e}")
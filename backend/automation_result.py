@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+@dataclass
+class AutomationResult:
+    """Result object for automation tasks"""
+    success: bool
+    data: Dict[str, Any]
+    message: str
+    execution_time: float
+    screenshots: List[str] = None
+    errors: List[str] = None
+    engine: str = "browser"  # "http" when ScrapeEngine answered without rendering
+    cached: bool = False
+    cache_age: Optional[float] = None  # seconds since the cached data was fetched or revalidated
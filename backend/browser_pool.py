@@ -0,0 +1,350 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Pool settings from environment
+BROWSER_POOL_MAX_PAGES = int(os.getenv("BROWSER_POOL_MAX_PAGES", "8"))
+BROWSER_POOL_WARM_PAGES = int(os.getenv("BROWSER_POOL_WARM_PAGES", "2"))
+BROWSER_POOL_MAX_IDLE_PAGES = int(os.getenv("BROWSER_POOL_MAX_IDLE_PAGES", "8"))
+BROWSER_POOL_PAGE_MAX_USES = int(os.getenv("BROWSER_POOL_PAGE_MAX_USES", "20"))
+BROWSER_POOL_CONTEXT_MAX_USES = int(os.getenv("BROWSER_POOL_CONTEXT_MAX_USES", "200"))
+BROWSER_POOL_MAX_CONTEXTS = int(os.getenv("BROWSER_POOL_MAX_CONTEXTS", "16"))
+BROWSER_POOL_ACQUIRE_TIMEOUT = float(os.getenv("BROWSER_POOL_ACQUIRE_TIMEOUT_SECONDS", "60"))
+
+SHARED_TENANT = "_shared"
+
+class PooledPage:
+    """A page plus the bookkeeping the pool needs to decide when to recycle it"""
+
+    def __init__(self, page, tenant: str):
+        self.page = page
+        self.tenant = tenant
+        self.uses = 0
+        self.broken = False
+
+class TenantContext:
+    """One BrowserContext per tenant, so cookies and storage never cross sessions"""
+
+    def __init__(self, context, tenant: str):
+        self.context = context
+        self.tenant = tenant
+        self.idle: List[PooledPage] = []
+        self.in_use = 0
+        self.uses = 0
+        self.retiring = False
+        self.closed = False
+
+class PagePool:
+    """
+    Bounded pool of pre-warmed Playwright pages.
+
+    At most max_pages pages are handed out at once; further callers wait in
+    FIFO order. Pages live in per-tenant contexts and are reused for the same
+    tenant (navigated to about:blank between uses), then closed after
+    page_max_uses uses. Contexts are retired after context_max_uses uses, and
+    the least recently used idle context is closed when there are more than
+    max_contexts. Contexts for which is_stale returns True (their browser
+    was recycled or crashed) are replaced on next use and closed once idle.
+
+    warm() opens spare contexts, each with one page, that no tenant has used
+    yet; a tenant seen for the first time takes one over instead of paying
+    for a new context and page, and the spares are topped up in the
+    background. At most max_idle_pages idle pages are kept across all
+    tenants and spares.
+    """
+
+    def __init__(
+        self,
+        new_context: Callable[[], Awaitable[Any]],
+        prepare_page: Callable[[Any], Awaitable[None]],
+        max_pages: int = None,
+        page_max_uses: int = None,
+        context_max_uses: int = None,
+        max_contexts: int = None,
+        max_idle_pages: int = None,
+        is_stale: Optional[Callable[[Any], bool]] = None
+    ):
+        self._new_context = new_context
+        self._prepare_page = prepare_page
+        self._is_stale = is_stale or (lambda context: False)
+        self.max_pages = max_pages or BROWSER_POOL_MAX_PAGES
+        self.page_max_uses = page_max_uses or BROWSER_POOL_PAGE_MAX_USES
+        self.context_max_uses = context_max_uses or BROWSER_POOL_CONTEXT_MAX_USES
+        self.max_contexts = max_contexts or BROWSER_POOL_MAX_CONTEXTS
+        self.max_idle_pages = max_idle_pages if max_idle_pages is not None else BROWSER_POOL_MAX_IDLE_PAGES
+
+        self._contexts: "OrderedDict[str, TenantContext]" = OrderedDict()
+        self._spares: List[TenantContext] = []
+        self._spare_target = 0
+        self._top_up_task: Optional[asyncio.Task] = None
+        self._context_lock = asyncio.Lock()
+        self._permits = self.max_pages
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.metrics = {
+            "acquired": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "pages_created": 0,
+            "pages_reused": 0,
+            "pages_recycled": 0,
+            "contexts_created": 0,
+            "contexts_closed": 0,
+            "spares_adopted": 0,
+            "idle_pages_evicted": 0
+        }
+
+    # FIFO permits: asyncio.Semaphore does not guarantee arrival order on every Python version
+
+    async def _acquire_permit(self):
+        if self._permits > 0 and not self._waiters:
+            self._permits -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif not waiter.cancelled():
+                # Permit was handed to us just as we gave up; pass it on
+                self._release_permit()
+            raise
+
+    def _release_permit(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._permits += 1
+
+    async def _tenant_context(self, tenant: str) -> TenantContext:
+        async with self._context_lock:
+            holder = self._contexts.get(tenant)
+            if holder is not None and not holder.retiring and not self._is_stale(holder.context):
+                self._contexts.move_to_end(tenant)
+                return holder
+            if holder is not None:
+                await self._retire(holder)
+
+            holder = await self._take_spare(tenant)
+            if holder is None:
+                if len(self._contexts) + len(self._spares) >= self.max_contexts:
+                    await self._evict_idle_context()
+                holder = TenantContext(await self._new_context(), tenant)
+                self.metrics["contexts_created"] += 1
+            self._contexts[tenant] = holder
+            return holder
+
+    async def _take_spare(self, tenant: str) -> Optional[TenantContext]:
+        while self._spares:
+            holder = self._spares.pop(0)
+            if self._is_stale(holder.context):
+                await self._close_context(holder)
+                continue
+            holder.tenant = tenant
+            for pooled in holder.idle:
+                pooled.tenant = tenant
+            self.metrics["spares_adopted"] += 1
+            self._schedule_top_up()
+            return holder
+        return None
+
+    def _schedule_top_up(self):
+        if self._top_up_task is None or self._top_up_task.done():
+            self._top_up_task = asyncio.get_running_loop().create_task(self._top_up_spares())
+
+    async def _top_up_spares(self):
+        try:
+            while len(self._spares) < self._spare_target:
+                async with self._context_lock:
+                    if len(self._contexts) + len(self._spares) >= self.max_contexts:
+                        return
+                    if self._idle_page_count() >= self.max_idle_pages:
+                        return
+                    holder = TenantContext(await self._new_context(), SHARED_TENANT)
+                    self.metrics["contexts_created"] += 1
+                    holder.idle.append(await self._new_page(holder))
+                    self._spares.append(holder)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not open a spare browser context: {e}")
+
+    async def _retire(self, holder: TenantContext):
+        """Stop handing out holder; it is closed now if idle, else when its last page returns"""
+        holder.retiring = True
+        if self._contexts.get(holder.tenant) is holder:
+            del self._contexts[holder.tenant]
+        if holder.in_use == 0:
+            await self._close_context(holder)
+
+    async def retire_stale(self):
+        """Called after a browser restart: drop every context that belongs to the old browser"""
+        async with self._context_lock:
+            for holder in list(self._contexts.values()):
+                if self._is_stale(holder.context):
+                    await self._retire(holder)
+            stale_spares = [holder for holder in self._spares if self._is_stale(holder.context)]
+            self._spares = [holder for holder in self._spares if holder not in stale_spares]
+            for holder in stale_spares:
+                await self._close_context(holder)
+        if stale_spares:
+            self._schedule_top_up()
+
+    async def _evict_idle_context(self):
+        for tenant, holder in list(self._contexts.items()):
+            if holder.in_use == 0:
+                del self._contexts[tenant]
+                await self._close_context(holder)
+                return
+
+    async def _close_context(self, holder: TenantContext):
+        if holder.closed:
+            return
+        holder.closed = True
+        self.metrics["contexts_closed"] += 1
+        try:
+            await holder.context.close()
+        except Exception as e:
+            logger.debug("Closing browser context for %s failed: %s", holder.tenant, e)
+
+    async def _new_page(self, holder: TenantContext) -> PooledPage:
+        page = await holder.context.new_page()
+        await self._prepare_page(page)
+        self.metrics["pages_created"] += 1
+        return PooledPage(page, holder.tenant)
+
+    @asynccontextmanager
+    async def page(self, tenant: Optional[str] = None):
+        """Borrow a page for tenant; the page goes back to the pool (or is closed) on exit"""
+        tenant = tenant or SHARED_TENANT
+        queued_at = time.monotonic()
+        await asyncio.wait_for(self._acquire_permit(), timeout=BROWSER_POOL_ACQUIRE_TIMEOUT)
+        waited = time.monotonic() - queued_at
+        self.metrics["acquired"] += 1
+        self.metrics["wait_seconds_total"] += waited
+        self.metrics["wait_seconds_max"] = max(self.metrics["wait_seconds_max"], waited)
+
+        holder = None
+        pooled = None
+        try:
+            holder = await self._tenant_context(tenant)
+            holder.in_use += 1
+            holder.uses += 1
+            if holder.idle:
+                pooled = holder.idle.pop()
+                self.metrics["pages_reused"] += 1
+            else:
+                pooled = await self._new_page(holder)
+
+            try:
+                yield pooled.page
+            except BaseException:
+                pooled.broken = True
+                raise
+        finally:
+            try:
+                if pooled is not None:
+                    await self._return_page(holder, pooled)
+                if holder is not None:
+                    holder.in_use -= 1
+                    await self._maybe_retire(holder)
+            finally:
+                self._release_permit()
+
+    async def _return_page(self, holder: TenantContext, pooled: PooledPage):
+        pooled.uses += 1
+        reusable = (
+            not pooled.broken
+            and not holder.retiring
+            and pooled.uses < self.page_max_uses
+            and not pooled.page.is_closed()
+        )
+        if reusable:
+            try:
+                # Drop the previous document (and its timers and sockets) before the next borrower
+                await pooled.page.goto("about:blank")
+                if await self._make_idle_room(holder):
+                    holder.idle.append(pooled)
+                    return
+            except Exception:
+                pass
+        self.metrics["pages_recycled"] += 1
+        try:
+            await pooled.page.close()
+        except Exception:
+            pass
+
+    def _idle_page_count(self) -> int:
+        return (
+            sum(len(holder.idle) for holder in self._contexts.values())
+            + sum(len(holder.idle) for holder in self._spares)
+        )
+
+    async def _make_idle_room(self, keep_for: TenantContext) -> bool:
+        """Close the least recently used tenant's idle page when the global idle cap is reached"""
+        if self._idle_page_count() < self.max_idle_pages:
+            return True
+        for holder in self._contexts.values():
+            if holder is not keep_for and holder.idle:
+                evicted = holder.idle.pop(0)
+                self.metrics["idle_pages_evicted"] += 1
+                try:
+                    await evicted.page.close()
+                except Exception:
+                    pass
+                return True
+        return False
+
+    async def _maybe_retire(self, holder: TenantContext):
+        if holder.uses >= self.context_max_uses:
+            holder.retiring = True
+        if holder.retiring and holder.in_use == 0 and not holder.closed:
+            async with self._context_lock:
+                if self._contexts.get(holder.tenant) is holder:
+                    del self._contexts[holder.tenant]
+            await self._close_context(holder)
+
+    async def warm(self, pages: int = None):
+        """Open spare contexts, one page each, for the next tenants that show up"""
+        self._spare_target = min(
+            pages if pages is not None else BROWSER_POOL_WARM_PAGES,
+            self.max_pages,
+            self.max_idle_pages
+        )
+        await self._top_up_spares()
+
+    async def close(self):
+        if self._top_up_task is not None and not self._top_up_task.done():
+            self._top_up_task.cancel()
+            try:
+                await self._top_up_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        async with self._context_lock:
+            holders = list(self._contexts.values()) + self._spares
+            self._contexts.clear()
+            self._spares = []
+            self._spare_target = 0
+        for holder in holders:
+            await self._close_context(holder)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        acquired = self.metrics["acquired"]
+        return {
+            **self.metrics,
+            "max_pages": self.max_pages,
+            "in_use": sum(holder.in_use for holder in self._contexts.values()),
+            "waiting": sum(1 for waiter in self._waiters if not waiter.done()),
+            "max_idle_pages": self.max_idle_pages,
+            "idle_pages": self._idle_page_count(),
+            "contexts": len(self._contexts),
+            "spare_contexts": len(self._spares),
+            "wait_seconds_avg": self.metrics["wait_seconds_total"] / acquired if acquired else 0.0
+        }
@@ -0,0 +1,271 @@
+import os
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Supervisor settings from environment
+BROWSER_HEALTH_INTERVAL = float(os.getenv("BROWSER_HEALTH_INTERVAL_SECONDS", "15"))
+BROWSER_RECYCLE_AFTER_PAGES = int(os.getenv("BROWSER_RECYCLE_AFTER_PAGES", "500"))
+BROWSER_RECYCLE_RSS_MB = float(os.getenv("BROWSER_RECYCLE_RSS_MB", "1500"))
+# A recycled browser is closed once its last context is, or after this long regardless
+BROWSER_DRAIN_TIMEOUT = float(os.getenv("BROWSER_DRAIN_TIMEOUT_SECONDS", "120"))
+
+def _children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        return []
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def browser_rss_mb(root_pid: int = None) -> Optional[float]:
+    """
+    Resident memory of every process below root_pid (the Playwright driver
+    and the Chromium processes it launched), from /proc. None where /proc
+    is not available.
+    """
+    root_pid = root_pid or os.getpid()
+    if not os.path.exists(f"/proc/{root_pid}/status"):
+        return None
+    total_kb = 0
+    pending = _children(root_pid)
+    while pending:
+        pid = pending.pop()
+        total_kb += _rss_kb(pid)
+        pending.extend(_children(pid))
+    return total_kb / 1024
+
+class BrowserGeneration:
+    """One launched browser; a relaunch or recycle starts the next generation"""
+
+    def __init__(self, browser, number: int):
+        self.browser = browser
+        self.number = number
+        self.pages_opened = 0
+        self.launched_at = time.time()
+        self.draining_since: Optional[float] = None
+
+class BrowserSupervisor:
+    """
+    Owns the Playwright driver and the browser process.
+
+    get_browser() always returns a connected browser, launching one when
+    there is none or the last one crashed (its "disconnected" event or a
+    failed health check). A healthy browser is recycled after
+    BROWSER_RECYCLE_AFTER_PAGES pages or when the browser processes exceed
+    BROWSER_RECYCLE_RSS_MB: new work goes to a fresh generation while the
+    old browser keeps serving pages already handed out, and is closed once
+    its last context is gone (or after BROWSER_DRAIN_TIMEOUT).
+
+    on_generation_change runs after every relaunch or recycle so the
+    page pool can retire contexts that belong to the old browser.
+    """
+
+    def __init__(
+        self,
+        launch: Callable[[Any], Awaitable[Any]],
+        start_driver: Callable[[], Awaitable[Any]],
+        on_generation_change: Optional[Callable[[], Awaitable[None]]] = None
+    ):
+        self._launch_browser = launch
+        self._start_driver = start_driver
+        self.on_generation_change = on_generation_change
+        self.playwright = None
+        self.current: Optional[BrowserGeneration] = None
+        self.draining: List[BrowserGeneration] = []
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._monitor_task: Optional[asyncio.Task] = None
+        self.restarts = defaultdict(int)
+        self.metrics = {"launches": 0, "launch_failures": 0, "last_restart_at": None, "last_restart_reason": None, "rss_mb": None}
+
+    async def get_browser(self):
+        generation = self.current
+        if generation is not None and generation.browser.is_connected():
+            return generation.browser
+        async with self._lock:
+            if self.current is not None and self.current.browser.is_connected():
+                return self.current.browser
+            relaunch = self._generation > 0
+            if self.current is not None:
+                self._retire_current("crash")
+            await self._launch()
+            browser = self.current.browser
+        if relaunch:
+            # Callers may hold the pool's lock while asking for a browser, so do not wait on it here
+            asyncio.get_running_loop().create_task(self._generation_changed())
+        return browser
+
+    async def _launch(self):
+        if self.playwright is None:
+            self.playwright = await self._start_driver()
+        try:
+            browser = await self._launch_browser(self.playwright)
+        except Exception as e:
+            # The driver itself may be gone; start it again and retry once
+            self.metrics["launch_failures"] += 1
+            logger.warning(f"⚠️ Browser launch failed ({e}), restarting the Playwright driver")
+            await self._stop_driver()
+            self.playwright = await self._start_driver()
+            browser = await self._launch_browser(self.playwright)
+
+        self._generation += 1
+        generation = BrowserGeneration(browser, self._generation)
+        browser.on("disconnected", lambda _: self._on_disconnected(generation))
+        self.current = generation
+        self.metrics["launches"] += 1
+        logger.info(f"🚀 Browser generation {generation.number} launched")
+
+    def _on_disconnected(self, generation: BrowserGeneration):
+        if generation is self.current:
+            logger.error(f"💥 Browser generation {generation.number} disconnected; relaunching on next use")
+            self._retire_current("crash")
+            asyncio.get_running_loop().create_task(self._generation_changed())
+        elif generation in self.draining:
+            self.draining.remove(generation)
+
+    def _retire_current(self, reason: str):
+        generation, self.current = self.current, None
+        self.restarts[reason] += 1
+        self.metrics["last_restart_at"] = time.time()
+        self.metrics["last_restart_reason"] = reason
+        if generation is not None and generation.browser.is_connected():
+            generation.draining_since = time.time()
+            self.draining.append(generation)
+
+    async def _generation_changed(self):
+        if self.on_generation_change is not None:
+            try:
+                await self.on_generation_change()
+            except Exception as e:
+                logger.warning(f"⚠️ Retiring contexts after a browser restart failed: {e}")
+
+    async def recycle(self, reason: str):
+        """Send new work to a fresh browser; the current one drains and closes"""
+        async with self._lock:
+            if self.current is None:
+                return
+            logger.info(f"♻️ Recycling browser generation {self.current.number} ({reason})")
+            self._retire_current(reason)
+            await self._launch()
+        await self._generation_changed()
+        await self.reap()
+
+    def is_current(self, browser) -> bool:
+        return self.current is not None and self.current.browser is browser
+
+    def page_opened(self, browser):
+        """Count a new page; recycles the browser after BROWSER_RECYCLE_AFTER_PAGES"""
+        generation = self.current
+        if generation is None or generation.browser is not browser:
+            return
+        generation.pages_opened += 1
+        if generation.pages_opened == BROWSER_RECYCLE_AFTER_PAGES:
+            asyncio.get_running_loop().create_task(self.recycle("pages"))
+
+    async def reap(self):
+        """Close drained browsers: no contexts left, or past the drain timeout"""
+        now = time.time()
+        for generation in list(self.draining):
+            browser = generation.browser
+            if browser.is_connected() and browser.contexts and now - generation.draining_since < BROWSER_DRAIN_TIMEOUT:
+                continue
+            self.draining.remove(generation)
+            try:
+                await browser.close()
+                logger.info(f"🧹 Closed drained browser generation {generation.number}")
+            except Exception as e:
+                logger.debug("Closing browser generation %s failed: %s", generation.number, e)
+
+    async def check_health(self):
+        generation = self.current
+        if generation is None:
+            return
+        try:
+            if not generation.browser.is_connected():
+                raise RuntimeError("browser disconnected")
+            # A hung browser still looks connected; opening a context proves it answers
+            probe = await asyncio.wait_for(generation.browser.new_context(), timeout=10)
+            await probe.close()
+        except Exception as e:
+            logger.error(f"💥 Browser health check failed: {e}")
+            async with self._lock:
+                if self.current is generation:
+                    self._retire_current("health_check")
+                    if generation in self.draining:
+                        # Unresponsive browsers are not worth draining
+                        self.draining.remove(generation)
+                        asyncio.get_running_loop().create_task(self._close_quietly(generation))
+            await self._generation_changed()
+            return
+
+        rss = await asyncio.to_thread(browser_rss_mb)
+        self.metrics["rss_mb"] = round(rss, 1) if rss is not None else None
+        if rss is not None and rss > BROWSER_RECYCLE_RSS_MB and not self.draining:
+            await self.recycle("memory")
+
+    async def _close_quietly(self, generation: BrowserGeneration):
+        try:
+            await asyncio.wait_for(generation.browser.close(), timeout=10)
+        except Exception:
+            pass
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(BROWSER_HEALTH_INTERVAL)
+            try:
+                await self.check_health()
+                await self.reap()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Browser supervisor check failed: {e}")
+
+    def start(self):
+        if self._monitor_task is None:
+            self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def _stop_driver(self):
+        if self.playwright is not None:
+            try:
+                await self.playwright.stop()
+            except Exception:
+                pass
+            self.playwright = None
+
+    async def stop(self):
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+        generations = self.draining + ([self.current] if self.current else [])
+        self.current, self.draining = None, []
+        for generation in generations:
+            await self._close_quietly(generation)
+        await self._stop_driver()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        current = self.current
+        return {
+            **self.metrics,
+            "generation": current.number if current else None,
+            "connected": bool(current and current.browser.is_connected()),
+            "pages_this_generation": current.pages_opened if current else 0,
+            "uptime_seconds": round(time.time() - current.launched_at) if current else 0,
+            "draining": len(self.draining),
+            "restarts": dict(self.restarts),
+            "recycle_after_pages": BROWSER_RECYCLE_AFTER_PAGES,
+            "recycle_rss_mb": BROWSER_RECYCLE_RSS_MB
+        }
@@ -1,11 +1,42 @@
+import os
+import json
 import asyncio
 import logging
 from typing import Dict, Any, Optional
+from urllib.parse import quote_plus
 from datetime import datetime
 from playwright_service import playwright_service
+from structured_data import StructuredDataExtractor, format_price
 
 logger = logging.getLogger(__name__)
 
+# Scrape real product pages for scrape_price / scrape_product_listings; when off, price checks
+# are refused and product listings keep returning demo data
+PRODUCT_SCRAPING_LIVE = os.getenv("PRODUCT_SCRAPING_LIVE", "false").lower() == "true"
+
+def _load_search_urls() -> Dict[str, str]:
+    """PRODUCT_SEARCH_URLS as a platform -> URL template map; a malformed value is ignored"""
+    raw = os.getenv("PRODUCT_SEARCH_URLS", "").strip()
+    if not raw:
+        return {}
+    try:
+        templates = json.loads(raw)
+    except ValueError as e:
+        logger.warning(f"⚠️ PRODUCT_SEARCH_URLS is not valid JSON, ignoring it: {e}")
+        return {}
+    if not isinstance(templates, dict):
+        logger.warning("⚠️ PRODUCT_SEARCH_URLS must be a JSON object of platform to URL template, ignoring it")
+        return {}
+    return {str(platform).lower(): template for platform, template in templates.items() if isinstance(template, str) and "{query}" in template}
+
+# Prices are read from a product page's structured data, which search result pages
+# on the big marketplaces (Amazon, Flipkart, eBay) do not carry, so intents need a
+# product URL. Only for sites whose search pages do embed product data can a
+# platform -> template map be set here, e.g. {"shop": "https://shop.example/search?q={query}"};
+# {query} is URL-encoded.
+PRODUCT_SEARCH_URLS = _load_search_urls()
+PRODUCT_RESULTS_LIMIT = int(os.getenv("PRODUCT_RESULTS_LIMIT", "5"))
+
 class DirectAutomationHandler:
     """
     Handler for direct automation intents that bypass AI response generation
@@ -13,6 +44,8 @@ class DirectAutomationHandler:
     """
     
     def __init__(self):
+        # server.py swaps in an extractor that shares its ScrapeEngine (workers and cache)
+        self.product_extractor: Optional[StructuredDataExtractor] = None
         self.automation_templates = {
             "check_linkedin_notifications": {
                 "success_template": "🔔 **LinkedIn Notifications** ({count} new)\n{notifications}",
@@ -35,6 +68,11 @@ class DirectAutomationHandler:
                 "automation_type": "gmail_automation"
             },
 
+            "scrape_price": {
+                "success_template": "💰 **Price Check: {product}**\n{offers}",
+                "error_template": "❌ Unable to find prices: {error}",
+                "automation_type": "data_extraction"
+            },
             "scrape_product_listings": {
                 "success_template": "🛒 **Product Listings** ({count} found)\n{listings}",
                 "error_template": "❌ Unable to scrape product listings: {error}",
@@ -84,7 +122,7 @@ class DirectAutomationHandler:
                 "data": {}
             }
         
-        logger.info(f"🤖 Processing direct automation: {intent} for session: {session_id}")
+        logger.info("🤖 Processing direct automation: %s for session: %s", intent, session_id)
         start_time = datetime.now()
         
         try:
@@ -97,7 +135,7 @@ class DirectAutomationHandler:
                 result = await self._handle_gmail_automation(intent, intent_data, session_id)
 
             elif automation_type == "data_extraction":
-                result = await self._handle_data_extraction(intent, intent_data)
+                result = await self._handle_data_extraction(intent, intent_data, session_id)
             elif automation_type == "web_scraping":
                 result = await self._handle_web_scraping(intent, intent_data)
             else:
@@ -148,8 +186,8 @@ class DirectAutomationHandler:
             # Get the user email from intent_data, fallback to known email
             user_email = intent_data.get("user_email", "brainlyarpit8649@gmail.com")
             session_id = session_id or intent_data.get("session_id", "default_session")
-            logger.info(f"🔍 Gmail API automation for user: {user_email}, session: {session_id}")
-            logger.info(f"🔍 Intent data: {intent_data}")
+            logger.info("🔍 Gmail API automation for user: %s, session: %s", user_email, session_id)
+            logger.debug("🔍 Intent data: %s", intent_data)
             
             if intent in ["check_gmail_inbox", "check_gmail_unread", "email_inbox_check"]:
                 # Use real Gmail API service
@@ -273,9 +311,20 @@ class DirectAutomationHandler:
             return {"success": False, "data": {}, "message": str(e)}
     
 
-    async def _handle_data_extraction(self, intent: str, intent_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _handle_data_extraction(self, intent: str, intent_data: Dict[str, Any], session_id: str = None) -> Dict[str, Any]:
         """Handle data extraction automation"""
         try:
+            if intent in ("scrape_price", "scrape_product_listings") and PRODUCT_SCRAPING_LIVE:
+                return await self._scrape_products(intent, intent_data, session_id)
+
+            if intent == "scrape_price":
+                # Made-up prices would read as real ones; without live scraping there is no answer
+                return {
+                    "success": False,
+                    "data": {},
+                    "message": "Live price checks are not enabled on this server (PRODUCT_SCRAPING_LIVE=false)"
+                }
+
             if intent == "scrape_product_listings":
                 category = intent_data.get("category", "electronics")
                 platform = intent_data.get("platform", "amazon")
@@ -342,6 +391,70 @@ class DirectAutomationHandler:
         except Exception as e:
             return {"success": False, "data": {}, "message": str(e)}
     
+    def _product_page_url(self, intent_data: Dict[str, Any], query: str) -> Optional[str]:
+        """Product page to scrape: the URL from the intent, else a configured search page for the platform"""
+        if intent_data.get("url"):
+            return intent_data["url"]
+        template = PRODUCT_SEARCH_URLS.get((intent_data.get("platform") or "").lower())
+        if not template or not query:
+            return None
+        return template.format(query=quote_plus(query))
+
+    @staticmethod
+    def _product_listing(product: Dict[str, Any]) -> Dict[str, Any]:
+        """Structured product data in the shape the listing templates print"""
+        return {
+            "name": product.get("name") or "Unnamed product",
+            "price": format_price(product.get("price"), product.get("currency")),
+            "rating": f"{product['rating']:g}/5" if product.get("rating") is not None else "n/a",
+            "reviews": f"{product['review_count']:,}" if product.get("review_count") is not None else "0",
+            "availability": product.get("availability") or "unknown",
+            "url": product.get("url")
+        }
+
+    async def _scrape_products(self, intent: str, intent_data: Dict[str, Any], session_id: str = None) -> Dict[str, Any]:
+        """Read real prices from the page's structured data (JSON-LD, microdata, OpenGraph)"""
+        if intent == "scrape_price":
+            query = intent_data.get("search_query") or intent_data.get("product")
+        else:
+            brand = (intent_data.get("filters") or {}).get("brand")
+            query = " ".join(part for part in (brand, intent_data.get("category")) if part)
+
+        url = self._product_page_url(intent_data, query)
+        if not url:
+            return {
+                "success": False,
+                "data": {},
+                "message": "Please share the product page URL; prices are read from product pages, not search results"
+            }
+
+        if self.product_extractor is None:
+            self.product_extractor = StructuredDataExtractor()
+        result = await self.product_extractor.extract(url, tenant=session_id)
+        if not result.success:
+            return {"success": False, "data": result.data, "message": result.message}
+
+        products = result.data["products"]
+        if intent == "scrape_price":
+            # A price check is only useful for products that have one
+            products = [product for product in products if product.get("price") is not None]
+            if not products:
+                return {"success": False, "data": result.data, "message": f"No prices found on {url}"}
+        listings = [self._product_listing(product) for product in products[:PRODUCT_RESULTS_LIMIT]]
+        data = {
+            "count": len(listings),
+            "url": url,
+            "platform": intent_data.get("platform"),
+            "engine": result.engine,
+            "cached": result.cached,
+            "source": products[0]["source"] if products else None
+        }
+        if intent == "scrape_price":
+            data.update({"product": intent_data.get("product") or listings[0]["name"], "offers": listings})
+        else:
+            data.update({"category": intent_data.get("category"), "listings": listings})
+        return {"success": True, "data": data, "message": result.message}
+
     async def _handle_web_scraping(self, intent: str, intent_data: Dict[str, Any]) -> Dict[str, Any]:
         """Handle web scraping automation"""
         try:
@@ -487,6 +600,16 @@ class DirectAutomationHandler:
                 )
             
 
+            elif intent == "scrape_price":
+                offers_text = "\n".join([
+                    f"• **{offer['name']}** - {offer['price']} ⭐ {offer['rating']} ({offer['availability']})"
+                    for offer in data.get("offers", [])
+                ])
+                return template_info["success_template"].format(
+                    product=data.get("product", ""),
+                    offers=offers_text
+                )
+
             elif intent == "scrape_product_listings":
                 listings_text = "\n".join([
                     f"• **{listing['name']}** - {listing['price']} ⭐ {listing['rating']} ({listing['reviews']} reviews)"
@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build, build_from_document
+
+try:
+    from googleapiclient.discovery_cache import get_static_doc
+except ImportError:  # google-api-python-client < 2.0 ships no static documents
+    get_static_doc = None
+
+logger = logging.getLogger(__name__)
+
+# Cache limits from environment
+GMAIL_CLIENT_CACHE_SIZE = int(os.getenv("GMAIL_CLIENT_CACHE_SIZE", "256"))
+GMAIL_CLIENT_CACHE_MAX_BYTES = int(float(os.getenv("GMAIL_CLIENT_CACHE_MAX_MB", "32")) * 1024 * 1024)
+
+_discovery_documents: Dict[tuple, Dict[str, Any]] = {}
+_discovery_lock = threading.Lock()
+
+def get_discovery_document(api: str, version: str) -> Optional[Dict[str, Any]]:
+    """Parsed discovery document for api/version, loaded once per process and shared by every client"""
+    key = (api, version)
+    document = _discovery_documents.get(key)
+    if document is None and get_static_doc is not None:
+        with _discovery_lock:
+            document = _discovery_documents.get(key)
+            if document is None:
+                raw = get_static_doc(api, version)
+                if raw:
+                    document = _discovery_documents[key] = json.loads(raw)
+    return document
+
+def build_service(api: str, version: str, credentials: Credentials):
+    """build() without re-reading and re-parsing the discovery document each time"""
+    document = get_discovery_document(api, version)
+    if document is None:
+        return build(api, version, credentials=credentials, cache_discovery=False)
+    return build_from_document(document, credentials=credentials)
+
+def _approximate_size(obj, shared_ids: set, seen: set = None, depth: int = 0) -> int:
+    """Rough retained size of a client, not counting the shared discovery documents"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen or id(obj) in shared_ids or depth > 6:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_approximate_size(k, shared_ids, seen, depth + 1) + _approximate_size(v, shared_ids, seen, depth + 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_approximate_size(item, shared_ids, seen, depth + 1) for item in obj)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        size += _approximate_size(vars(obj), shared_ids, seen, depth + 1)
+    return size
+
+class GmailClient:
+    """Credentials plus the API services built from them for one session"""
+
+    def __init__(self, session_id: str, credentials: Credentials):
+        self.session_id = session_id
+        self.credentials = credentials
+        self.service = build_service('gmail', 'v1', credentials)
+        self._oauth2_service = None
+        self.refresh_lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.size = 0
+
+    @property
+    def oauth2_service(self):
+        """userinfo API client, built on first use"""
+        if self._oauth2_service is None:
+            self._oauth2_service = build_service('oauth2', 'v2', self.credentials)
+        return self._oauth2_service
+
+    def measure(self) -> int:
+        shared_ids = {id(doc) for doc in _discovery_documents.values()}
+        self.size = _approximate_size(self, shared_ids)
+        return self.size
+
+class GmailClientCache:
+    """
+    LRU of per-session Gmail clients, bounded by entry count and approximate
+    memory. Each session gets its own credentials and service objects, so
+    concurrent requests for different sessions never share mutable state.
+    on_evict is called with the session id of each client that is evicted or
+    invalidated, so other per-session state can be dropped along with it.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, on_evict: Optional[Callable[[str], None]] = None):
+        self.max_entries = max_entries or GMAIL_CLIENT_CACHE_SIZE
+        self.max_bytes = max_bytes or GMAIL_CLIENT_CACHE_MAX_BYTES
+        self.on_evict = on_evict
+        self._clients: "OrderedDict[str, GmailClient]" = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def get(self, session_id: str) -> Optional[GmailClient]:
+        client = self._clients.get(session_id)
+        if client is None:
+            self.stats["misses"] += 1
+            return None
+        self._clients.move_to_end(session_id)
+        client.last_used = time.monotonic()
+        self.stats["hits"] += 1
+        return client
+
+    def put(self, client: GmailClient) -> GmailClient:
+        self._drop(client.session_id)
+        self.total_bytes += client.measure()
+        self._clients[client.session_id] = client
+        self._evict()
+        return client
+
+    def invalidate(self, session_id: str):
+        if self._drop(session_id) and self.on_evict is not None:
+            self.on_evict(session_id)
+
+    def _drop(self, session_id: str) -> bool:
+        client = self._clients.pop(session_id, None)
+        if client is not None:
+            self.total_bytes -= client.size
+        return client is not None
+
+    def _evict(self):
+        # Always keep the most recent entry, even if it alone exceeds the cap
+        while len(self._clients) > 1 and (len(self._clients) > self.max_entries or self.total_bytes > self.max_bytes):
+            session_id, client = self._clients.popitem(last=False)
+            self.total_bytes -= client.size
+            self.stats["evictions"] += 1
+            logger.debug("Evicted Gmail client for session %s", session_id)
+            if self.on_evict is not None:
+                self.on_evict(session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "entries": len(self._clients),
+            "approx_bytes": self.total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes
+        }
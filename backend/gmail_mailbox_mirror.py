@@ -0,0 +1,385 @@
+import os
+import re
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, Optional, Set
+
+from google.auth.exceptions import RefreshError
+from googleapiclient.errors import HttpError
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from gmail_search_index import GmailSearchIndex, LABEL_OPERATORS
+
+logger = logging.getLogger(__name__)
+
+# Mirror settings from environment
+GMAIL_MIRROR_ENABLED = os.getenv("GMAIL_MIRROR_ENABLED", "true").lower() == "true"
+# A mirror older than this is still served, but a background sync is kicked off
+GMAIL_MIRROR_SYNC_INTERVAL = float(os.getenv("GMAIL_MIRROR_SYNC_INTERVAL_SECONDS", "30"))
+# Sessions queried within this window are kept in sync by the background loop
+GMAIL_MIRROR_ACTIVE_WINDOW = float(os.getenv("GMAIL_MIRROR_ACTIVE_WINDOW_SECONDS", "900"))
+# Messages pulled by a full sync (newest first)
+GMAIL_MIRROR_FULL_SYNC_LIMIT = int(os.getenv("GMAIL_MIRROR_FULL_SYNC_LIMIT", "500"))
+# Alternatives joined by OR, each made of label terms; it decides which queries the mirror may answer
+GMAIL_MIRROR_FULL_SYNC_QUERY = os.getenv("GMAIL_MIRROR_FULL_SYNC_QUERY", "in:inbox OR is:unread")
+
+# Query terms the mirror can answer, mapped to the label they require
+MIRROR_QUERY_LABELS = {
+    "is:unread": "UNREAD",
+    "in:inbox": "INBOX",
+    "is:important": "IMPORTANT",
+    "is:starred": "STARRED"
+}
+
+# Gmail leaves these out of every search unless asked; history.list still reports them
+EXCLUDED_LABELS = ["TRASH", "SPAM"]
+
+def query_labels(query: str) -> Set[str]:
+    """Labels every message matching query must carry (from is:/in: terms)"""
+    labels = set()
+    for term in (query or "").lower().split():
+        operator = LABEL_OPERATORS.get(term)
+        if operator and operator[1]:
+            labels.add(operator[0])
+    return labels
+
+def sync_scope(sync_query: str) -> List[FrozenSet[str]]:
+    """
+    Label sets the full sync query lists completely, one per OR alternative.
+    Empty when the query uses anything but label terms, in which case the
+    mirror cannot tell which queries it covers and answers none.
+    """
+    scope = []
+    for alternative in re.split(r"\s+OR\s+", sync_query.strip()):
+        terms = alternative.lower().split()
+        if not terms or any(term not in LABEL_OPERATORS or not LABEL_OPERATORS[term][1] for term in terms):
+            return []
+        scope.append(frozenset(query_labels(alternative)))
+    return scope
+
+MIRROR_SCOPE = sync_scope(GMAIL_MIRROR_FULL_SYNC_QUERY)
+
+def in_scope(labels) -> bool:
+    """Whether a message with these labels is one the full sync would list"""
+    labels = set(labels)
+    return not labels & set(EXCLUDED_LABELS) and any(alternative <= labels for alternative in MIRROR_SCOPE)
+
+class GmailMailboxMirror:
+    """
+    Mongo copy of each session's message metadata, kept current with
+    incremental history.list syncs from the last stored historyId.
+
+    gmail_messages holds one document per (session_id, message id) with the
+    fields check_inbox returns; gmail_sync_state holds the historyId, sync
+    times and a version bumped on every change per session. Label-only
+    queries are read from Mongo; search queries go through an in-memory
+    inverted index built from the mirror. Syncs run in the background.
+
+    Only queries confined to what the full sync lists (MIRROR_SCOPE, e.g.
+    in:inbox or is:unread) are answered; anything broader, and any short
+    answer from a mirror that hit the sync limit, goes to the API.
+    """
+
+    def __init__(self, db, gmail_service):
+        self.db = db
+        self.gmail = gmail_service
+        self.messages = db.gmail_messages
+        self.state = db.gmail_sync_state
+        self._sync_tasks: Dict[str, asyncio.Task] = {}
+        self._active_sessions: Dict[str, float] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self.search_index = GmailSearchIndex()
+        self.stats = {
+            "mirror_hits": 0, "mirror_misses": 0, "index_hits": 0,
+            "incremental_syncs": 0, "full_syncs": 0, "sync_errors": 0
+        }
+
+    async def ensure_indexes(self):
+        await self.messages.create_index([("session_id", ASCENDING), ("id", ASCENDING)], unique=True)
+        await self.messages.create_index([("session_id", ASCENDING), ("labels", ASCENDING), ("internal_date", DESCENDING)])
+        await self.state.create_index("session_id", unique=True)
+
+    def _label_filter(self, query: str) -> Optional[List[str]]:
+        """Labels a query maps to, or None if the mirror cannot answer it exactly"""
+        labels = []
+        for term in (query or "").lower().split():
+            label = MIRROR_QUERY_LABELS.get(term)
+            if label is None:
+                return None
+            labels.append(label)
+        return labels
+
+    async def query(self, session_id: str, query: str, max_results: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Emails matching query from the mirror, newest first, in check_inbox's
+        format. Returns None when the query or session is not covered yet, in
+        which case the caller goes to the API (and a sync is scheduled).
+        """
+        self._active_sessions[session_id] = time.monotonic()
+        labels = self._label_filter(query)
+        state = await self.state.find_one({"session_id": session_id})
+
+        if not self.covers(query):
+            # Archived, sent or older mail outside the synced scope would be silently missing
+            self.stats["mirror_misses"] += 1
+            return None
+
+        if not state or state.get("status") != "ready" or max_results > GMAIL_MIRROR_FULL_SYNC_LIMIT:
+            self.stats["mirror_misses"] += 1
+            if not state or state.get("status") != "ready":
+                self.schedule_sync(session_id)
+            return None
+
+        if time.time() - state.get("last_sync_ts", 0) > GMAIL_MIRROR_SYNC_INTERVAL:
+            self.schedule_sync(session_id)
+
+        if not labels:
+            return await self._search(session_id, query, max_results, state)
+
+        mongo_filter = {"session_id": session_id, "labels": {"$all": labels, "$nin": EXCLUDED_LABELS}}
+        cursor = self.messages.find(mongo_filter, {"_id": 0, "session_id": 0, "internal_date": 0, "synced_at": 0})
+        cursor = cursor.sort("internal_date", DESCENDING).limit(max_results)
+        emails = await cursor.to_list(length=max_results)
+        # The mirror only holds the newest messages; a short result may be missing older mail
+        if len(emails) < max_results and not state.get("complete"):
+            self.stats["mirror_misses"] += 1
+            return None
+        self.stats["mirror_hits"] += 1
+        return emails
+
+    @staticmethod
+    def covers(query: str) -> bool:
+        """Whether every message matching query falls inside the synced scope"""
+        labels = query_labels(query)
+        return any(alternative <= labels for alternative in MIRROR_SCOPE)
+
+    async def _search(self, session_id: str, query: str, max_results: int, state: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Answer from:/subject:/is:/in: queries from the session's inverted index"""
+        self.search_index.stats["queries"] += 1
+        version = state.get("version")
+        index = self.search_index.get(session_id, version)
+        if index is None:
+            documents = await self.messages.find(
+                {"session_id": session_id, "labels": {"$nin": EXCLUDED_LABELS}}, {"_id": 0, "session_id": 0, "synced_at": 0}
+            ).to_list(length=None)
+            index = self.search_index.put(session_id, documents, version)
+
+        matches = index.search(query, max_results)
+        if matches is None:
+            self.search_index.stats["unsupported"] += 1
+            self.stats["mirror_misses"] += 1
+            return None
+        # The mirror only holds the newest messages; a short result may be missing older mail
+        if len(matches) < max_results and not state.get("complete"):
+            self.stats["mirror_misses"] += 1
+            return None
+
+        self.search_index.stats["answered"] += 1
+        self.stats["index_hits"] += 1
+        return [{k: v for k, v in message.items() if k != "internal_date"} for message in matches]
+
+    def schedule_sync(self, session_id: str, full: bool = False) -> asyncio.Task:
+        """Start a background sync for session_id unless one is already running"""
+        task = self._sync_tasks.get(session_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self.sync(session_id, full=full))
+            self._sync_tasks[session_id] = task
+            task.add_done_callback(lambda t, s=session_id: self._sync_tasks.pop(s, None) if self._sync_tasks.get(s) is t else None)
+        return task
+
+    async def sync(self, session_id: str, full: bool = False) -> Dict[str, Any]:
+        """Bring the mirror for session_id up to date; incremental when a historyId is stored"""
+        try:
+            client = await self.gmail._get_client(session_id)
+            if client is None:
+                # Token gone or revoked: stop serving this session from the mirror
+                await self.state.delete_one({"session_id": session_id})
+                return {"success": False, "message": "Gmail authentication required"}
+
+            state = await self.state.find_one({"session_id": session_id}) or {}
+            if not full and state.get("history_id"):
+                try:
+                    return await self._incremental_sync(session_id, client, state["history_id"])
+                except HttpError as e:
+                    if e.resp.status != 404:
+                        raise
+                    # historyId too old for Gmail to replay; start over
+                    logger.info("🔄 Gmail history expired for session %s, running full sync", session_id)
+            return await self._full_sync(session_id, client)
+
+        except RefreshError as e:
+            self.stats["sync_errors"] += 1
+            logger.warning(f"⚠️ Gmail token refresh failed for session {session_id}, mirror disabled: {e}")
+            await self.state.delete_one({"session_id": session_id})
+            return {"success": False, "message": "Gmail authentication required"}
+        except Exception as e:
+            self.stats["sync_errors"] += 1
+            logger.error(f"❌ Gmail mirror sync failed for session {session_id}: {e}")
+            await self.state.update_one(
+                {"session_id": session_id},
+                {"$set": {"last_error": str(e), "last_error_at": datetime.utcnow().isoformat()}}
+            )
+            return {"success": False, "message": str(e)}
+
+    async def _full_sync(self, session_id: str, client) -> Dict[str, Any]:
+        started = time.perf_counter()
+        service, credentials = client.service, client.credentials
+
+        # Read the historyId first so changes made during the listing are replayed next time
+        profile = await self.gmail._execute(session_id, service.users().getProfile(userId='me'), credentials)
+        message_ids = await self.gmail._list_message_ids(
+            session_id, service, credentials, GMAIL_MIRROR_FULL_SYNC_QUERY, GMAIL_MIRROR_FULL_SYNC_LIMIT
+        )
+        messages = await self.gmail._fetch_message_metadata(session_id, service, credentials, message_ids)
+
+        await self._upsert_messages(session_id, messages)
+        await self.messages.delete_many({"session_id": session_id, "id": {"$nin": message_ids}})
+        # Everything the full sync query matches fits in the mirror
+        complete = len(message_ids) < GMAIL_MIRROR_FULL_SYNC_LIMIT
+        await self._save_state(session_id, profile.get("historyId"), full=True, complete=complete)
+
+        self.stats["full_syncs"] += 1
+        logger.info(
+            "📥 Gmail mirror full sync for session %s: %d messages in %.0fms",
+            session_id, len(messages), (time.perf_counter() - started) * 1000
+        )
+        return {"success": True, "mode": "full", "messages": len(messages)}
+
+    async def _incremental_sync(self, session_id: str, client, start_history_id: str) -> Dict[str, Any]:
+        service, credentials = client.service, client.credentials
+        to_fetch, deleted, relabeled = set(), set(), {}
+        history_id = start_history_id
+        page_token = None
+
+        while True:
+            response = await self.gmail._execute(session_id, service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                pageToken=page_token,
+                maxResults=500
+            ), credentials)
+            for record in response.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    to_fetch.add(added['message']['id'])
+                    deleted.discard(added['message']['id'])
+                for removed in record.get('messagesDeleted', []):
+                    deleted.add(removed['message']['id'])
+                    to_fetch.discard(removed['message']['id'])
+                for change in record.get('labelsAdded', []) + record.get('labelsRemoved', []):
+                    # History carries the message's full label set after the change
+                    relabeled[change['message']['id']] = change['message'].get('labelIds', [])
+            history_id = response.get('historyId', history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+        mirrored = set()
+        if relabeled:
+            # A relabel can bring a message into scope (marked unread again, moved back to the
+            # inbox); one the mirror does not hold yet has to be fetched, not just relabeled
+            candidates = [message_id for message_id in relabeled if message_id not in to_fetch and message_id not in deleted]
+            mirrored = {
+                document["id"] for document in await self.messages.find(
+                    {"session_id": session_id, "id": {"$in": candidates}}, {"_id": 0, "id": 1}
+                ).to_list(length=None)
+            }
+            to_fetch.update(
+                message_id for message_id in candidates
+                if message_id not in mirrored and in_scope(relabeled[message_id])
+            )
+
+        if to_fetch:
+            messages = await self.gmail._fetch_message_metadata(session_id, service, credentials, sorted(to_fetch))
+            await self._upsert_messages(session_id, messages)
+        if deleted:
+            await self.messages.delete_many({"session_id": session_id, "id": {"$in": list(deleted)}})
+        relabel_ops = [
+            UpdateOne({"session_id": session_id, "id": message_id}, {"$set": {"labels": labels}})
+            for message_id, labels in relabeled.items()
+            if message_id in mirrored
+        ]
+        if relabel_ops:
+            await self.messages.bulk_write(relabel_ops, ordered=False)
+
+        await self._save_state(session_id, history_id, changed=bool(to_fetch or deleted or relabel_ops))
+        self.stats["incremental_syncs"] += 1
+        logger.debug(
+            "Gmail mirror sync for session %s: +%d -%d ~%d",
+            session_id, len(to_fetch), len(deleted), len(relabel_ops)
+        )
+        return {"success": True, "mode": "incremental", "added": len(to_fetch), "deleted": len(deleted), "relabeled": len(relabel_ops)}
+
+    async def _upsert_messages(self, session_id: str, messages: List[Dict[str, Any]]):
+        if not messages:
+            return
+        now = datetime.utcnow().isoformat()
+        operations = []
+        for msg in messages:
+            document = self.gmail._format_email_metadata(msg)
+            document.update({
+                "session_id": session_id,
+                "internal_date": int(msg.get('internalDate', 0)),
+                "synced_at": now
+            })
+            operations.append(UpdateOne({"session_id": session_id, "id": msg['id']}, {"$set": document}, upsert=True))
+        await self.messages.bulk_write(operations, ordered=False)
+
+    async def _save_state(self, session_id: str, history_id: Optional[str], full: bool = False,
+                          complete: Optional[bool] = None, changed: bool = True):
+        now = datetime.utcnow()
+        fields = {
+            "session_id": session_id,
+            "history_id": history_id,
+            "status": "ready",
+            "last_sync_at": now.isoformat(),
+            "last_sync_ts": time.time(),
+            "last_error": None
+        }
+        if full:
+            fields["last_full_sync_at"] = now.isoformat()
+        if complete is not None:
+            fields["complete"] = complete
+        update = {"$set": fields}
+        if changed:
+            # Search indexes built from an older version are rebuilt on next use
+            update["$inc"] = {"version": 1}
+        await self.state.update_one({"session_id": session_id}, update, upsert=True)
+
+    async def invalidate(self, session_id: str):
+        """Forget a session's mirror, e.g. after its account changed"""
+        # A sync still running for the old account must not write after the wipe
+        task = self._sync_tasks.pop(session_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self.search_index.invalidate(session_id)
+        await self.messages.delete_many({"session_id": session_id})
+        await self.state.delete_one({"session_id": session_id})
+
+    async def _sync_active_sessions(self):
+        while True:
+            await asyncio.sleep(GMAIL_MIRROR_SYNC_INTERVAL)
+            cutoff = time.monotonic() - GMAIL_MIRROR_ACTIVE_WINDOW
+            for session_id, last_seen in list(self._active_sessions.items()):
+                if last_seen < cutoff:
+                    self._active_sessions.pop(session_id, None)
+                else:
+                    self.schedule_sync(session_id)
+
+    async def start(self):
+        if not MIRROR_SCOPE:
+            logger.warning(f"⚠️ GMAIL_MIRROR_FULL_SYNC_QUERY {GMAIL_MIRROR_FULL_SYNC_QUERY!r} is not made of label terms; inbox checks will use the API")
+        try:
+            await self.ensure_indexes()
+        except Exception as e:
+            logger.warning(f"Gmail mailbox mirror index creation failed: {e}")
+        self._loop_task = asyncio.create_task(self._sync_active_sessions())
+
+    async def stop(self):
+        tasks = [task for task in [self._loop_task, *self._sync_tasks.values()] if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop_task = None
@@ -0,0 +1,173 @@
+import os
+import re
+import base64
+import codecs
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterator, List, Optional
+
+# Longest body text we decode; the rest of a huge newsletter is never read
+GMAIL_MAX_BODY_CHARS = int(os.getenv("GMAIL_MAX_BODY_CHARS", "200000"))
+# Parsed bodies kept in memory, bounded by approximate size
+GMAIL_BODY_CACHE_MAX_BYTES = int(float(os.getenv("GMAIL_BODY_CACHE_MAX_MB", "16")) * 1024 * 1024)
+
+# base64 is decoded in chunks; a multiple of 4 so chunk boundaries fall on whole groups
+_CHUNK_CHARS = 64 * 1024
+_MAX_DEPTH = 20
+_CHARSET_RE = re.compile(r'charset="?([\w.:-]+)"?', re.IGNORECASE)
+
+def _header(part: Dict[str, Any], name: str) -> str:
+    name = name.lower()
+    return next((h.get('value', '') for h in part.get('headers', []) if h.get('name', '').lower() == name), '')
+
+def is_attachment(part: Dict[str, Any]) -> bool:
+    """Parts with a filename or an attachment disposition are never decoded"""
+    return bool(part.get('filename')) or _header(part, 'Content-Disposition').lower().startswith('attachment')
+
+def select_text_parts(part: Dict[str, Any], depth: int = 0) -> List[Dict[str, Any]]:
+    """
+    Leaf parts that make up the readable body of a Gmail format='full'
+    payload, walking nested multiparts. multipart/alternative picks one
+    representation (text/plain over text/html); other multiparts
+    (mixed, related, ...) contribute every inline text part in order.
+    """
+    if depth > _MAX_DEPTH or is_attachment(part):
+        return []
+    mime_type = (part.get('mimeType') or '').lower()
+
+    if mime_type.startswith('multipart/'):
+        children = [select_text_parts(child, depth + 1) for child in part.get('parts', [])]
+        children = [selection for selection in children if selection]
+        if mime_type == 'multipart/alternative':
+            plain = [s for s in children if all(p['mimeType'].lower() == 'text/plain' for p in s)]
+            return (plain or children or [[]])[0]
+        return [p for selection in children for p in selection]
+
+    if mime_type in ('text/plain', 'text/html'):
+        return [part]
+    return []
+
+def part_charset(part: Dict[str, Any]) -> str:
+    match = _CHARSET_RE.search(_header(part, 'Content-Type'))
+    return match.group(1) if match else 'utf-8'
+
+def iter_base64url(data: str) -> Iterator[bytes]:
+    """Decode base64url data chunk by chunk instead of all at once"""
+    for start in range(0, len(data), _CHUNK_CHARS):
+        chunk = data[start:start + _CHUNK_CHARS]
+        yield base64.urlsafe_b64decode(chunk + '=' * (-len(chunk) % 4))
+
+class HtmlToText(HTMLParser):
+    """Incremental HTML to plain text: drops scripts and styles, keeps block structure"""
+
+    BLOCK_TAGS = {'p', 'div', 'br', 'tr', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'blockquote', 'hr', 'section'}
+    SKIP_TAGS = {'script', 'style', 'head', 'title'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._chunks: List[str] = []
+        self._skip_depth = 0
+        self.length = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._append('\n')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._append(data)
+
+    def _append(self, text: str):
+        self._chunks.append(text)
+        self.length += len(text)
+
+    def text(self) -> str:
+        raw = ''.join(self._chunks)
+        lines = (' '.join(line.split()) for line in raw.splitlines())
+        return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+def decode_text_part(data: str, mime_type: str, charset: str = 'utf-8', limit: int = None) -> str:
+    """
+    Decode one base64url text part, converting HTML to text as it streams.
+    Stops once limit characters have been produced.
+    """
+    limit = limit or GMAIL_MAX_BODY_CHARS
+    try:
+        decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    is_html = mime_type.lower() == 'text/html'
+    converter = HtmlToText() if is_html else None
+    pieces: List[str] = []
+    produced = 0
+    for chunk in iter_base64url(data):
+        text = decoder.decode(chunk)
+        if converter:
+            converter.feed(text)
+            produced = converter.length
+        else:
+            pieces.append(text)
+            produced += len(text)
+        if produced >= limit:
+            break
+    else:
+        tail = decoder.decode(b'', final=True)
+        if converter:
+            converter.feed(tail)
+        else:
+            pieces.append(tail)
+
+    if converter:
+        converter.close()
+        return converter.text()[:limit]
+    return ''.join(pieces)[:limit].replace('\r\n', '\n')
+
+class BodyCache:
+    """LRU of parsed emails keyed by (session_id, message_id), evicting by approximate size"""
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes or GMAIL_BODY_CACHE_MAX_BYTES
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def _size(email_data: Dict[str, Any]) -> int:
+        return sum(len(v) for v in email_data.values() if isinstance(v, str)) * 2 + 512
+
+    def get(self, session_id: str, message_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get((session_id, message_id))
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end((session_id, message_id))
+        self.stats["hits"] += 1
+        return entry[0]
+
+    def put(self, session_id: str, message_id: str, email_data: Dict[str, Any]):
+        size = self._size(email_data)
+        # One huge message should not flush everything else
+        if size > self.max_bytes // 4:
+            return
+        key = (session_id, message_id)
+        previous = self._entries.pop(key, None)
+        if previous:
+            self.total_bytes -= previous[1]
+        self._entries[key] = (email_data, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+            self.stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._entries), "approx_bytes": self.total_bytes, "max_bytes": self.max_bytes}
@@ -1,6 +1,12 @@
 import os
 import json
+import asyncio
 import logging
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 from datetime import datetime
@@ -13,14 +19,38 @@ from email import encoders
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+import google_auth_httplib2
+import httplib2
+
+from gmail_client_cache import GmailClient, GmailClientCache
+from gmail_mailbox_mirror import GmailMailboxMirror, GMAIL_MIRROR_ENABLED
+from gmail_mime import BodyCache, decode_text_part, part_charset, select_text_parts
+from gmail_quota import GmailQuotaScheduler, is_rate_limited
 
 # MongoDB imports
 from motor.motor_asyncio import AsyncIOMotorClient
 
 logger = logging.getLogger(__name__)
 
+# Gmail accepts up to 100 calls per batch but recommends 50 to avoid rate limiting
+GMAIL_BATCH_SIZE = min(100, int(os.getenv("GMAIL_BATCH_SIZE", "50")))
+METADATA_HEADERS = ['From', 'Subject', 'Date']
+
+# googleapiclient is blocking; its calls run on a bounded pool, never on the event loop
+GMAIL_THREAD_POOL_SIZE = int(os.getenv("GMAIL_THREAD_POOL_SIZE", "16"))
+# Concurrent Gmail calls allowed per session, so one busy account cannot take the whole pool
+GMAIL_PER_USER_CONCURRENCY = int(os.getenv("GMAIL_PER_USER_CONCURRENCY", "4"))
+
+# Cached profiles younger than this are served as is; older ones up to the stale limit
+# are served while a background refresh runs
+GMAIL_PROFILE_FRESH_SECONDS = float(os.getenv("GMAIL_PROFILE_FRESH_SECONDS", "300"))
+GMAIL_PROFILE_STALE_SECONDS = float(os.getenv("GMAIL_PROFILE_STALE_SECONDS", "86400"))
+
+# last_used_at on a token is rewritten at most this often; the background refresher
+# skips tokens idle past its cutoff
+GMAIL_ACTIVITY_WRITE_INTERVAL = float(os.getenv("GMAIL_ACTIVITY_WRITE_INTERVAL_SECONDS", "3600"))
+
 class GmailOAuthService:
     """
     Gmail API service with OAuth2 authentication
@@ -28,10 +58,13 @@ class GmailOAuthService:
     """
     
     def __init__(self, db=None):
-        self.credentials = None
-        self.service = None
+        self.clients = GmailClientCache(on_evict=self._forget_session)  # Per-session credentials and built services
+        self.bodies = BodyCache()  # Parsed emails, so reopening a message is instant
+        self.quota = GmailQuotaScheduler()  # Paces every API call against Gmail's quota
         self.current_session_id = None  # Track current session
         self.db = db  # MongoDB database connection
+        # Local copy of message metadata that answers simple inbox queries
+        self.mirror = GmailMailboxMirror(db, self) if db is not None and GMAIL_MIRROR_ENABLED else None
         self.scopes = [
             'https://www.googleapis.com/auth/gmail.readonly',
             'https://www.googleapis.com/auth/gmail.send',
@@ -47,6 +80,45 @@ class GmailOAuthService:
         # OAuth2 configuration from environment
         self.redirect_uri = os.getenv('GMAIL_REDIRECT_URI', 'https://bio-chick-finger-cement.trycloudflare.com/auth/gmail/callback')
         
+        self._executor = ThreadPoolExecutor(max_workers=GMAIL_THREAD_POOL_SIZE, thread_name_prefix="gmail")
+        # Weak values: a session's slot lives only while one of its calls holds it
+        self._user_slots: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+        # httplib2.Http is not thread-safe, so each pool thread keeps its own connection
+        self._thread_local = threading.local()
+        self._profile_refreshes: Dict[str, asyncio.Task] = {}
+        self._activity_marked: Dict[str, float] = {}
+    
+    def _forget_session(self, session_id: str):
+        """The client cache dropped this session; drop the rest of its in-memory state too"""
+        self._activity_marked.pop(session_id, None)
+    
+    async def _run_blocking(self, session_id: Optional[str], fn, *args, **kwargs):
+        """Run a blocking Google client call on the Gmail pool under the session's concurrency limit"""
+        slot = self._user_slots.get(session_id)
+        if slot is None:
+            slot = self._user_slots[session_id] = asyncio.Semaphore(GMAIL_PER_USER_CONCURRENCY)
+        async with slot:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+    
+    def _thread_http(self, credentials: Credentials):
+        """Authorized transport bound to the calling pool thread's own connection"""
+        http = getattr(self._thread_local, 'http', None)
+        if http is None:
+            http = self._thread_local.http = httplib2.Http(timeout=30)
+        return google_auth_httplib2.AuthorizedHttp(credentials, http=http)
+    
+    async def _execute(self, session_id: str, request, credentials: Credentials):
+        """Execute a googleapiclient request or batch off the event loop, within Gmail quota"""
+        return await self.quota.run(session_id, request, lambda: self._run_blocking(
+            session_id,
+            lambda: request.execute(http=self._thread_http(credentials))
+        ))
+    
+    def close(self):
+        """Release the Gmail worker threads; called from the app shutdown hook"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        
     def _load_credentials_config(self) -> Dict[str, Any]:
         """Load OAuth2 credentials configuration from credentials.json"""
         try:
@@ -88,7 +160,11 @@ class GmailOAuthService:
                 'expiry': credentials.expiry.isoformat() if credentials.expiry else None,
                 'created_at': datetime.utcnow().isoformat(),
                 'updated_at': datetime.utcnow().isoformat(),
-                'service': 'gmail'
+                'last_used_at': datetime.utcnow().isoformat(),
+                'service': 'gmail',
+                # A newly saved token clears any earlier background refresh failure
+                'refresh_error': None,
+                'refresh_retry_at': None
             }
             
             # Update or insert token data for this session
@@ -98,7 +174,7 @@ class GmailOAuthService:
                 upsert=True
             )
             
-            logger.info(f"✅ Gmail OAuth2 token saved successfully for session: {session_id}")
+            logger.info("✅ Gmail OAuth2 token saved successfully for session: %s", session_id)
             
         except Exception as e:
             logger.error(f"❌ Error saving OAuth2 token: {e}")
@@ -116,29 +192,34 @@ class GmailOAuthService:
             })
             
             if not token_record:
-                logger.info(f"ℹ️ No Gmail token found for session: {session_id}")
+                logger.info("ℹ️ No Gmail token found for session: %s", session_id)
                 return None
             
-            credentials = Credentials(
-                token=token_record.get('token'),
-                refresh_token=token_record.get('refresh_token'),
-                token_uri=token_record.get('token_uri'),
-                client_id=token_record.get('client_id'),
-                client_secret=token_record.get('client_secret'),
-                scopes=token_record.get('scopes')
-            )
-            
-            # Set expiry if available
-            if token_record.get('expiry'):
-                credentials.expiry = datetime.fromisoformat(token_record['expiry'])
+            credentials = self._credentials_from_record(token_record)
             
-            logger.info(f"✅ Gmail token loaded successfully for session: {session_id}")
+            logger.debug("✅ Gmail token loaded successfully for session: %s", session_id)
             return credentials
             
         except Exception as e:
             logger.error(f"❌ Error loading OAuth2 token: {e}")
             return None
     
+    def _credentials_from_record(self, token_record: Dict[str, Any]) -> Credentials:
+        """Build Credentials from an oauth_tokens document"""
+        credentials = Credentials(
+            token=token_record.get('token'),
+            refresh_token=token_record.get('refresh_token'),
+            token_uri=token_record.get('token_uri'),
+            client_id=token_record.get('client_id'),
+            client_secret=token_record.get('client_secret'),
+            scopes=token_record.get('scopes')
+        )
+        
+        # Set expiry if available
+        if token_record.get('expiry'):
+            credentials.expiry = datetime.fromisoformat(token_record['expiry'])
+        return credentials
+    
     def get_auth_url(self) -> Dict[str, str]:
         """Get OAuth2 authentication URL for user authorization"""
         try:
@@ -188,14 +269,23 @@ class GmailOAuthService:
             flow.redirect_uri = self.redirect_uri
             
             # Exchange authorization code for credentials
-            flow.fetch_token(code=authorization_code)
+            await self._run_blocking(session_id, flow.fetch_token, code=authorization_code)
             
-            self.credentials = flow.credentials
+            credentials = flow.credentials
             self.current_session_id = session_id
-            await self._save_token(self.credentials, session_id)
+            await self._save_token(credentials, session_id)
             
-            # Initialize Gmail service
-            self.service = build('gmail', 'v1', credentials=self.credentials)
+            # Initialize Gmail service, replacing any client cached for an older token
+            client = await self._run_blocking(session_id, GmailClient, session_id, credentials)
+            self.clients.put(client)
+            
+            # The account may differ from the one mirrored before, so rebuild the mirror
+            if self.mirror:
+                await self.mirror.invalidate(session_id)
+                self.mirror.schedule_sync(session_id, full=True)
+            # Same for a cached profile
+            if self.db is not None:
+                await self.db.user_profiles.delete_one({'session_id': session_id})
             
             return {
                 'success': True,
@@ -212,39 +302,83 @@ class GmailOAuthService:
                 'message': f'OAuth2 authentication failed: {str(e)}'
             }
     
-    async def _authenticate(self, session_id: str) -> bool:
+    async def _get_client(self, session_id: str) -> Optional[GmailClient]:
+        """Cached Gmail client for a session, built from its stored token on first use"""
+        client = self.clients.get(session_id)
+        if client is None:
+            credentials = await self._load_token(session_id)
+            if not credentials:
+                return None
+            # Building the services is blocking work too
+            client = await self._run_blocking(session_id, GmailClient, session_id, credentials)
+            # Another request may have built one for this session meanwhile
+            client = self.clients.get(session_id) or self.clients.put(client)
+        
+        # Refresh credentials if expired; one refresh per session even under concurrent requests
+        if client.credentials.expired and client.credentials.refresh_token:
+            async with client.refresh_lock:
+                if client.credentials.expired:
+                    try:
+                        await self._run_blocking(session_id, client.credentials.refresh, Request())
+                    except Exception:
+                        self.clients.invalidate(session_id)
+                        raise
+                    await self._save_token(client.credentials, session_id)
+                    logger.info("🔄 Gmail credentials refreshed successfully for session: %s", session_id)
+        await self._mark_active(session_id)
+        return client
+    
+    async def _mark_active(self, session_id: str):
+        """Record that the session used Gmail, so the background refresher keeps its token warm"""
+        now = time.monotonic()
+        marked = self._activity_marked.get(session_id)
+        if self.db is None or (marked is not None and now - marked < GMAIL_ACTIVITY_WRITE_INTERVAL):
+            return
+        self._activity_marked[session_id] = now
+        try:
+            await self.db.oauth_tokens.update_one(
+                {'session_id': session_id, 'service': 'gmail'},
+                {'$set': {'last_used_at': datetime.utcnow().isoformat()}}
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Could not record Gmail activity for session {session_id}: {e}")
+    
+    async def _authenticate(self, session_id: str) -> Optional[GmailClient]:
         """Authenticate with Gmail API using stored or refreshed credentials for specific session"""
         try:
-            # Set current session
-            self.current_session_id = session_id
-            
-            # Try to load existing credentials for this session
-            if not self.credentials or self.current_session_id != session_id:
-                self.credentials = await self._load_token(session_id)
-            
-            if not self.credentials:
+            client = await self._get_client(session_id)
+            if client is None:
                 logger.info(f"ℹ️ No Gmail credentials found for session {session_id}. OAuth2 flow required.")
-                return False
-            
-            # Refresh credentials if expired
-            if self.credentials.expired and self.credentials.refresh_token:
-                self.credentials.refresh(Request())
-                await self._save_token(self.credentials, session_id)
-                logger.info(f"🔄 Gmail credentials refreshed successfully for session: {session_id}")
+                return None
             
-            # Build Gmail service
-            self.service = build('gmail', 'v1', credentials=self.credentials)
-            logger.info(f"✅ Gmail authentication successful for session: {session_id}")
-            return True
+            self.current_session_id = session_id
+            logger.debug("✅ Gmail authentication successful for session: %s", session_id)
+            return client
             
         except Exception as e:
             logger.error(f"❌ Gmail authentication failed for session {session_id}: {e}")
-            return False
+            return None
     
     async def check_inbox(self, session_id: str, max_results: int = 10, query: str = 'is:unread') -> Dict[str, Any]:
         """Check Gmail inbox and return email list for specific session"""
         try:
-            if not await self._authenticate(session_id):
+            # Served from the synced mirror when it covers the query; it refreshes in the background
+            if self.mirror:
+                email_list = await self.mirror.query(session_id, query, max_results)
+                if email_list is not None:
+                    return {
+                        'success': True,
+                        'data': {
+                            'emails': email_list,
+                            'total_count': len(email_list),
+                            'query_used': query,
+                            'source': 'mirror'
+                        },
+                        'message': f'Successfully retrieved {len(email_list)} emails'
+                    }
+            
+            client = await self._authenticate(session_id)
+            if not client:
                 return {
                     'success': False,
                     'message': 'Gmail authentication required. Please complete OAuth2 flow.',
@@ -252,48 +386,36 @@ class GmailOAuthService:
                     'session_id': session_id
                 }
             
+            service, credentials = client.service, client.credentials
+            
             # Search for messages
-            results = self.service.users().messages().list(
-                userId='me', 
-                q=query, 
-                maxResults=max_results
-            ).execute()
-            
-            messages = results.get('messages', [])
-            email_list = []
-            
-            for message in messages:
-                msg = self.service.users().messages().get(
-                    userId='me', 
-                    id=message['id'],
-                    format='metadata',
-                    metadataHeaders=['From', 'Subject', 'Date']
-                ).execute()
-                
-                headers = msg.get('payload', {}).get('headers', [])
-                email_data = {
-                    'id': message['id'],
-                    'thread_id': msg.get('threadId'),
-                    'snippet': msg.get('snippet', ''),
-                    'from': next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown'),
-                    'subject': next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject'),
-                    'date': next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date'),
-                    'labels': msg.get('labelIds', [])
-                }
-                email_list.append(email_data)
+            message_ids = await self._list_message_ids(session_id, service, credentials, query, max_results)
+            
+            # One batch round trip per GMAIL_BATCH_SIZE messages instead of one per message
+            email_list = [
+                self._format_email_metadata(msg)
+                for msg in await self._fetch_message_metadata(session_id, service, credentials, message_ids)
+            ]
             
             return {
                 'success': True,
                 'data': {
                     'emails': email_list,
                     'total_count': len(email_list),
-                    'query_used': query
+                    'query_used': query,
+                    'source': 'api'
                 },
                 'message': f'Successfully retrieved {len(email_list)} emails'
             }
             
         except HttpError as e:
             logger.error(f"❌ Gmail API error: {e}")
+            if is_rate_limited(e):
+                return {
+                    'success': False,
+                    'rate_limited': True,
+                    'message': 'Gmail is rate limiting this account right now. Please try again in a minute.'
+                }
             return {
                 'success': False,
                 'message': f'Gmail API error: {str(e)}'
@@ -305,7 +427,74 @@ class GmailOAuthService:
                 'message': f'Failed to check inbox: {str(e)}'
             }
     
-    def send_email(
+    def _format_email_metadata(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a metadata-format Gmail message into our email summary"""
+        headers = msg.get('payload', {}).get('headers', [])
+        return {
+            'id': msg['id'],
+            'thread_id': msg.get('threadId'),
+            'snippet': msg.get('snippet', ''),
+            'from': next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown'),
+            'subject': next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject'),
+            'date': next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date'),
+            'labels': msg.get('labelIds', [])
+        }
+    
+    async def _list_message_ids(self, session_id: str, service, credentials: Credentials, query: str, max_results: int) -> List[str]:
+        """List message ids matching query, following pages past Gmail's 500 per call limit"""
+        message_ids = []
+        page_token = None
+        while len(message_ids) < max_results:
+            results = await self._execute(session_id, service.users().messages().list(
+                userId='me',
+                q=query,
+                maxResults=min(500, max_results - len(message_ids)),
+                pageToken=page_token
+            ), credentials)
+            message_ids.extend(m['id'] for m in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        return message_ids[:max_results]
+    
+    async def _fetch_message_metadata(self, session_id: str, service, credentials: Credentials, message_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Fetch From/Subject/Date metadata for many messages through Gmail's
+        batch endpoint. Results keep the order of message_ids; messages whose
+        batch part failed are retried individually once.
+        """
+        responses = {}
+        failed = []
+        
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                failed.append(request_id)
+            else:
+                responses[request_id] = response
+        
+        def metadata_request(message_id):
+            return service.users().messages().get(
+                userId='me',
+                id=message_id,
+                format='metadata',
+                metadataHeaders=METADATA_HEADERS
+            )
+        
+        for start in range(0, len(message_ids), GMAIL_BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=on_response)
+            for message_id in message_ids[start:start + GMAIL_BATCH_SIZE]:
+                batch.add(metadata_request(message_id), request_id=message_id)
+            await self._execute(session_id, batch, credentials)
+        
+        for message_id in failed:
+            try:
+                responses[message_id] = await self._execute(session_id, metadata_request(message_id), credentials)
+            except HttpError as e:
+                logger.warning(f"⚠️ Could not fetch metadata for message {message_id}: {e}")
+        
+        return [responses[message_id] for message_id in message_ids if message_id in responses]
+    
+    async def send_email(
         self, 
         to: str, 
         subject: str, 
@@ -313,21 +502,22 @@ class GmailOAuthService:
         sender_email: str = None,
         cc: str = None,
         bcc: str = None,
-        session_id: str = None
+        session_id: str = None,
+        rfc822_message_id: str = None
     ) -> Dict[str, Any]:
         """Send email using Gmail API"""
         try:
             if not session_id:
                 session_id = self.current_session_id or 'default_session'
                 
-            # Use async authentication check
-            import asyncio
-            if not asyncio.run(self._authenticate(session_id)):
+            client = await self._authenticate(session_id)
+            if not client:
                 return {
                     'success': False,
                     'message': 'Gmail authentication required. Please complete OAuth2 flow.',
                     'requires_auth': True
                 }
+            service, credentials = client.service, client.credentials
             
             # Create message
             message = MIMEText(body)
@@ -340,15 +530,18 @@ class GmailOAuthService:
                 message['cc'] = cc
             if bcc:
                 message['bcc'] = bcc
+            if rfc822_message_id:
+                # Stable id lets a retry find out whether an earlier attempt was delivered
+                message['Message-ID'] = rfc822_message_id
             
             # Encode message
             raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
             
             # Send message
-            send_result = self.service.users().messages().send(
+            send_result = await self._execute(session_id, service.users().messages().send(
                 userId='me',
                 body={'raw': raw_message}
-            ).execute()
+            ), credentials)
             
             return {
                 'success': True,
@@ -365,35 +558,57 @@ class GmailOAuthService:
             logger.error(f"❌ Gmail send error: {e}")
             return {
                 'success': False,
+                'error': 'http_error',
+                'status_code': e.resp.status,
+                'rate_limited': is_rate_limited(e),
                 'message': f'Failed to send email: {str(e)}'
             }
         except Exception as e:
             logger.error(f"❌ Email send error: {e}")
             return {
                 'success': False,
+                'error': 'exception',
                 'message': f'Failed to send email: {str(e)}'
             }
     
-    def get_email_content(self, message_id: str, session_id: str = None) -> Dict[str, Any]:
+    async def find_sent_message(self, session_id: str, rfc822_message_id: str) -> Optional[str]:
+        """Gmail id of a sent message with the given Message-ID header, if there is one"""
+        client = await self._authenticate(session_id)
+        if not client:
+            return None
+        message_ids = await self._list_message_ids(
+            session_id, client.service, client.credentials, f'in:sent rfc822msgid:{rfc822_message_id}', 1
+        )
+        return message_ids[0] if message_ids else None
+    
+    async def get_email_content(self, message_id: str, session_id: str = None) -> Dict[str, Any]:
         """Get full email content by message ID"""
         try:
             if not session_id:
                 session_id = self.current_session_id or 'default_session'
                 
-            # Use async authentication check
-            import asyncio
-            if not asyncio.run(self._authenticate(session_id)):
+            client = await self._authenticate(session_id)
+            if not client:
                 return {
                     'success': False,
                     'message': 'Gmail authentication required. Please complete OAuth2 flow.',
                     'requires_auth': True
                 }
+            cached = self.bodies.get(session_id, message_id)
+            if cached is not None:
+                return {
+                    'success': True,
+                    'data': cached,
+                    'message': 'Email content retrieved successfully'
+                }
+            service, credentials = client.service, client.credentials
             
-            message = self.service.users().messages().get(
+            # format='full' carries attachment ids, not attachment data
+            message = await self._execute(session_id, service.users().messages().get(
                 userId='me',
                 id=message_id,
                 format='full'
-            ).execute()
+            ), credentials)
             
             payload = message.get('payload', {})
             headers = payload.get('headers', [])
@@ -407,9 +622,10 @@ class GmailOAuthService:
                 'to': next((h['value'] for h in headers if h['name'] == 'To'), 'Unknown'),
                 'subject': next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject'),
                 'date': next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date'),
-                'body': self._extract_body(payload),
+                'body': await self._extract_body(session_id, client, message_id, payload),
                 'labels': message.get('labelIds', [])
             }
+            self.bodies.put(session_id, message_id, email_data)
             
             return {
                 'success': True,
@@ -424,24 +640,26 @@ class GmailOAuthService:
                 'message': f'Failed to get email content: {str(e)}'
             }
     
-    def _extract_body(self, payload: Dict) -> str:
-        """Extract email body from payload"""
-        body = ""
-        
-        if 'parts' in payload:
-            for part in payload['parts']:
-                if part.get('mimeType') == 'text/plain':
-                    data = part.get('body', {}).get('data', '')
-                    if data:
-                        body = base64.urlsafe_b64decode(data).decode('utf-8')
-                        break
-        else:
-            if payload.get('mimeType') == 'text/plain':
-                data = payload.get('body', {}).get('data', '')
-                if data:
-                    body = base64.urlsafe_b64decode(data).decode('utf-8')
-        
-        return body
+    async def _extract_body(self, session_id: str, client: GmailClient, message_id: str, payload: Dict) -> str:
+        """Extract readable body text from a full payload, including nested multiparts and HTML-only mail"""
+        texts = []
+        for part in select_text_parts(payload):
+            body = part.get('body', {})
+            data = body.get('data')
+            if not data and body.get('attachmentId'):
+                # Gmail moves large text parts out of the payload; fetch only the one we need
+                attachment = await self._execute(session_id, client.service.users().messages().attachments().get(
+                    userId='me',
+                    messageId=message_id,
+                    id=body['attachmentId']
+                ), client.credentials)
+                data = attachment.get('data')
+            if data:
+                # Decoding a large newsletter is CPU work; keep it off the event loop
+                texts.append(await self._run_blocking(
+                    session_id, decode_text_part, data, part.get('mimeType', 'text/plain'), part_charset(part)
+                ))
+        return '\n\n'.join(text for text in texts if text)
     
     def is_authenticated(self) -> bool:
         """Check if user is authenticated with Gmail API"""
@@ -453,23 +671,12 @@ class GmailOAuthService:
             credentials_configured = self._load_credentials_config() is not None
             
             if session_id:
-                # Check if we have valid credentials for this session
-                credentials = await self._load_token(session_id)
-                authenticated = credentials is not None
-                
-                # If credentials exist, check if they're still valid
-                if authenticated and credentials:
-                    try:
-                        if credentials.expired and credentials.refresh_token:
-                            credentials.refresh(Request())
-                            await self._save_token(credentials, session_id)
-                        
-                        # Try to build service to verify credentials work
-                        service = build('gmail', 'v1', credentials=credentials)
-                        authenticated = True
-                    except Exception as e:
-                        logger.warning(f"Gmail credentials invalid for session {session_id}: {e}")
-                        authenticated = False
+                # Valid (refreshed if needed) credentials for this session give a cached client
+                try:
+                    authenticated = await self._get_client(session_id) is not None
+                except Exception as e:
+                    logger.warning(f"Gmail credentials invalid for session {session_id}: {e}")
+                    authenticated = False
             else:
                 authenticated = False
             
@@ -494,25 +701,66 @@ class GmailOAuthService:
                 'error': str(e)
             }
     
+    async def get_cached_profile(self, session_id: str) -> Dict[str, Any]:
+        """
+        User profile from the user_profiles collection, with stale-while-revalidate:
+        fresh entries are returned directly, stale ones are returned while a
+        background refresh runs, and missing or expired ones are fetched from Google.
+        """
+        record = None
+        if self.db is not None:
+            record = await self.db.user_profiles.find_one({'session_id': session_id, 'service': 'gmail'})
+        
+        if record and record.get('profile_data'):
+            try:
+                age = (datetime.utcnow() - datetime.fromisoformat(record['updated_at'])).total_seconds()
+            except (KeyError, TypeError, ValueError):
+                age = float('inf')
+            
+            if age <= GMAIL_PROFILE_STALE_SECONDS:
+                stale = age > GMAIL_PROFILE_FRESH_SECONDS
+                if stale:
+                    self._schedule_profile_refresh(session_id)
+                return {
+                    'success': True,
+                    'profile': record['profile_data'],
+                    'cached': True,
+                    'stale': stale,
+                    'age_seconds': round(age)
+                }
+        
+        result = await self.get_user_profile(session_id)
+        if not result.get('success') and record and record.get('profile_data'):
+            # Google unreachable: an old profile is better than no badge
+            return {'success': True, 'profile': record['profile_data'], 'cached': True, 'stale': True}
+        return {**result, 'cached': False}
+    
+    def _schedule_profile_refresh(self, session_id: str):
+        task = self._profile_refreshes.get(session_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self.get_user_profile(session_id))
+            self._profile_refreshes[session_id] = task
+            task.add_done_callback(lambda _: self._profile_refreshes.pop(session_id, None))
+    
     async def get_user_profile(self, session_id: str) -> Dict[str, Any]:
         """Fetch user profile information from Google"""
         try:
-            credentials = await self._load_token(session_id)
-            if not credentials:
+            client = await self._get_client(session_id)
+            if not client:
                 return {
                     'success': False,
                     'error': 'No authentication found. Please connect Gmail first.'
                 }
+            credentials = client.credentials
             
-            # Build OAuth2 service for user info
-            oauth2_service = build('oauth2', 'v2', credentials=credentials)
+            # OAuth2 service for user info, built once per cached client
+            oauth2_service = await self._run_blocking(session_id, lambda: client.oauth2_service)
             
             # Fetch user info
-            user_info = oauth2_service.userinfo().get().execute()
+            user_info = await self._execute(session_id, oauth2_service.userinfo().get(), credentials)
             
             # Fetch Gmail profile as well
-            gmail_service = build('gmail', 'v1', credentials=credentials)
-            gmail_profile = gmail_service.users().getProfile(userId='me').execute()
+            gmail_profile = await self._execute(session_id, client.service.users().getProfile(userId='me'), credentials)
             
             profile_data = {
                 'success': True,
@@ -531,7 +779,7 @@ class GmailOAuthService:
             }
             
             # Save profile to database
-            if self.db:
+            if self.db is not None:
                 await self.db.user_profiles.update_one(
                     {'session_id': session_id},
                     {
@@ -0,0 +1,235 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+# Gmail's published limits: 250 quota units per user per second, 1,200,000 per project per minute
+GMAIL_USER_UNITS_PER_SECOND = float(os.getenv("GMAIL_USER_UNITS_PER_SECOND", "250"))
+GMAIL_PROJECT_UNITS_PER_SECOND = float(os.getenv("GMAIL_PROJECT_UNITS_PER_SECOND", "20000"))
+GMAIL_RATE_LIMIT_MAX_RETRIES = int(os.getenv("GMAIL_RATE_LIMIT_MAX_RETRIES", "5"))
+GMAIL_BACKOFF_BASE_SECONDS = float(os.getenv("GMAIL_BACKOFF_BASE_SECONDS", "1"))
+GMAIL_BACKOFF_MAX_SECONDS = float(os.getenv("GMAIL_BACKOFF_MAX_SECONDS", "32"))
+
+# Quota units per method (https://developers.google.com/gmail/api/reference/quota)
+GMAIL_METHOD_COSTS = {
+    "gmail.users.messages.list": 5,
+    "gmail.users.messages.get": 5,
+    "gmail.users.messages.send": 100,
+    "gmail.users.messages.attachments.get": 5,
+    "gmail.users.getProfile": 1,
+    "gmail.users.history.list": 2,
+    "gmail.users.threads.list": 10,
+    "gmail.users.threads.get": 10
+}
+DEFAULT_METHOD_COST = 5
+
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
+
+def method_id(request) -> str:
+    return getattr(request, "methodId", None) or "unknown"
+
+def request_cost(request) -> int:
+    """Quota units for a request; a batch costs the sum of its parts"""
+    parts = getattr(request, "_requests", None)
+    if parts is not None:
+        return sum(request_cost(part) for part in parts.values())
+    name = method_id(request)
+    if not name.startswith("gmail."):
+        return 0  # userinfo and other APIs do not draw on Gmail quota
+    return GMAIL_METHOD_COSTS.get(name, DEFAULT_METHOD_COST)
+
+def is_rate_limited(error: HttpError) -> bool:
+    status = error.resp.status
+    if status == 429:
+        return True
+    if status == 403:
+        try:
+            reasons = {detail.get("reason") for detail in error.error_details or []}
+        except Exception:
+            reasons = set()
+        return bool(reasons & RATE_LIMIT_REASONS) or "rate limit" in str(error).lower()
+    return False
+
+def is_idempotent(request) -> bool:
+    """GET requests, or batches made only of them, can be sent again without side effects"""
+    parts = getattr(request, "_requests", None)
+    if parts is not None:
+        return all(is_idempotent(part) for part in parts.values())
+    return getattr(request, "method", None) == "GET"
+
+def is_retryable(error: HttpError, idempotent: bool = True) -> bool:
+    """
+    Rate limits are always retried: Gmail rejected the call before acting on
+    it. A 5xx may come after a send was accepted, so only reads retry those.
+    """
+    return is_rate_limited(error) or (idempotent and error.resp.status in (500, 502, 503, 504))
+
+class TokenBucket:
+    """Token bucket refilled continuously; waiters are served in arrival order"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, units: float):
+        units = min(units, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= units:
+                    self.tokens -= units
+                    return
+                await asyncio.sleep((units - self.tokens) / self.rate)
+
+    def penalize(self, seconds: float):
+        """After a 429, hold every queued request for this bucket, not just the one that failed"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    @property
+    def level(self) -> float:
+        self._refill(time.monotonic())
+        return self.tokens
+
+class GmailQuotaScheduler:
+    """
+    Sits in front of every Gmail API call. Each call first takes its quota
+    units from the user's bucket and the project's bucket, waiting in line
+    when either is empty instead of letting Gmail reject it. Identical reads
+    already in flight for the same session are coalesced into one call.
+    Rate limit and 5xx responses are retried with exponential backoff and
+    jitter, honouring Retry-After, and pause the user's whole bucket.
+    """
+
+    def __init__(self):
+        self.project_bucket = TokenBucket(GMAIL_PROJECT_UNITS_PER_SECOND)
+        self.user_buckets: Dict[str, TokenBucket] = {}
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.metrics = {
+            "calls": 0,
+            "units": 0,
+            "coalesced": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "queue_seconds_total": 0.0,
+            "queue_seconds_max": 0.0
+        }
+        self.by_method = defaultdict(lambda: {"calls": 0, "units": 0})
+
+    def _user_bucket(self, session_id: str) -> TokenBucket:
+        bucket = self.user_buckets.get(session_id)
+        if bucket is None:
+            if len(self.user_buckets) >= 10000:
+                # Full buckets carry no state worth keeping
+                for idle in [s for s, b in self.user_buckets.items() if b.level >= b.capacity]:
+                    del self.user_buckets[idle]
+            bucket = self.user_buckets[session_id] = TokenBucket(GMAIL_USER_UNITS_PER_SECOND)
+        return bucket
+
+    @staticmethod
+    def coalesce_key(session_id: str, request) -> Optional[Hashable]:
+        """Only plain GET requests are safe to share between callers"""
+        if getattr(request, "_requests", None) is not None or getattr(request, "method", None) != "GET":
+            return None
+        return (session_id, request.uri)
+
+    async def run(self, session_id: str, request, call: Callable[[], Awaitable[Any]]) -> Any:
+        key = self.coalesce_key(session_id, request)
+        if key is not None:
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                self.metrics["coalesced"] += 1
+                return await asyncio.shield(pending)
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[key] = future
+            try:
+                result = await self._run(session_id, request, call)
+                future.set_result(result)
+                return result
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                # Retrieve it so an unshared failure is not reported as never retrieved
+                future.exception()
+                raise
+            finally:
+                self._in_flight.pop(key, None)
+        return await self._run(session_id, request, call)
+
+    async def _run(self, session_id: str, request, call: Callable[[], Awaitable[Any]]) -> Any:
+        units = request_cost(request)
+        name = method_id(request) if getattr(request, "_requests", None) is None else "batch"
+        user_bucket = self._user_bucket(session_id)
+        idempotent = is_idempotent(request)
+
+        for attempt in range(GMAIL_RATE_LIMIT_MAX_RETRIES + 1):
+            queued_at = time.monotonic()
+            if units:
+                await user_bucket.acquire(units)
+                await self.project_bucket.acquire(units)
+            waited = time.monotonic() - queued_at
+            self.metrics["queue_seconds_total"] += waited
+            self.metrics["queue_seconds_max"] = max(self.metrics["queue_seconds_max"], waited)
+            self.metrics["calls"] += 1
+            self.metrics["units"] += units
+            self.by_method[name]["calls"] += 1
+            self.by_method[name]["units"] += units
+
+            try:
+                return await call()
+            except HttpError as e:
+                if not is_retryable(e, idempotent) or attempt == GMAIL_RATE_LIMIT_MAX_RETRIES:
+                    raise
+                delay = self._backoff(attempt, e)
+                if is_rate_limited(e):
+                    self.metrics["rate_limited"] += 1
+                    user_bucket.penalize(delay)
+                self.metrics["retries"] += 1
+                logger.warning(
+                    "⏳ Gmail %s for session %s returned %s, retrying in %.1fs (attempt %d)",
+                    name, session_id, e.resp.status, delay, attempt + 1
+                )
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _backoff(attempt: int, error: HttpError) -> float:
+        retry_after = error.resp.get("retry-after") if hasattr(error.resp, "get") else None
+        if retry_after:
+            try:
+                return min(GMAIL_BACKOFF_MAX_SECONDS, float(retry_after))
+            except ValueError:
+                pass
+        delay = min(GMAIL_BACKOFF_MAX_SECONDS, GMAIL_BACKOFF_BASE_SECONDS * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0) + random.uniform(0, 0.25)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        calls = self.metrics["calls"]
+        return {
+            **self.metrics,
+            "queue_seconds_avg": self.metrics["queue_seconds_total"] / calls if calls else 0.0,
+            "in_flight_coalescable": len(self._in_flight),
+            "users_tracked": len(self.user_buckets),
+            "project_units_available": round(self.project_bucket.level, 1),
+            "by_method": dict(self.by_method)
+        }
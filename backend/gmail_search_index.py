@@ -0,0 +1,171 @@
+import os
+import re
+import shlex
+import logging
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Number of per-session indexes kept in memory
+GMAIL_SEARCH_INDEX_SESSIONS = int(os.getenv("GMAIL_SEARCH_INDEX_SESSIONS", "64"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# is:/in: operators answered from labels; the bool says whether the label must be present
+LABEL_OPERATORS = {
+    "is:unread": ("UNREAD", True),
+    "is:read": ("UNREAD", False),
+    "is:starred": ("STARRED", True),
+    "is:important": ("IMPORTANT", True),
+    "in:inbox": ("INBOX", True),
+    "in:sent": ("SENT", True)
+}
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+def _intersect(left: array, right: array) -> array:
+    """Intersection of two ascending posting lists"""
+    if len(left) > len(right):
+        left, right = right, left
+    result = array('I')
+    i = j = 0
+    while i < len(left) and j < len(right):
+        a, b = left[i], right[j]
+        if a == b:
+            result.append(a)
+            i += 1
+            j += 1
+        elif a < b:
+            i += 1
+        else:
+            j += 1
+    return result
+
+def _difference(left: array, right: array) -> array:
+    excluded = set(right)
+    return array('I', (doc for doc in left if doc not in excluded))
+
+class MailboxIndex:
+    """
+    Inverted index over one mailbox's mirrored metadata.
+
+    Documents are numbered newest first, so every posting list (an
+    array('I') of document numbers) is ascending and intersections come
+    out already in the order check_inbox returns.
+    """
+
+    def __init__(self, messages: Iterable[Dict[str, Any]], version: Any = None):
+        self.version = version
+        self.documents = sorted(messages, key=lambda m: m.get('internal_date', 0), reverse=True)
+        self.postings: Dict[str, array] = {}
+        self._all = array('I', range(len(self.documents)))
+
+        for doc_number, message in enumerate(self.documents):
+            from_tokens = tokenize(message.get('from', ''))
+            subject_tokens = tokenize(message.get('subject', ''))
+            keys = {f"from:{t}" for t in from_tokens}
+            keys.update(f"subject:{t}" for t in subject_tokens)
+            keys.update(f"label:{label}" for label in message.get('labels', []))
+            for key in keys:
+                posting = self.postings.get(key)
+                if posting is None:
+                    posting = self.postings[key] = array('I')
+                posting.append(doc_number)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _posting(self, key: str) -> array:
+        return self.postings.get(key, array('I'))
+
+    def search(self, query: str, max_results: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Messages matching a Gmail-style query, newest first, or None if the
+        query uses syntax this index cannot answer exactly (OR, negation,
+        dates, attachments, ...). Free-text terms are not answered either:
+        Gmail also matches them against message bodies, which the mirror
+        does not hold.
+        """
+        try:
+            terms = shlex.split(query or "")
+        except ValueError:
+            return None
+        if not terms:
+            return None  # all mail: not something a partial mirror can list
+
+        required: List[array] = []
+        excluded: List[array] = []
+        phrases = []
+        for term in terms:
+            lowered = term.lower()
+            if lowered in LABEL_OPERATORS:
+                label, present = LABEL_OPERATORS[lowered]
+                (required if present else excluded).append(self._posting(f"label:{label}"))
+                continue
+
+            field, sep, value = lowered.partition(":")
+            if not sep or field not in ("from", "subject"):
+                return None
+            prefix = f"{field}:"
+
+            tokens = tokenize(value)
+            if not tokens:
+                return None
+            required.extend(self._posting(prefix + token) for token in tokens)
+            if len(tokens) > 1:
+                # Quoted phrases must match as adjacent words, not just all present
+                phrases.append((field, " ".join(tokens)))
+
+        # Smallest lists first keeps every intersection step cheap
+        matches = self._all
+        for posting in sorted(required, key=len):
+            matches = _intersect(matches, posting)
+            if not matches:
+                break
+        for posting in excluded:
+            matches = _difference(matches, posting)
+
+        results = []
+        for doc_number in matches:
+            message = self.documents[doc_number]
+            if phrases and not all(self._contains_phrase(message, field, phrase) for field, phrase in phrases):
+                continue
+            results.append(message)
+            if len(results) >= max_results:
+                break
+        return results
+
+    @staticmethod
+    def _contains_phrase(message: Dict[str, Any], field: str, phrase: str) -> bool:
+        return f" {phrase} " in f" {' '.join(tokenize(message.get(field, '')))} "
+
+class GmailSearchIndex:
+    """LRU of per-session MailboxIndex objects, rebuilt when the mirror's sync version changes"""
+
+    def __init__(self, max_sessions: int = None):
+        self.max_sessions = max_sessions or GMAIL_SEARCH_INDEX_SESSIONS
+        self._indexes: "OrderedDict[str, MailboxIndex]" = OrderedDict()
+        self.stats = {"queries": 0, "answered": 0, "unsupported": 0, "builds": 0}
+
+    def get(self, session_id: str, version: Any) -> Optional[MailboxIndex]:
+        index = self._indexes.get(session_id)
+        if index is None or index.version != version:
+            return None
+        self._indexes.move_to_end(session_id)
+        return index
+
+    def put(self, session_id: str, messages: Iterable[Dict[str, Any]], version: Any) -> MailboxIndex:
+        index = MailboxIndex(messages, version)
+        self._indexes[session_id] = index
+        self._indexes.move_to_end(session_id)
+        while len(self._indexes) > self.max_sessions:
+            self._indexes.popitem(last=False)
+        self.stats["builds"] += 1
+        logger.debug("Built Gmail search index for session %s: %d messages, %d terms", session_id, len(index), len(index.postings))
+        return index
+
+    def invalidate(self, session_id: str):
+        self._indexes.pop(session_id, None)
@@ -0,0 +1,186 @@
+import os
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Scheduler settings from environment
+GMAIL_TOKEN_REFRESH_INTERVAL = float(os.getenv("GMAIL_TOKEN_REFRESH_INTERVAL_SECONDS", "60"))
+# Tokens expiring within this window are refreshed ahead of time
+GMAIL_TOKEN_REFRESH_LEAD = float(os.getenv("GMAIL_TOKEN_REFRESH_LEAD_SECONDS", "600"))
+GMAIL_TOKEN_REFRESH_CONCURRENCY = int(os.getenv("GMAIL_TOKEN_REFRESH_CONCURRENCY", "8"))
+# Random delay per refresh so tokens issued together do not hit Google together
+GMAIL_TOKEN_REFRESH_JITTER = float(os.getenv("GMAIL_TOKEN_REFRESH_JITTER_SECONDS", "30"))
+GMAIL_TOKEN_REFRESH_BATCH_SIZE = int(os.getenv("GMAIL_TOKEN_REFRESH_BATCH_SIZE", "200"))
+# How long one replica holds a token while refreshing it
+GMAIL_TOKEN_REFRESH_LEASE = float(os.getenv("GMAIL_TOKEN_REFRESH_LEASE_SECONDS", "120"))
+GMAIL_TOKEN_REFRESH_RETRY = float(os.getenv("GMAIL_TOKEN_REFRESH_RETRY_SECONDS", "300"))
+# Sessions unused for this long are left to refresh on demand at their next request (0 disables)
+GMAIL_TOKEN_REFRESH_IDLE_DAYS = float(os.getenv("GMAIL_TOKEN_REFRESH_IDLE_DAYS", "14"))
+
+class GmailTokenRefresher:
+    """
+    Background scheduler that refreshes Gmail OAuth tokens shortly before they
+    expire, so request handlers find valid credentials and skip the refresh.
+
+    Each pass scans oauth_tokens for tokens expiring within the lead window
+    whose session was used recently (last_used_at, written by the OAuth
+    service), claims each with a short lease (so several replicas do not refresh the
+    same token), refreshes with bounded concurrency and jitter, then writes the
+    new token with a compare-and-set on the old one and updates the in-process
+    client cache.
+    """
+
+    def __init__(self, db, gmail_service):
+        self.collection = db.oauth_tokens
+        self.gmail = gmail_service
+        self._semaphore = asyncio.Semaphore(GMAIL_TOKEN_REFRESH_CONCURRENCY)
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"scans": 0, "refreshed": 0, "lost_race": 0, "failed": 0, "revoked": 0}
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("service", 1), ("expiry", 1)])
+
+    def _due_filter(self, now: datetime) -> Dict[str, Any]:
+        # expiry and last_used_at are stored as naive UTC ISO strings, which sort chronologically
+        due = {
+            "service": "gmail",
+            "refresh_token": {"$ne": None},
+            "expiry": {"$ne": None, "$lte": (now + timedelta(seconds=GMAIL_TOKEN_REFRESH_LEAD)).isoformat()},
+            "refresh_retry_at": {"$not": {"$gt": now.isoformat()}},
+            "refresh_lease_until": {"$not": {"$gt": now.isoformat()}}
+        }
+        if GMAIL_TOKEN_REFRESH_IDLE_DAYS > 0:
+            # Tokens saved before last_used_at existed have none and wait for their next request
+            due["last_used_at"] = {"$gte": (now - timedelta(days=GMAIL_TOKEN_REFRESH_IDLE_DAYS)).isoformat()}
+        return due
+
+    async def scan(self) -> int:
+        """Refresh every token that is due; returns how many were attempted"""
+        self.stats["scans"] += 1
+        cursor = self.collection.find(
+            self._due_filter(datetime.utcnow()), {"session_id": 1, "token": 1}
+        ).sort("expiry", 1).limit(GMAIL_TOKEN_REFRESH_BATCH_SIZE)
+        records = await cursor.to_list(length=GMAIL_TOKEN_REFRESH_BATCH_SIZE)
+        if records:
+            await asyncio.gather(*(self._refresh_with_jitter(record) for record in records))
+        return len(records)
+
+    async def _refresh_with_jitter(self, record: Dict[str, Any]):
+        await asyncio.sleep(random.uniform(0, GMAIL_TOKEN_REFRESH_JITTER))
+        async with self._semaphore:
+            try:
+                await self.refresh(record["session_id"], record["token"])
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"❌ Background token refresh failed for session {record['session_id']}: {e}")
+
+    async def refresh(self, session_id: str, old_token: str) -> bool:
+        now = datetime.utcnow()
+        # Claim: only the replica whose lease write matches refreshes this token
+        claimed = await self.collection.find_one_and_update(
+            {
+                "session_id": session_id,
+                "service": "gmail",
+                "token": old_token,
+                "refresh_lease_until": {"$not": {"$gt": now.isoformat()}}
+            },
+            {"$set": {"refresh_lease_until": (now + timedelta(seconds=GMAIL_TOKEN_REFRESH_LEASE)).isoformat()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not claimed:
+            self.stats["lost_race"] += 1
+            return False
+
+        cached = self.gmail.clients.get(session_id)
+        if cached is not None:
+            # Refresh the cached client's own credentials so its service picks up the new token
+            async with cached.refresh_lock:
+                credentials = cached.credentials
+                if credentials.token == old_token:
+                    refreshed = await self._refresh_credentials(session_id, credentials)
+                else:
+                    refreshed = True  # a request already refreshed it
+        else:
+            credentials = self.gmail._credentials_from_record(claimed)
+            refreshed = await self._refresh_credentials(session_id, credentials)
+
+        if not refreshed:
+            return False
+
+        # Compare-and-set on the old token: a newer token saved meanwhile (e.g. a fresh login) wins
+        result = await self.collection.update_one(
+            {"session_id": session_id, "service": "gmail", "token": old_token},
+            {
+                "$set": {
+                    "token": credentials.token,
+                    "expiry": credentials.expiry.isoformat() if credentials.expiry else None,
+                    "updated_at": datetime.utcnow().isoformat(),
+                    "refresh_error": None,
+                    "refresh_retry_at": None
+                },
+                "$unset": {"refresh_lease_until": ""}
+            }
+        )
+        if result.modified_count == 0:
+            self.stats["lost_race"] += 1
+            return False
+
+        self.stats["refreshed"] += 1
+        logger.info("🔄 Gmail token refreshed ahead of expiry for session: %s", session_id)
+        return True
+
+    async def _refresh_credentials(self, session_id: str, credentials) -> bool:
+        try:
+            await self.gmail._run_blocking(session_id, credentials.refresh, Request())
+            return True
+        except RefreshError as e:
+            # Revoked or expired grant: retrying will not help until the user logs in again
+            self.stats["revoked"] += 1
+            self.gmail.clients.invalidate(session_id)
+            await self._release(session_id, str(e), retry_at=datetime.max)
+            logger.warning(f"⚠️ Gmail refresh token rejected for session {session_id}: {e}")
+        except Exception as e:
+            self.stats["failed"] += 1
+            await self._release(session_id, str(e), retry_at=datetime.utcnow() + timedelta(seconds=GMAIL_TOKEN_REFRESH_RETRY))
+            logger.error(f"❌ Gmail token refresh error for session {session_id}: {e}")
+        return False
+
+    async def _release(self, session_id: str, error: str, retry_at: datetime):
+        await self.collection.update_one(
+            {"session_id": session_id, "service": "gmail"},
+            {
+                "$set": {"refresh_error": error, "refresh_retry_at": retry_at.isoformat()},
+                "$unset": {"refresh_lease_until": ""}
+            }
+        )
+
+    async def _run(self):
+        while True:
+            try:
+                await self.scan()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Gmail token refresh scan failed: {e}")
+            await asyncio.sleep(GMAIL_TOKEN_REFRESH_INTERVAL)
+
+    async def start(self):
+        try:
+            await self.ensure_indexes()
+        except Exception as e:
+            logger.warning(f"Gmail token refresher index creation failed: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
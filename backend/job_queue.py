@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import random
+import socket
+import os
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+class MongoJobQueue(ABC):
+    """
+    Durable job queue backed by a MongoDB collection.
+    Jobs move pending -> processing -> completed/failed through atomic
+    find_one_and_update transitions, so any number of API processes can share
+    one queue and a job is only ever held by a single worker at a time.
+    """
+
+    def __init__(
+        self,
+        collection,
+        name: str = "jobs",
+        concurrency: int = 4,
+        max_attempts: int = 5,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        visibility_timeout: float = 120.0,
+        poll_interval: float = 1.0,
+        transactional: bool = False
+    ):
+        self.collection = collection
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Transactions need a replica set; standalone servers fall back to ordered writes
+        self.transactional = transactional
+
+        self._runner = None
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._tasks = set()
+
+    async def ensure_indexes(self):
+        """Create the indexes used by claim and status lookups"""
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index([("status", 1), ("next_attempt_at", 1)])
+        await self.collection.create_index([("status", 1), ("locked_until", 1)])
+
+    async def run_atomically(self, writes):
+        """
+        Run writes(session) inside a MongoDB transaction when enabled.
+        Without replica set support the writes run in order with session=None.
+        """
+        if self.transactional:
+            try:
+                async with await self.collection.database.client.start_session() as session:
+                    return await session.with_transaction(writes)
+            except OperationFailure as e:
+                if e.code not in (20, 263) and "Transaction numbers" not in str(e):
+                    raise
+                logger.warning(f"{self.name} queue: transactions unsupported by MongoDB deployment, using ordered writes")
+                self.transactional = False
+        return await writes(None)
+
+    async def enqueue(self, payload: Dict[str, Any], job_id: str = None, session=None, **fields) -> Dict[str, Any]:
+        """Persist a new pending job and wake the local workers"""
+        now = datetime.utcnow()
+        job = {
+            "id": job_id or str(uuid.uuid4()),
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "next_attempt_at": now,
+            "locked_until": None,
+            "worker_id": None,
+            "last_error": None,
+            "result": None,
+            "created_at": now,
+            "updated_at": now,
+            **fields
+        }
+        await self.collection.insert_one(job, session=session)
+        self.notify()
+        return job
+
+    async def enqueue_many(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Persist many pending jobs with one insert. Each entry is a dict with a
+        payload and optional id, next_attempt_at and extra fields.
+        """
+        now = datetime.utcnow()
+        documents = []
+        for entry in jobs:
+            entry = dict(entry)
+            documents.append({
+                "id": entry.pop("id", None) or str(uuid.uuid4()),
+                "payload": entry.pop("payload"),
+                "status": "pending",
+                "attempts": 0,
+                "max_attempts": self.max_attempts,
+                "next_attempt_at": entry.pop("next_attempt_at", None) or now,
+                "locked_until": None,
+                "worker_id": None,
+                "last_error": None,
+                "result": None,
+                "created_at": now,
+                "updated_at": now,
+                **entry
+            })
+        if documents:
+            await self.collection.insert_many(documents, ordered=False)
+            self.notify()
+        return documents
+
+    def notify(self):
+        """Wake the worker loop so a fresh job is picked up without waiting for the next poll"""
+        self._wakeup.set()
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the next due job, including jobs whose worker lease expired"""
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "processing", "locked_until": {"$lte": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": "processing",
+                    "locked_until": now + timedelta(seconds=self.visibility_timeout),
+                    "worker_id": self.worker_id,
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"id": job_id})
+
+    def backoff_delay(self, attempts: int) -> float:
+        """Exponential backoff with jitter for the given attempt count"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    @abstractmethod
+    async def process(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a job and return its result dict"""
+
+    def is_transient_failure(self, result: Dict[str, Any]) -> bool:
+        """Whether a failed result should be retried. Subclasses refine this."""
+        return False
+
+    async def on_finished(self, job: Dict[str, Any], status: str, result: Dict[str, Any], session=None):
+        """Hook called once a job reaches a terminal or retry state, in the same transaction"""
+
+    async def _finish(self, job: Dict[str, Any], status: str, result: Dict[str, Any], error: str = None, defer: float = None):
+        now = datetime.utcnow()
+        update = {
+            "status": status,
+            "result": result,
+            "last_error": error,
+            "locked_until": None,
+            "updated_at": now
+        }
+        if defer is not None:
+            # Deferred jobs were never attempted, so they keep their attempt budget
+            update["next_attempt_at"] = now + timedelta(seconds=defer)
+            update["attempts"] = max(0, job["attempts"] - 1)
+        elif status == "pending":
+            update["next_attempt_at"] = now + timedelta(seconds=self.backoff_delay(job["attempts"]))
+        else:
+            update["finished_at"] = now
+
+        async def writes(session):
+            # Only the worker holding the lease may move the job on
+            updated = await self.collection.find_one_and_update(
+                {"id": job["id"], "status": "processing", "worker_id": self.worker_id},
+                {"$set": update},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if updated is None:
+                logger.warning(f"{self.name} job {job['id']} lease lost before completion")
+                return
+            await self.on_finished(updated, status, result, session=session)
+
+        await self.run_atomically(writes)
+
+    async def _handle(self, job: Dict[str, Any]):
+        try:
+            try:
+                result = await self.process(job)
+                if result.get("defer_seconds") is not None:
+                    # process() declined to run the job yet, e.g. a rate limit; try again later
+                    await self._finish(job, "pending", None, None, defer=result["defer_seconds"])
+                    return
+                error = None if result.get("success") else result.get("message") or result.get("error")
+                transient = not result.get("success") and self.is_transient_failure(result)
+            except Exception as e:
+                logger.error(f"{self.name} job {job['id']} raised: {e}")
+                result = {"success": False, "error": "exception", "message": str(e)}
+                error = str(e)
+                transient = True
+
+            if result.get("success"):
+                status = "completed"
+            elif transient and job["attempts"] < job.get("max_attempts", self.max_attempts):
+                status = "pending"
+            else:
+                status = "failed"
+
+            await self._finish(job, status, result, error)
+        except Exception as e:
+            logger.error(f"{self.name} job {job['id']} could not be finalized: {e}")
+
+    async def _run(self):
+        logger.info(f"{self.name} worker {self.worker_id} started (concurrency={self.concurrency})")
+        while not self._stopping:
+            await self._slots.acquire()
+            self._wakeup.clear()
+            try:
+                job = await self.claim()
+            except Exception as e:
+                self._slots.release()
+                logger.error(f"{self.name} claim error: {e}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if job is None:
+                self._slots.release()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._handle(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            task.add_done_callback(lambda _: self._slots.release())
+
+    async def drain(self, concurrency: int = None) -> int:
+        """
+        Process due jobs until none are left, with bounded concurrency.
+        Used for one-off backfills; returns the number of jobs handled.
+        """
+        slots = asyncio.Semaphore(concurrency or self.concurrency)
+        tasks = set()
+        handled = 0
+
+        while True:
+            await slots.acquire()
+            job = await self.claim()
+            if job is None:
+                slots.release()
+                if not tasks:
+                    break
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            handled += 1
+            task = asyncio.create_task(self._handle(job))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+        return handled
+
+    async def start(self):
+        """Start the background worker loop for this process"""
+        if self._runner:
+            return
+        self._stopping = False
+        try:
+            await self.ensure_indexes()
+        except Exception as e:
+            logger.warning(f"{self.name} index creation failed: {e}")
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop claiming new jobs and give in-flight jobs a chance to finish"""
+        self._stopping = True
+        self.notify()
+        if self._runner:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        if self._tasks:
+            # Unfinished jobs keep their lease and are reclaimed after it expires
+            await asyncio.wait(list(self._tasks), timeout=timeout)
@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import queue
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# Pipeline settings from environment
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # "json" or "text"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_FIELD_LENGTH = int(os.getenv("LOG_MAX_FIELD_LENGTH", "1000"))
+# Per-logger sampling of INFO/DEBUG records, e.g. "webhook_handler=0.1,gmail_oauth_service=0.25"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def truncate(value, limit: int = None) -> str:
+    """Render a value for logging, cutting it to the configured length"""
+    limit = limit or LOG_MAX_FIELD_LENGTH
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) > limit:
+        return f"{text[:limit]}... [{len(text) - limit} chars truncated]"
+    return text
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for entry in spec.split(","):
+        name, _, rate = entry.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of high-volume INFO/DEBUG records per logger.
+    Warnings and errors always pass.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rates.get(record.name)
+        if rate is None or rate >= 1.0 or random.random() < rate:
+            return True
+        self.dropped += 1
+        return False
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with message and extra fields truncated"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        try:
+            message = record.getMessage()
+        except Exception:
+            message = f"{record.msg} {record.args}"
+
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": truncate(message)
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (int, float, bool)) or value is None else truncate(value)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TruncatingFormatter(logging.Formatter):
+    """Plain text formatter that caps the rendered message length"""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = truncate(record.message)
+        return super().formatMessage(record)
+
+# Immutable values that are safe to format later on the listener thread
+_PRIMITIVE_ARGS = (str, int, float, bool, bytes, type(None))
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves message formatting to the listener thread.
+    The stock QueueHandler formats in the caller; here the caller only pays
+    for creating the record, unless an argument is a mutable object that must
+    be rendered before it changes. A full queue drops the record instead of blocking.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Tracebacks must be rendered before the frames go away
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        # Mutable or lazy args could change before the listener formats them; render those now
+        if record.args:
+            args = record.args.values() if isinstance(record.args, dict) else record.args
+            if not all(isinstance(arg, _PRIMITIVE_ARGS) for arg in args):
+                record.msg = record.getMessage()
+                record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """Queue listener whose stop() waits for room rather than failing on a full queue"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+def configure_logging(stream=None) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a bounded queue drained by a background thread,
+    so log formatting and stdout writes never run on the event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    stream_handler = logging.StreamHandler(stream or sys.stdout)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(TruncatingFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(LOG_SAMPLE_RATES)))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = DrainingQueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
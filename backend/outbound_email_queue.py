@@ -0,0 +1,183 @@
+import os
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from job_queue import MongoJobQueue
+from gmail_quota import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Emails one session may send per minute; bulk sends are spread out to match
+OUTBOUND_EMAIL_PER_USER_PER_MINUTE = float(os.getenv("OUTBOUND_EMAIL_PER_USER_PER_MINUTE", "60"))
+OUTBOUND_EMAIL_MAX_BULK = int(os.getenv("OUTBOUND_EMAIL_MAX_BULK", "1000"))
+# Domain for the Message-ID header that makes retried sends detectable
+OUTBOUND_EMAIL_MESSAGE_ID_DOMAIN = os.getenv("OUTBOUND_EMAIL_MESSAGE_ID_DOMAIN", "elva.ai")
+
+# send_email failures worth another attempt
+TRANSIENT_SEND_ERRORS = {"exception"}
+
+class OutboundEmailQueue(MongoJobQueue):
+    """
+    Outbound mail persisted in Mongo (outbound_emails) and sent by a pool of
+    background workers through GmailOAuthService.send_email.
+
+    Every job carries a stable Message-ID header; before retrying a job that
+    may already have gone out, the worker looks for that id in the sender's
+    Sent folder, so a timeout after delivery does not send a duplicate.
+    Sends are limited per session: bulk enqueues are staggered to the
+    per-minute rate, and a worker that still finds the session over its rate
+    defers the job without spending an attempt.
+    """
+
+    def __init__(self, db, gmail_service):
+        super().__init__(
+            db.outbound_emails,
+            name="outbound_email",
+            concurrency=int(os.getenv("OUTBOUND_EMAIL_WORKER_CONCURRENCY", "8")),
+            max_attempts=int(os.getenv("OUTBOUND_EMAIL_MAX_ATTEMPTS", "5")),
+            backoff_base=float(os.getenv("OUTBOUND_EMAIL_BACKOFF_BASE_SECONDS", "5")),
+            backoff_max=float(os.getenv("OUTBOUND_EMAIL_BACKOFF_MAX_SECONDS", "600")),
+            visibility_timeout=float(os.getenv("OUTBOUND_EMAIL_LEASE_SECONDS", "120"))
+        )
+        self.gmail = gmail_service
+        self._send_buckets: Dict[str, TokenBucket] = {}
+
+    async def ensure_indexes(self):
+        await super().ensure_indexes()
+        await self.collection.create_index([("batch_id", 1), ("status", 1)])
+        await self.collection.create_index([("session_id", 1), ("created_at", -1)])
+
+    def _send_bucket(self, session_id: str) -> TokenBucket:
+        bucket = self._send_buckets.get(session_id)
+        if bucket is None:
+            rate = OUTBOUND_EMAIL_PER_USER_PER_MINUTE / 60.0
+            # Allow a short burst of up to ten messages before pacing kicks in
+            bucket = self._send_buckets[session_id] = TokenBucket(rate, capacity=min(10.0, OUTBOUND_EMAIL_PER_USER_PER_MINUTE))
+        return bucket
+
+    async def enqueue_emails(self, session_id: str, emails: List[Dict[str, Any]], sender_email: str = None) -> Dict[str, Any]:
+        """
+        Queue one job per email and return immediately. Each email is a dict
+        with to, subject, body and optional cc/bcc. Jobs for a session are
+        scheduled no faster than its per-minute send rate.
+        """
+        batch_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        spacing = 60.0 / OUTBOUND_EMAIL_PER_USER_PER_MINUTE
+
+        # Start after whatever this session already has waiting
+        last_pending = await self.collection.find_one(
+            {"session_id": session_id, "status": "pending"},
+            sort=[("next_attempt_at", -1)]
+        )
+        start = max(now, last_pending["next_attempt_at"] + timedelta(seconds=spacing)) if last_pending else now
+
+        jobs = []
+        for position, email in enumerate(emails):
+            job_id = str(uuid.uuid4())
+            jobs.append({
+                "id": job_id,
+                "payload": {
+                    "to": email["to"],
+                    "subject": email["subject"],
+                    "body": email["body"],
+                    "cc": email.get("cc"),
+                    "bcc": email.get("bcc"),
+                    "from": sender_email,
+                    "rfc822_message_id": f"<{job_id}@{OUTBOUND_EMAIL_MESSAGE_ID_DOMAIN}>"
+                },
+                "next_attempt_at": start + timedelta(seconds=spacing * position),
+                "batch_id": batch_id,
+                "session_id": session_id,
+                "to": email["to"]
+            })
+
+        documents = await self.enqueue_many(jobs)
+        logger.info("📤 Queued %d outbound emails for session %s (batch %s)", len(documents), session_id, batch_id)
+        return {
+            "batch_id": batch_id,
+            "job_ids": [document["id"] for document in documents],
+            "scheduled_until": documents[-1]["next_attempt_at"] if documents else now
+        }
+
+    async def process(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        payload = job["payload"]
+        session_id = job["session_id"]
+
+        bucket = self._send_bucket(session_id)
+        if bucket.level < 1:
+            return {"defer_seconds": (1 - bucket.level) / bucket.rate}
+        await bucket.acquire(1)
+
+        if job["attempts"] > 1:
+            # An earlier attempt may have been delivered before it failed or timed out
+            sent_id = await self.gmail.find_sent_message(session_id, payload["rfc822_message_id"])
+            if sent_id:
+                return {"success": True, "data": {"message_id": sent_id, "to": payload["to"]}, "deduplicated": True}
+
+        return await self.gmail.send_email(
+            to=payload["to"],
+            subject=payload["subject"],
+            body=payload["body"],
+            sender_email=payload.get("from"),
+            cc=payload.get("cc"),
+            bcc=payload.get("bcc"),
+            session_id=session_id,
+            rfc822_message_id=payload["rfc822_message_id"]
+        )
+
+    def is_transient_failure(self, result: Dict[str, Any]) -> bool:
+        if result.get("requires_auth"):
+            return False
+        if result.get("error") in TRANSIENT_SEND_ERRORS or result.get("rate_limited"):
+            return True
+        status_code = result.get("status_code") or 0
+        return result.get("error") == "http_error" and (status_code >= 500 or status_code == 429)
+
+    async def on_finished(self, job: Dict[str, Any], status: str, result: Dict[str, Any], session=None):
+        if status == "failed":
+            logger.warning(f"📭 Outbound email {job['id']} to {job['to']} failed after {job['attempts']} attempts: {job.get('last_error')}")
+        elif status == "completed":
+            logger.debug("Outbound email %s delivered to %s", job["id"], job["to"])
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        result = job.get("result") or {}
+        return {
+            "job_id": job["id"],
+            "batch_id": job.get("batch_id"),
+            "to": job.get("to"),
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "next_attempt_at": job.get("next_attempt_at") if job["status"] == "pending" else None,
+            "gmail_message_id": (result.get("data") or {}).get("message_id"),
+            "last_error": job.get("last_error"),
+            "finished_at": job.get("finished_at")
+        }
+
+    async def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.get_job(job_id)
+        return self._public(job) if job else None
+
+    async def get_batch_status(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        counts = {}
+        async for row in self.collection.aggregate([
+            {"$match": {"batch_id": batch_id}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]):
+            counts[row["_id"]] = row["count"]
+        if not counts:
+            return None
+
+        failed = await self.collection.find(
+            {"batch_id": batch_id, "status": "failed"}
+        ).to_list(length=100)
+        return {
+            "batch_id": batch_id,
+            "total": sum(counts.values()),
+            "counts": counts,
+            "done": not (counts.get("pending") or counts.get("processing")),
+            "failed": [self._public(job) for job in failed]
+        }
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Replay / backfill CLI for the n8n webhook outbox.
+
+Drains every due outbox entry (including entries whose worker died mid-delivery)
+with bounded concurrency, using the same at-least-once delivery path and
+idempotency keys as the API workers, so it is safe to run next to them.
+
+Usage:
+    python outbox_replay.py --concurrency 64
+    python outbox_replay.py --requeue-failed --since 2025-01-01T00:00:00 --due-now
+    python outbox_replay.py --dry-run
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from approval_queue import ApprovalQueue  # noqa: E402
+from webhook_handler import close_http_client, webhook_batcher  # noqa: E402
+
+logger = logging.getLogger("outbox_replay")
+
+
+async def replay(args) -> int:
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    queue = ApprovalQueue(db)
+
+    try:
+        since_filter = {"created_at": {"$gte": datetime.fromisoformat(args.since)}} if args.since else {}
+
+        if args.dry_run:
+            for status in ("pending", "processing", "failed"):
+                count = await queue.collection.count_documents({"status": status, **since_filter})
+                print(f"{status:>10}: {count}")
+            return 0
+
+        recreated = await queue.reconcile_orphans(older_than_seconds=args.orphan_age)
+
+        if args.requeue_failed:
+            result = await queue.collection.update_many(
+                {"status": "failed", **since_filter},
+                {"$set": {"status": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow()}}
+            )
+            print(f"Requeued {result.modified_count} failed entries")
+
+        if args.due_now:
+            result = await queue.collection.update_many(
+                {"status": "pending", **since_filter},
+                {"$set": {"next_attempt_at": datetime.utcnow()}}
+            )
+            print(f"Made {result.modified_count} backed-off entries due now")
+
+        started = time.perf_counter()
+        handled = await queue.drain(concurrency=args.concurrency)
+        await webhook_batcher.flush_all()
+        elapsed = time.perf_counter() - started
+
+        delivered = await queue.collection.count_documents({"status": "completed", "worker_id": queue.worker_id})
+        failed = await queue.collection.count_documents({"status": "failed", "worker_id": queue.worker_id})
+        print(
+            f"Drained {handled} entries in {elapsed:.1f}s "
+            f"({handled / elapsed if elapsed else 0:.1f}/s): "
+            f"{delivered} delivered, {failed} failed, {recreated} orphans recreated"
+        )
+        return 0 if failed == 0 else 1
+    finally:
+        await close_http_client()
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32, help="deliveries in flight at once")
+    parser.add_argument("--requeue-failed", action="store_true", help="reset failed entries to pending first")
+    parser.add_argument("--due-now", action="store_true", help="ignore remaining backoff delays")
+    parser.add_argument("--since", help="only touch entries created at or after this ISO timestamp")
+    parser.add_argument("--orphan-age", type=float, default=60.0, help="seconds before an approval without an entry is recreated")
+    parser.add_argument("--dry-run", action="store_true", help="only print backlog counts")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    raise SystemExit(asyncio.run(replay(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Page counts as settled after this long with no DOM mutations and no network activity
+SCRAPE_SETTLE_QUIET_MS = float(os.getenv("SCRAPE_SETTLE_QUIET_MS", "300"))
+# Upper bound on settling; extract_dynamic_data also caps it by what is left of its page timeout
+SCRAPE_SETTLE_TIMEOUT_MS = float(os.getenv("SCRAPE_SETTLE_TIMEOUT_MS", "10000"))
+# Sweeps to the bottom; only pages that keep growing (infinite feeds) need more than one
+SCRAPE_SETTLE_MAX_SCROLLS = int(os.getenv("SCRAPE_SETTLE_MAX_SCROLLS", "10"))
+# Steps per sweep, two viewports and one animation frame each; lazy loaders look further
+# ahead than that (Chromium loads lazy images 1250px+ early), so none are skipped
+SCRAPE_SETTLE_SWEEP_STEPS = int(os.getenv("SCRAPE_SETTLE_SWEEP_STEPS", "60"))
+# Requests open longer than this (long polling, beacons, streams) do not keep the page busy
+SCRAPE_SETTLE_LONG_REQUEST_MS = float(os.getenv("SCRAPE_SETTLE_LONG_REQUEST_MS", "2000"))
+_POLL_SECONDS = 0.05
+
+# Records the time of the last DOM mutation; installed once per document
+_OBSERVE_SCRIPT = """
+() => {
+    if (!window.__elvaSettle) {
+        const state = {last: performance.now()};
+        new MutationObserver(() => { state.last = performance.now(); })
+            .observe(document, {childList: true, subtree: true, characterData: true});
+        window.__elvaSettle = state;
+    }
+    return true;
+}
+"""
+
+_MUTATION_IDLE_SCRIPT = "() => window.__elvaSettle ? performance.now() - window.__elvaSettle.last : 1e9"
+
+_SWEEP_SCRIPT = """
+async (maxSteps) => {
+    const root = document.scrollingElement || document.documentElement;
+    const frame = () => new Promise(resolve => requestAnimationFrame(() => resolve()));
+    for (let step = 0; step < maxSteps; step++) {
+        if (window.scrollY + window.innerHeight >= root.scrollHeight - 2) break;
+        window.scrollBy(0, 2 * window.innerHeight);
+        await Promise.race([frame(), new Promise(resolve => setTimeout(resolve, 50))]);
+    }
+    window.scrollTo(0, root.scrollHeight);
+    return {height: root.scrollHeight, bottom: window.scrollY + window.innerHeight};
+}
+"""
+
+_HEIGHT_SCRIPT = "() => (document.scrollingElement || document.documentElement).scrollHeight"
+
+@dataclass
+class SettleResult:
+    stable: bool
+    scrolls: int
+    height: int
+    waited_ms: float
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"stable": self.stable, "scrolls": self.scrolls, "height": self.height, "waited_ms": round(self.waited_ms)}
+
+class NetworkTracker:
+    """Counts a page's in-flight requests through Playwright events"""
+
+    def __init__(self, page):
+        self.page = page
+        self.in_flight: Dict[Any, float] = {}
+        self.last_activity = time.monotonic()
+
+    def _started(self, request):
+        self.in_flight[request] = time.monotonic()
+        self.last_activity = time.monotonic()
+
+    def _finished(self, request):
+        self.in_flight.pop(request, None)
+        self.last_activity = time.monotonic()
+
+    def __enter__(self):
+        self.page.on("request", self._started)
+        self.page.on("requestfinished", self._finished)
+        self.page.on("requestfailed", self._finished)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.page.remove_listener("request", self._started)
+        self.page.remove_listener("requestfinished", self._finished)
+        self.page.remove_listener("requestfailed", self._finished)
+
+    def idle_ms(self) -> float:
+        """Milliseconds the network has been quiet, ignoring long-lived requests"""
+        now = time.monotonic()
+        cutoff = SCRAPE_SETTLE_LONG_REQUEST_MS / 1000
+        if any(now - started < cutoff for started in self.in_flight.values()):
+            return 0.0
+        return (now - self.last_activity) * 1000
+
+async def _wait_quiet(page, network: NetworkTracker, quiet_ms: float, deadline: float, since: float = None) -> bool:
+    """
+    Poll until both DOM and network have been quiet for quiet_ms; False on
+    deadline. Activity before since (a monotonic time, e.g. the last scroll)
+    does not count as quiet, so the page gets a full quiet_ms window to react.
+    """
+    while True:
+        mutation_idle = await page.evaluate(_MUTATION_IDLE_SCRIPT)
+        idle = min(mutation_idle, network.idle_ms())
+        if since is not None:
+            idle = min(idle, (time.monotonic() - since) * 1000)
+        if idle >= quiet_ms:
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(max(_POLL_SECONDS, (quiet_ms - idle) / 1000), remaining))
+
+async def wait_for_stable(
+    page,
+    scroll: bool = True,
+    timeout_ms: float = None,
+    quiet_ms: float = None,
+    max_scrolls: int = None
+) -> SettleResult:
+    """
+    Return as soon as the page has settled instead of sleeping a fixed time.
+
+    Settled means no DOM mutations (MutationObserver) and no network
+    requests for quiet_ms. With scroll, each sweep runs to the bottom, two
+    viewports per animation frame, and then waits for one quiet window;
+    sweeps repeat only while the document keeps growing. Never takes longer
+    than timeout_ms.
+    """
+    timeout_ms = SCRAPE_SETTLE_TIMEOUT_MS if timeout_ms is None else timeout_ms
+    quiet_ms = SCRAPE_SETTLE_QUIET_MS if quiet_ms is None else quiet_ms
+    max_scrolls = SCRAPE_SETTLE_MAX_SCROLLS if max_scrolls is None else max_scrolls
+    started = time.monotonic()
+    deadline = started + timeout_ms / 1000
+
+    with NetworkTracker(page) as network:
+        await page.evaluate(_OBSERVE_SCRIPT)
+        stable = await _wait_quiet(page, network, quiet_ms, deadline)
+        height = await page.evaluate(_HEIGHT_SCRIPT)
+        scrolls = 0
+
+        while scroll and scrolls < max_scrolls and time.monotonic() < deadline:
+            position = await page.evaluate(_SWEEP_SCRIPT, SCRAPE_SETTLE_SWEEP_STEPS)
+            scrolled_at = time.monotonic()
+            scrolls += 1
+            # Lazy loaders start after the scroll; idle time from before it says nothing
+            stable = await _wait_quiet(page, network, quiet_ms, deadline, since=scrolled_at)
+            new_height = await page.evaluate(_HEIGHT_SCRIPT)
+            if new_height <= height and position["bottom"] >= new_height - 2:
+                break
+            height = new_height
+
+    return SettleResult(stable, scrolls, height, (time.monotonic() - started) * 1000)
@@ -1,27 +1,20 @@
-import asyncio
-import json
 import os
 import logging
 import re
-from typing import Dict, Any, List, Optional, Tuple
-from datetime import datetime, timedelta
+from typing import Dict, Any, Union
+from datetime import datetime
 from playwright.async_api import async_playwright, Page, Browser, BrowserContext
 from playwright_stealth import stealth_async
-from bs4 import BeautifulSoup
 import time
-from dataclasses import dataclass
 
-logger = logging.getLogger(__name__)
+from automation_result import AutomationResult
+from browser_pool import PagePool
+from browser_supervisor import BrowserSupervisor
+from scrape_selectors import extract_selectors, clean_extracted
+from resource_blocking import ResourceBlocker, resolve_policy
+from page_settle import wait_for_stable, SCRAPE_SETTLE_TIMEOUT_MS
 
-@dataclass
-class AutomationResult:
-    """Result object for automation tasks"""
-    success: bool
-    data: Dict[str, Any]
-    message: str
-    execution_time: float
-    screenshots: List[str] = None
-    errors: List[str] = None
+logger = logging.getLogger(__name__)
 
 class PlaywrightService:
     """
@@ -29,57 +22,75 @@ class PlaywrightService:
     """
     
     def __init__(self):
-        self.browser = None
-        self.context = None
         self.default_timeout = 30000  # 30 seconds
         self.stealth_mode = True
+        # Keeps a healthy browser running: relaunches after crashes, recycles on page count or memory
+        self.supervisor = BrowserSupervisor(
+            self._launch_browser,
+            lambda: async_playwright().start(),
+            on_generation_change=self._retire_stale_contexts
+        )
+        # Pre-warmed pages in per-tenant contexts, with a cap on concurrent pages
+        self.pool = PagePool(self._new_context, self._prepare_page, is_stale=self._is_stale_context)
+        self.blocker = ResourceBlocker()
         
-    async def _get_browser_context(self) -> Tuple[Browser, BrowserContext]:
-        """Get or create browser context with stealth mode"""
-        if not self.browser or not self.context:
-            playwright = await async_playwright().start()
-            
-            # Launch browser with stealth settings
-            self.browser = await playwright.chromium.launch(
-                headless=True,
-                executable_path="/pw-browsers/chromium-1179/chrome-linux/chrome",
-                args=[
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-gpu',
-                    '--disable-extensions',
-                    '--no-first-run',
-                    '--disable-default-apps',
-                    '--disable-features=TranslateUI',
-                    '--disable-ipc-flooding-protection',
-                ]
-            )
-            
-            # Create browser context with enhanced settings
-            self.context = await self.browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                java_script_enabled=True,
-                accept_downloads=False,
-                bypass_csp=True,
-                ignore_https_errors=True
-            )
-            
-        return self.browser, self.context
+    async def _launch_browser(self, playwright) -> Browser:
+        """Launch browser with stealth settings"""
+        return await playwright.chromium.launch(
+            headless=True,
+            executable_path="/pw-browsers/chromium-1179/chrome-linux/chrome",
+            args=[
+                '--no-sandbox',
+                '--disable-setuid-sandbox',
+                '--disable-dev-shm-usage',
+                '--disable-gpu',
+                '--disable-extensions',
+                '--no-first-run',
+                '--disable-default-apps',
+                '--disable-features=TranslateUI',
+                '--disable-ipc-flooding-protection',
+            ]
+        )
 
-    async def _create_stealth_page(self) -> Page:
-        """Create a new page with stealth mode enabled"""
-        browser, context = await self._get_browser_context()
-        page = await context.new_page()
-        
+    async def _get_browser(self) -> Browser:
+        """Get the supervised browser, launching or relaunching it if needed"""
+        return await self.supervisor.get_browser()
+
+    def _is_stale_context(self, context: BrowserContext) -> bool:
+        return not self.supervisor.is_current(context.browser)
+
+    async def _retire_stale_contexts(self):
+        await self.pool.retire_stale()
+    
+    async def _new_context(self) -> BrowserContext:
+        """Create a browser context with enhanced settings; the pool keeps one per tenant"""
+        browser = await self._get_browser()
+        return await browser.new_context(
+            viewport={'width': 1920, 'height': 1080},
+            user_agent='Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            java_script_enabled=True,
+            accept_downloads=False,
+            bypass_csp=True,
+            ignore_https_errors=True
+        )
+
+    async def _prepare_page(self, page: Page):
+        """Apply stealth mode and timeouts once, when the pool creates a page"""
+        self.supervisor.page_opened(page.context.browser)
         if self.stealth_mode:
             await stealth_async(page)
             
         # Set default timeout
         page.set_default_timeout(self.default_timeout)
-        
-        return page
+    
+    async def warm_up(self):
+        """Launch the browser and open the pool's warm pages before the first request"""
+        try:
+            self.supervisor.start()
+            await self.pool.warm()
+            logger.info("🔥 Browser pool warmed: %s", self.pool.get_metrics()["idle_pages"])
+        except Exception as e:
+            logger.warning(f"⚠️ Browser pool warm-up failed: {e}")
 
     async def extract_dynamic_data(
         self, 
@@ -87,7 +98,9 @@ class PlaywrightService:
         selectors: Dict[str, str], 
         wait_for_element: str = None,
         scroll_to_load: bool = True,
-        screenshots: bool = False
+        screenshots: bool = False,
+        tenant: str = None,
+        resource_policy: Union[str, Dict[str, Any], None] = None
     ) -> AutomationResult:
         """
         Extract data from dynamic web pages with JavaScript rendering
@@ -98,101 +111,56 @@ class PlaywrightService:
             wait_for_element: CSS selector to wait for before extracting
             scroll_to_load: Whether to scroll to trigger lazy loading
             screenshots: Whether to take screenshots
+            tenant: Session the page belongs to; pages and cookies are never shared across tenants
+            resource_policy: "fast" (skip images, fonts, media and trackers), "none",
+                or a custom dict; defaults to SCRAPE_RESOURCE_POLICY
             
         Returns:
             AutomationResult with extracted data
         """
         start_time = time.time()
         extracted_data = {}
-        page = None
         
         try:
             logger.info(f"🔍 Starting data extraction from {url}")
-            page = await self._create_stealth_page()
-            
-            # Navigate to the page
-            await page.goto(url, wait_until="domcontentloaded", timeout=self.default_timeout)
-            logger.info(f"✅ Page loaded: {url}")
-            
-            # Wait for specific element if provided
-            if wait_for_element:
-                try:
-                    await page.wait_for_selector(wait_for_element, timeout=20000)
-                    logger.info(f"🎯 Target element found: {wait_for_element}")
-                except Exception as e:
-                    logger.warning(f"⚠️ Target element not found within timeout: {wait_for_element}")
-            
-            # Scroll to trigger lazy loading
-            if scroll_to_load:
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await asyncio.sleep(2)  # Wait for dynamic content
-                logger.info("📜 Scrolled to trigger lazy loading")
-            
-            # Extract data using provided selectors
-            for field_name, selector in selectors.items():
-                try:
-                    # Handle different extraction methods
-                    if selector.startswith("text:"):
-                        # Extract text content
-                        actual_selector = selector[5:]
-                        element = await page.query_selector(actual_selector)
-                        if element:
-                            extracted_data[field_name] = await element.text_content()
-                        else:
-                            extracted_data[field_name] = None
-                            logger.warning(f"⚠️ Element not found for {field_name}: {actual_selector}")
-                    
-                    elif selector.startswith("attr:"):
-                        # Extract attribute value
-                        parts = selector.split(":", 2)
-                        if len(parts) == 3:
-                            _, attr_name, actual_selector = parts
-                            element = await page.query_selector(actual_selector)
-                            if element:
-                                extracted_data[field_name] = await element.get_attribute(attr_name)
-                            else:
-                                extracted_data[field_name] = None
-                        else:
-                            logger.error(f"❌ Invalid attribute selector format: {selector}")
-                            extracted_data[field_name] = None
-                    
-                    elif selector.startswith("all:"):
-                        # Extract all matching elements
-                        actual_selector = selector[4:]
-                        elements = await page.query_selector_all(actual_selector)
-                        extracted_data[field_name] = []
-                        for element in elements:
-                            text = await element.text_content()
-                            if text and text.strip():
-                                extracted_data[field_name].append(text.strip())
-                    
-                    else:
-                        # Default: extract text content
-                        element = await page.query_selector(selector)
-                        if element:
-                            extracted_data[field_name] = await element.text_content()
-                        else:
-                            extracted_data[field_name] = None
-                            logger.warning(f"⚠️ Element not found for {field_name}: {selector}")
-                    
-                    if extracted_data[field_name]:
-                        logger.info(f"📊 Extracted {field_name}: {str(extracted_data[field_name])[:100]}...")
-                
-                except Exception as e:
-                    logger.error(f"❌ Error extracting {field_name} with selector {selector}: {e}")
-                    extracted_data[field_name] = None
+            policy = resolve_policy(resource_policy, selectors, wait_for_element, screenshots)
+            async with self.pool.page(tenant) as page, self.blocker.apply(page, policy):
+            
+                # Navigate to the page
+                await page.goto(url, wait_until="domcontentloaded", timeout=self.default_timeout)
+                logger.info(f"✅ Page loaded: {url}")
+            
+                # Wait for specific element if provided
+                if wait_for_element:
+                    try:
+                        await page.wait_for_selector(wait_for_element, timeout=20000)
+                        logger.info(f"🎯 Target element found: {wait_for_element}")
+                    except Exception as e:
+                        logger.warning(f"⚠️ Target element not found within timeout: {wait_for_element}")
+            
+                # Scroll to trigger lazy loading, stopping as soon as the page settles
+                if scroll_to_load:
+                    remaining_ms = self.default_timeout - (time.time() - start_time) * 1000
+                    try:
+                        settled = await wait_for_stable(page, scroll=True, timeout_ms=min(SCRAPE_SETTLE_TIMEOUT_MS, max(0, remaining_ms)))
+                        logger.info(f"📜 Scrolled to trigger lazy loading: {settled.as_dict()}")
+                    except Exception as e:
+                        logger.warning(f"⚠️ Waiting for the page to settle failed: {e}")
+            
+                # Extract every selector in one round trip to the page
+                extracted_data = await extract_selectors(page, selectors)
+                for field_name, value in extracted_data.items():
+                    if value:
+                        logger.info(f"📊 Extracted {field_name}: {str(value)[:100]}...")
+            
+            if self.supervisor.draining:
+                # Our page may have been the last one keeping a recycled browser alive
+                await self.supervisor.reap()
             
             execution_time = time.time() - start_time
             
             # Clean extracted data
-            cleaned_data = {}
-            for key, value in extracted_data.items():
-                if isinstance(value, str):
-                    cleaned_data[key] = value.strip() if value else None
-                elif isinstance(value, list):
-                    cleaned_data[key] = [item.strip() if isinstance(item, str) else item for item in value if item]
-                else:
-                    cleaned_data[key] = value
+            cleaned_data = clean_extracted(extracted_data)
             
             logger.info(f"✅ Data extraction completed in {execution_time:.2f}s")
             
@@ -215,18 +183,13 @@ class PlaywrightService:
                 execution_time=execution_time,
                 errors=[str(e)]
             )
-            
-        finally:
-            if page:
-                await page.close()
+
 
     async def close(self):
         """Clean up resources"""
         try:
-            if self.context:
-                await self.context.close()
-            if self.browser:
-                await self.browser.close()
+            await self.pool.close()
+            await self.supervisor.stop()
             logger.info("🧹 Playwright service closed")
         except Exception as e:
             logger.error(f"Error closing Playwright service: {e}")
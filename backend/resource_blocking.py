@@ -0,0 +1,138 @@
+import os
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Union
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Policy applied when a request does not name one: "fast" or "none"
+SCRAPE_RESOURCE_POLICY = os.getenv("SCRAPE_RESOURCE_POLICY", "fast")
+# Extra comma-separated hosts to block on top of the built-in tracker list
+SCRAPE_BLOCKED_DOMAINS = os.getenv("SCRAPE_BLOCKED_DOMAINS", "")
+
+# Resource types we never read when extracting text through selectors
+HEAVY_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+TRACKER_DOMAINS = frozenset({
+    "google-analytics.com", "googletagmanager.com", "googletagservices.com",
+    "doubleclick.net", "googlesyndication.com", "adservice.google.com",
+    "facebook.net", "connect.facebook.net", "hotjar.com", "clarity.ms",
+    "segment.io", "segment.com", "mixpanel.com", "amplitude.com",
+    "scorecardresearch.com", "quantserve.com", "criteo.com", "taboola.com",
+    "outbrain.com", "nr-data.net", "adnxs.com", "amazon-adsystem.com",
+    "bat.bing.com", "ads-twitter.com", "tiktok.com"
+})
+
+# Selector features whose result depends on computed styles
+_STYLE_DEPENDENT = (":visible", "visible=")
+
+@dataclass(frozen=True)
+class ResourcePolicy:
+    """Which requests a scraping page may make"""
+    name: str
+    block_types: FrozenSet[str] = frozenset()
+    block_domains: FrozenSet[str] = frozenset()
+    block_stylesheets: bool = False
+
+    @property
+    def blocks_anything(self) -> bool:
+        return bool(self.block_types or self.block_domains or self.block_stylesheets)
+
+    def keep_stylesheets(self) -> "ResourcePolicy":
+        return ResourcePolicy(self.name, self.block_types, self.block_domains, False)
+
+    def should_block(self, resource_type: str, url: str, is_navigation: bool = False) -> bool:
+        # The page being scraped is never blocked, even when it lives on a tracker domain
+        if resource_type == "document" or is_navigation:
+            return False
+        if resource_type in self.block_types:
+            return True
+        if resource_type == "stylesheet" and self.block_stylesheets:
+            return True
+        if self.block_domains:
+            host = (urlsplit(url).hostname or "").lower()
+            while host:
+                if host in self.block_domains:
+                    return True
+                host = host.partition(".")[2]
+        return False
+
+def _domains(extra: Iterable[str] = ()) -> FrozenSet[str]:
+    configured = {d.strip().lower() for d in SCRAPE_BLOCKED_DOMAINS.split(",") if d.strip()}
+    return TRACKER_DOMAINS | configured | {d.lower() for d in extra}
+
+POLICIES = {
+    "none": ResourcePolicy("none"),
+    "fast": ResourcePolicy("fast", HEAVY_RESOURCE_TYPES, _domains(), block_stylesheets=True)
+}
+
+def resolve_policy(
+    policy: Union[str, Dict[str, Any], None] = None,
+    selectors: Optional[Dict[str, str]] = None,
+    wait_for_element: Optional[str] = None,
+    screenshots: bool = False
+) -> ResourcePolicy:
+    """
+    Build the policy for one scrape. policy is a name from POLICIES, None
+    for the configured default, or a dict with block_types, block_domains
+    and block_stylesheets. Stylesheets are kept whenever a selector depends
+    on computed styles, a screenshot is requested, or wait_for_element is
+    set (wait_for_selector waits for the element to be visible).
+    """
+    if isinstance(policy, dict):
+        resolved = ResourcePolicy(
+            "custom",
+            frozenset(policy.get("block_types", HEAVY_RESOURCE_TYPES)),
+            _domains(policy.get("block_domains", ())),
+            bool(policy.get("block_stylesheets", True))
+        )
+    else:
+        name = policy or SCRAPE_RESOURCE_POLICY
+        resolved = POLICIES.get(name)
+        if resolved is None:
+            logger.warning(f"⚠️ Unknown resource policy {name!r}, loading everything")
+            resolved = POLICIES["none"]
+
+    style_dependent = any(token in expr for expr in (selectors or {}).values() for token in _STYLE_DEPENDENT)
+    if resolved.block_stylesheets and (screenshots or wait_for_element or style_dependent):
+        resolved = resolved.keep_stylesheets()
+    return resolved
+
+class ResourceBlocker:
+    """Installs a policy on a pooled page for the length of one scrape"""
+
+    def __init__(self):
+        self.stats = {"requests_allowed": 0, "requests_blocked": 0}
+        self.blocked_by_type = defaultdict(int)
+
+    @asynccontextmanager
+    async def apply(self, page, policy: ResourcePolicy):
+        # The route is removed again on exit so the next borrower of this page gets its own policy
+        if not policy.blocks_anything:
+            yield
+            return
+
+        async def handle(route):
+            request = route.request
+            if policy.should_block(request.resource_type, request.url, request.is_navigation_request()):
+                self.stats["requests_blocked"] += 1
+                self.blocked_by_type[request.resource_type] += 1
+                await route.abort("blockedbyclient")
+            else:
+                self.stats["requests_allowed"] += 1
+                await route.continue_()
+
+        await page.route("**/*", handle)
+        try:
+            yield
+        finally:
+            try:
+                await page.unroute("**/*", handle)
+            except Exception as e:
+                logger.debug("Removing resource route failed: %s", e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "blocked_by_type": dict(self.blocked_by_type), "default_policy": SCRAPE_RESOURCE_POLICY}
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# Results younger than this are served without touching the site
+SCRAPE_CACHE_TTL_SECONDS = float(os.getenv("SCRAPE_CACHE_TTL_SECONDS", "300"))
+# Past the TTL, entries with validators are revalidated with a conditional GET until this age
+SCRAPE_CACHE_STALE_SECONDS = float(os.getenv("SCRAPE_CACHE_STALE_SECONDS", "86400"))
+SCRAPE_CACHE_MAX_BYTES = int(float(os.getenv("SCRAPE_CACHE_MAX_MB", "32")) * 1024 * 1024)
+# Shared tier in Mongo (scrape_cache collection) so every API worker sees the same results
+SCRAPE_CACHE_MONGO = os.getenv("SCRAPE_CACHE_MONGO", "true").lower() == "true"
+
+def normalize_url(url: str) -> str:
+    """Lowercase scheme and host and drop the fragment; an empty path becomes /"""
+    parts = urlsplit(url.strip())
+    path = parts.path or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+def cache_key(
+    url: str,
+    selectors: Dict[str, str],
+    wait_for_element: Optional[str] = None,
+    mode: Optional[str] = None,
+    tenant: Optional[str] = None
+) -> str:
+    """
+    Stable key for (url, selectors, engine mode, tenant); field order and
+    whitespace around selectors do not matter. Pass tenant only for results
+    rendered in the browser: a tenant's browser context carries its
+    cookies, so those pages are never served to another tenant, while
+    cookie-less HTTP results are shared by everyone.
+    """
+    normalized = sorted((name, (selector or "").strip()) for name, selector in selectors.items())
+    raw = json.dumps([normalize_url(url), normalized, wait_for_element or "", mode or "", tenant or ""], separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+@dataclass
+class CachedScrape:
+    key: str
+    url: str
+    data: Dict[str, Any]
+    engine: str
+    fetched_at: float  # epoch seconds of the last fetch or successful revalidation
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    size: int = field(default=0, compare=False)
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_document(self) -> Dict[str, Any]:
+        fetched = datetime.utcfromtimestamp(self.fetched_at)
+        return {
+            "key": self.key,
+            "url": self.url,
+            "data": self.data,
+            "engine": self.engine,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "fetched_at": fetched,
+            "expires_at": fetched + timedelta(seconds=SCRAPE_CACHE_STALE_SECONDS)
+        }
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> "CachedScrape":
+        return cls(
+            key=document["key"],
+            url=document["url"],
+            data=document["data"],
+            engine=document.get("engine", "browser"),
+            fetched_at=(document["fetched_at"] - datetime(1970, 1, 1)).total_seconds(),
+            etag=document.get("etag"),
+            last_modified=document.get("last_modified")
+        )
+
+class ScrapeCache:
+    """
+    Scrape results keyed by (url, normalized selectors, engine mode), plus
+    the tenant for browser-rendered results.
+
+    Entries are fresh for SCRAPE_CACHE_TTL_SECONDS. After that they are kept
+    until SCRAPE_CACHE_STALE_SECONDS so results fetched over HTTP can be
+    revalidated with If-None-Match / If-Modified-Since instead of scraped
+    again. The in-process tier is an LRU bounded by approximate size; the
+    optional Mongo tier (scrape_cache, TTL-indexed on expires_at) is shared
+    by all workers and fills the local tier on a hit.
+    """
+
+    def __init__(self, db=None, ttl: float = None, max_bytes: int = None):
+        self.ttl = SCRAPE_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.max_bytes = max_bytes or SCRAPE_CACHE_MAX_BYTES
+        self.collection = db.scrape_cache if db is not None and SCRAPE_CACHE_MONGO else None
+        self._entries: "OrderedDict[str, CachedScrape]" = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0, "mongo_hits": 0}
+
+    async def ensure_indexes(self):
+        if self.collection is not None:
+            await self.collection.create_index("key", unique=True)
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def is_fresh(self, entry: CachedScrape) -> bool:
+        return entry.age < self.ttl
+
+    def _remember(self, entry: CachedScrape):
+        entry.size = len(json.dumps(entry.data, default=str)) * 2 + 256
+        # One huge listing should not flush everything else
+        if entry.size > self.max_bytes // 4:
+            return
+        previous = self._entries.pop(entry.key, None)
+        if previous:
+            self.total_bytes -= previous.size
+        self._entries[entry.key] = entry
+        self.total_bytes += entry.size
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+            self.stats["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[CachedScrape]:
+        """Entry for key from memory or Mongo, fresh or stale; None if unknown or past the stale window"""
+        entry = self._entries.get(key)
+        if entry is None and self.collection is not None:
+            try:
+                document = await self.collection.find_one({"key": key})
+            except Exception as e:
+                logger.warning(f"⚠️ Scrape cache lookup failed: {e}")
+                document = None
+            if document:
+                entry = CachedScrape.from_document(document)
+                self.stats["mongo_hits"] += 1
+                self._remember(entry)
+
+        if entry is None or entry.age > SCRAPE_CACHE_STALE_SECONDS:
+            self.stats["misses"] += 1
+            return None
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        self.stats["hits" if self.is_fresh(entry) else "stale_hits"] += 1
+        return entry
+
+    async def put(self, entry: CachedScrape):
+        self._remember(entry)
+        self.stats["stores"] += 1
+        if self.collection is not None:
+            try:
+                await self.collection.replace_one({"key": entry.key}, entry.to_document(), upsert=True)
+            except Exception as e:
+                logger.warning(f"⚠️ Scrape cache write failed: {e}")
+
+    async def mark_revalidated(self, entry: CachedScrape):
+        """The site answered 304: the cached data is current again"""
+        entry.fetched_at = time.time()
+        self.stats["revalidated"] += 1
+        self._remember(entry)
+        if self.collection is not None:
+            document = entry.to_document()
+            try:
+                await self.collection.update_one(
+                    {"key": entry.key},
+                    {"$set": {"fetched_at": document["fetched_at"], "expires_at": document["expires_at"]}}
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Scrape cache write failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "approx_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "mongo": self.collection is not None
+        }
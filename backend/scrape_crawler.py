@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Scrapes running at once across every crawl, and per host
+SCRAPE_CRAWL_CONCURRENCY = int(os.getenv("SCRAPE_CRAWL_CONCURRENCY", "8"))
+SCRAPE_CRAWL_PER_DOMAIN = int(os.getenv("SCRAPE_CRAWL_PER_DOMAIN_CONCURRENCY", "2"))
+SCRAPE_CRAWL_MAX_URLS = int(os.getenv("SCRAPE_CRAWL_MAX_URLS", "200"))
+# automation_logs rows are inserted in batches of this size (and once more at the end)
+SCRAPE_CRAWL_LOG_BATCH = int(os.getenv("SCRAPE_CRAWL_LOG_BATCH", "25"))
+
+PAGE_PLACEHOLDER = "{page}"
+
+def expand_urls(
+    urls: Optional[List[str]] = None,
+    url_pattern: Optional[str] = None,
+    start_page: int = 1,
+    end_page: Optional[int] = None
+) -> List[str]:
+    """
+    URLs for a crawl: an explicit list, a pattern with {page} expanded from
+    start_page to end_page inclusive, or both. Duplicates are dropped,
+    order is kept. Raises ValueError for an empty or oversized crawl.
+    """
+    expanded = list(urls or [])
+    if url_pattern:
+        if PAGE_PLACEHOLDER not in url_pattern:
+            raise ValueError(f"url_pattern must contain {PAGE_PLACEHOLDER}")
+        if end_page is None or end_page < start_page:
+            raise ValueError("end_page must be given and not before start_page")
+        expanded.extend(url_pattern.replace(PAGE_PLACEHOLDER, str(page)) for page in range(start_page, end_page + 1))
+
+    unique = list(dict.fromkeys(url.strip() for url in expanded if url and url.strip()))
+    if not unique:
+        raise ValueError("No URLs to crawl")
+    if len(unique) > SCRAPE_CRAWL_MAX_URLS:
+        raise ValueError(f"A crawl is limited to {SCRAPE_CRAWL_MAX_URLS} URLs, got {len(unique)}")
+    return unique
+
+class AutomationLogBatcher:
+    """Buffers automation_logs rows and writes them with insert_many"""
+
+    def __init__(self, collection, batch_size: int = None):
+        self.collection = collection
+        self.batch_size = batch_size or SCRAPE_CRAWL_LOG_BATCH
+        self._rows: List[Dict[str, Any]] = []
+
+    async def add(self, row: Dict[str, Any]):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        rows, self._rows = self._rows, []
+        if not rows:
+            return
+        try:
+            await self.collection.insert_many(rows, ordered=False)
+        except Exception as e:
+            logger.error(f"❌ Failed to write {len(rows)} crawl automation logs: {e}")
+
+class ScrapeCrawler:
+    """
+    Runs one selector scrape per URL through the ScrapeEngine, at most
+    SCRAPE_CRAWL_CONCURRENCY at a time across all crawls and
+    SCRAPE_CRAWL_PER_DOMAIN per host, and yields each result as soon as it
+    finishes. Every URL gets its own automation_logs row, written in batches.
+    """
+
+    def __init__(self, engine, db, concurrency: int = None, per_domain: int = None):
+        self.engine = engine
+        self.db = db
+        self.per_domain = per_domain or SCRAPE_CRAWL_PER_DOMAIN
+        self._global = asyncio.Semaphore(concurrency or SCRAPE_CRAWL_CONCURRENCY)
+        self._domains: Dict[str, asyncio.Semaphore] = {}
+        self._domain_users: Dict[str, int] = defaultdict(int)
+        self.stats = {"crawls": 0, "urls": 0, "succeeded": 0, "failed": 0, "active": 0}
+
+    def _domain_slot(self, url: str) -> asyncio.Semaphore:
+        host = (urlsplit(url).hostname or "").lower()
+        slot = self._domains.get(host)
+        if slot is None:
+            slot = self._domains[host] = asyncio.Semaphore(self.per_domain)
+        return slot
+
+    async def _scrape_one(self, index: int, url: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        host = (urlsplit(url).hostname or "").lower()
+        self._domain_users[host] += 1
+        try:
+            # Take the host slot first so one slow domain cannot hold global slots while it queues
+            async with self._domain_slot(url), self._global:
+                self.stats["active"] += 1
+                try:
+                    result = await self.engine.scrape(url, **options)
+                finally:
+                    self.stats["active"] -= 1
+        except Exception as e:
+            logger.error(f"💥 Crawl scrape of {url} failed: {e}")
+            return {"index": index, "url": url, "success": False, "data": {}, "message": str(e),
+                    "engine": None, "cached": False, "execution_time": 0}
+        finally:
+            self._domain_users[host] -= 1
+            if not self._domain_users[host]:
+                # Forget idle hosts so long-running servers do not accumulate semaphores
+                self._domain_users.pop(host, None)
+                self._domains.pop(host, None)
+
+        return {
+            "index": index,
+            "url": url,
+            "success": result.success,
+            "data": result.data,
+            "message": result.message,
+            "engine": result.engine,
+            "cached": result.cached,
+            "cache_age_seconds": result.cache_age,
+            "execution_time": result.execution_time
+        }
+
+    async def crawl(
+        self,
+        session_id: str,
+        urls: List[str],
+        selectors: Dict[str, str],
+        wait_for_element: str = None,
+        resource_policy: Any = None,
+        mode: str = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield one result dict per URL in completion order, then a summary with done=True"""
+        crawl_id = str(uuid.uuid4())
+        started = time.time()
+        options = {
+            "selectors": selectors,
+            "wait_for_element": wait_for_element,
+            "tenant": session_id,
+            "resource_policy": resource_policy,
+            "mode": mode,
+            "use_cache": use_cache
+        }
+        logs = AutomationLogBatcher(self.db.automation_logs)
+        tasks = [asyncio.create_task(self._scrape_one(index, url, options)) for index, url in enumerate(urls)]
+        self.stats["crawls"] += 1
+        succeeded = 0
+        logger.info(f"🕷️ Crawl {crawl_id}: {len(urls)} URLs for session {session_id}")
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                row = await next_done
+                succeeded += row["success"]
+                self.stats["urls"] += 1
+                self.stats["succeeded" if row["success"] else "failed"] += 1
+                await logs.add({
+                    "id": str(uuid.uuid4()),
+                    "session_id": session_id,
+                    "automation_type": "web_scraping",
+                    "crawl_id": crawl_id,
+                    "parameters": {"url": row["url"], "selectors": selectors, "wait_for_element": wait_for_element},
+                    "result": row["data"],
+                    "success": row["success"],
+                    "message": row["message"],
+                    "execution_time": row["execution_time"],
+                    "engine": row["engine"],
+                    "cached": row["cached"],
+                    "timestamp": datetime.utcnow()
+                })
+                yield {"crawl_id": crawl_id, **row}
+
+            yield {
+                "crawl_id": crawl_id,
+                "done": True,
+                "total": len(urls),
+                "succeeded": succeeded,
+                "failed": len(urls) - succeeded,
+                "execution_time": time.time() - started
+            }
+        finally:
+            # The client may have gone away mid-stream; stop the remaining scrapes
+            for task in tasks:
+                task.cancel()
+            await logs.flush()
+
+    async def stream_ndjson(self, *args, **kwargs) -> AsyncIterator[bytes]:
+        """crawl() as newline-delimited JSON for a StreamingResponse"""
+        async for row in self.crawl(*args, **kwargs):
+            yield (json.dumps(row, default=str) + "\n").encode()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "domains_active": len(self._domains)}
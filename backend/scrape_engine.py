@@ -0,0 +1,299 @@
+import os
+import re
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from http.cookiejar import CookieJar
+from typing import Any, Dict, Optional, Tuple, Union
+
+import httpx
+from bs4 import BeautifulSoup
+
+from automation_result import AutomationResult
+from scrape_selectors import extract_from_soup, clean_extracted
+from scrape_cache import CachedScrape, ScrapeCache, cache_key
+
+logger = logging.getLogger(__name__)
+
+# Try a plain GET before rendering in Chromium
+SCRAPE_HTTP_FIRST = os.getenv("SCRAPE_HTTP_FIRST", "true").lower() == "true"
+SCRAPE_HTTP_TIMEOUT = float(os.getenv("SCRAPE_HTTP_TIMEOUT_SECONDS", "10"))
+SCRAPE_HTTP_MAX_BYTES = int(os.getenv("SCRAPE_HTTP_MAX_BYTES", str(5 * 1024 * 1024)))
+SCRAPE_HTTP_MAX_CONNECTIONS = int(os.getenv("SCRAPE_HTTP_MAX_CONNECTIONS", "50"))
+SCRAPE_USER_AGENT = os.getenv(
+    "SCRAPE_USER_AGENT",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+ENGINE_MODES = ("auto", "http", "browser")
+
+# Markers of a client-rendered app shell whose static HTML holds no content
+_APP_SHELL_RE = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>'
+    r'|<noscript>[^<]*(?:enable|requires?)\s+javascript',
+    re.IGNORECASE
+)
+_MIN_TEXT_CHARS = 200
+
+class HttpScrapeMiss(Exception):
+    """The HTTP path could not answer; reason says why the browser is needed"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+class _NoCookies(CookieJar):
+    """Cookie jar that never stores anything, so HTTP results are the same for every tenant"""
+
+    def set_cookie(self, cookie):
+        pass
+
+    def extract_cookies(self, response, request):
+        pass
+
+def get_scrape_client() -> httpx.AsyncClient:
+    """Pooled client for HTTP-first scrapes, separate from the n8n client; it keeps no cookies"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            follow_redirects=True,
+            cookies=_NoCookies(),
+            limits=httpx.Limits(max_connections=SCRAPE_HTTP_MAX_CONNECTIONS, max_keepalive_connections=20),
+            timeout=httpx.Timeout(SCRAPE_HTTP_TIMEOUT),
+            headers={
+                "User-Agent": SCRAPE_USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.9"
+            }
+        )
+    return _http_client
+
+async def close_scrape_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def resolve_mode(mode: Optional[str]) -> str:
+    """Engine mode a request runs in; unknown or missing modes take the SCRAPE_HTTP_FIRST default"""
+    return mode if mode in ENGINE_MODES else ("auto" if SCRAPE_HTTP_FIRST else "browser")
+
+def needs_javascript(html: str, soup: BeautifulSoup) -> bool:
+    """Heuristic: an app shell, or a script-heavy page with almost no text"""
+    if _APP_SHELL_RE.search(html):
+        return True
+    body = soup.body
+    text_chars = len(body.get_text(" ", strip=True)) if body else 0
+    return text_chars < _MIN_TEXT_CHARS and len(soup.find_all("script")) > 0
+
+def parse_and_extract(html: str, selectors: Dict[str, str]) -> Dict[str, Any]:
+    """Parse html and apply selectors; CPU-bound, so it runs off the event loop"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    try:
+        data, unmatched = extract_from_soup(soup, selectors)
+    except ValueError:
+        raise HttpScrapeMiss("selector_unsupported")
+    if unmatched:
+        raise HttpScrapeMiss("js_rendering" if needs_javascript(html, soup) else "selectors_unmatched")
+    return data
+
+class ScrapeEngine:
+    """
+    Front door for selector scrapes. Static pages are answered with one GET
+    and BeautifulSoup; the request escalates to Chromium
+    (PlaywrightService.extract_dynamic_data) when wait_for_element is given,
+    the response is not HTML, a selector matches nothing, the page looks
+    client-rendered, or the selector syntax is Playwright-only.
+
+    With a ScrapeCache, successful results are cached per (url, selectors,
+    mode); browser results are also keyed by tenant, HTTP results are shared.
+    Stale HTTP results are revalidated with a conditional GET.
+    """
+
+    def __init__(self, browser_service=None, cache: Optional[ScrapeCache] = None):
+        if browser_service is None:
+            # Imported on demand so HTTP-only users of the engine never load Playwright
+            from playwright_service import playwright_service as browser_service
+        self.browser = browser_service
+        self.cache = cache
+        self.metrics = {"http": 0, "browser": 0, "http_seconds_total": 0.0, "browser_seconds_total": 0.0}
+        self.escalations = defaultdict(int)
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[str], httpx.Response]:
+        """Body and response for url; the body is None when a conditional GET got 304"""
+        try:
+            async with get_scrape_client().stream("GET", url, headers=headers) as response:
+                if response.status_code == 304:
+                    return None, response
+                if response.status_code >= 400:
+                    raise HttpScrapeMiss(f"http_{response.status_code}")
+                content_type = response.headers.get("content-type", "")
+                if "html" not in content_type and "xml" not in content_type:
+                    raise HttpScrapeMiss("not_html")
+
+                chunks = []
+                size = 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > SCRAPE_HTTP_MAX_BYTES:
+                        raise HttpScrapeMiss("too_large")
+                    chunks.append(chunk)
+                body = b"".join(chunks)
+                return body.decode(response.encoding or "utf-8", errors="replace"), response
+        except httpx.HTTPError as e:
+            logger.debug("HTTP-first fetch of %s failed: %s", url, e)
+            raise HttpScrapeMiss("fetch_error")
+
+    async def scrape_http(
+        self,
+        url: str,
+        selectors: Dict[str, str],
+        validators: Optional[Dict[str, str]] = None
+    ) -> Tuple[Optional[Dict[str, Any]], httpx.Response]:
+        """
+        Fetch and extract without a browser; raises HttpScrapeMiss when it
+        cannot. Returns (None, response) if validators showed the page unchanged.
+        """
+        html, response = await self.fetch(url, validators)
+        if html is None:
+            return None, response
+        return await asyncio.to_thread(parse_and_extract, html, selectors), response
+
+    async def scrape(
+        self,
+        url: str,
+        selectors: Dict[str, str],
+        wait_for_element: str = None,
+        tenant: str = None,
+        resource_policy: Union[str, Dict[str, Any], None] = None,
+        mode: str = None,
+        use_cache: bool = True
+    ) -> AutomationResult:
+        """
+        Extract selectors from url, preferring the HTTP path. mode is "auto"
+        (default), "http" (never launch the browser) or "browser" (always).
+        The result's engine field says which path answered, and cached /
+        cache_age whether it came from the scrape cache.
+        """
+        start_time = time.time()
+        mode = resolve_mode(mode)
+        http_key = browser_key = entry = None
+        if self.cache is not None and use_cache:
+            # HTTP results carry no cookies and are shared; browser results stay with their tenant
+            http_key = cache_key(url, selectors, wait_for_element, mode) if mode != "browser" else None
+            browser_key = cache_key(url, selectors, wait_for_element, mode, tenant) if mode != "http" else None
+            for key in (http_key, browser_key):
+                entry = await self.cache.get(key) if key else None
+                if entry is not None:
+                    break
+        if entry is not None and self.cache.is_fresh(entry):
+            return self._cached_result(entry, start_time)
+
+        validators = entry.conditional_headers() if entry is not None and entry.engine == "http" and entry.revalidatable else None
+        result, response = await self._scrape(url, selectors, wait_for_element, tenant, resource_policy, mode, start_time, validators)
+        if result is None:
+            await self.cache.mark_revalidated(entry)
+            logger.info(f"♻️ {url} unchanged (304), serving cached data")
+            return self._cached_result(entry, start_time)
+
+        key = http_key if result.engine == "http" else browser_key
+        if key and result.success:
+            await self.cache.put(CachedScrape(
+                key=key,
+                url=url,
+                data=result.data,
+                engine=result.engine,
+                fetched_at=time.time(),
+                etag=response.headers.get("etag") if response is not None else None,
+                last_modified=response.headers.get("last-modified") if response is not None else None
+            ))
+        return result
+
+    def _cached_result(self, entry: CachedScrape, start_time: float) -> AutomationResult:
+        return AutomationResult(
+            success=True,
+            data=entry.data,
+            message=f"Served cached data for {entry.url} ({entry.age:.0f}s old)",
+            execution_time=time.time() - start_time,
+            engine=entry.engine,
+            cached=True,
+            cache_age=round(entry.age, 1)
+        )
+
+    async def _scrape(
+        self,
+        url: str,
+        selectors: Dict[str, str],
+        wait_for_element: Optional[str],
+        tenant: Optional[str],
+        resource_policy: Union[str, Dict[str, Any], None],
+        mode: Optional[str],
+        start_time: float,
+        validators: Optional[Dict[str, str]] = None
+    ) -> Tuple[Optional[AutomationResult], Optional[httpx.Response]]:
+        """Run the HTTP path and escalate if needed; (None, response) means validators matched"""
+        mode = resolve_mode(mode)
+
+        reason = "forced" if mode == "browser" else ("wait_for_element" if wait_for_element else None)
+        if reason is None:
+            try:
+                data, response = await self.scrape_http(url, selectors, validators)
+                if data is None:
+                    return None, response
+                execution_time = time.time() - start_time
+                self.metrics["http"] += 1
+                self.metrics["http_seconds_total"] += execution_time
+                logger.info(f"⚡ Extracted {url} over plain HTTP in {execution_time:.2f}s")
+                return AutomationResult(
+                    success=True,
+                    data=clean_extracted(data),
+                    message=f"Successfully extracted data from {url}",
+                    execution_time=execution_time,
+                    engine="http"
+                ), response
+            except HttpScrapeMiss as miss:
+                reason = miss.reason
+                if mode == "http":
+                    return AutomationResult(
+                        success=False,
+                        data={},
+                        message=f"Failed to extract data over HTTP: {reason}",
+                        execution_time=time.time() - start_time,
+                        errors=[reason],
+                        engine="http"
+                    ), None
+
+        self.escalations[reason] += 1
+        logger.info(f"🌐 Rendering {url} in the browser ({reason})")
+        result = await self.browser.extract_dynamic_data(
+            url,
+            selectors,
+            wait_for_element,
+            tenant=tenant,
+            resource_policy=resource_policy
+        )
+        # Time spent on the failed HTTP attempt counts toward the request
+        result.execution_time = time.time() - start_time
+        self.metrics["browser"] += 1
+        self.metrics["browser_seconds_total"] += result.execution_time
+        return result, None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        served = self.metrics["http"] + self.metrics["browser"]
+        return {
+            **self.metrics,
+            "http_share": self.metrics["http"] / served if served else 0.0,
+            "escalations": dict(self.escalations),
+            "parser": HTML_PARSER,
+            "http_first": SCRAPE_HTTP_FIRST,
+            "cache": self.cache.get_stats() if self.cache is not None else None
+        }
@@ -0,0 +1,183 @@
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SelectorSpec:
+    """One parsed field selector: text:, attr:<name>:, all:, html: or a bare CSS selector"""
+    field: str
+    kind: str  # "text", "attr", "all" or "html"
+    selector: str
+    attr: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"field": self.field, "kind": self.kind, "selector": self.selector, "attr": self.attr}
+
+def parse_selectors(selectors: Dict[str, str]) -> List[SelectorSpec]:
+    """
+    Parse the {field: selector} mapping used by web_scraping requests.
+
+    Supported forms:
+        "text:<css>"          text content of the first match
+        "attr:<name>:<css>"   attribute of the first match
+        "all:<css>"           stripped, non-empty text of every match
+        "html:<css>"          outer HTML of the first match
+        "<css>"               same as text:
+
+    A malformed attr: selector yields a spec with an empty selector, which
+    extracts to None like it always has.
+    """
+    specs = []
+    for field_name, selector in selectors.items():
+        selector = selector or ""
+        if selector.startswith("text:"):
+            specs.append(SelectorSpec(field_name, "text", selector[5:]))
+        elif selector.startswith("attr:"):
+            parts = selector.split(":", 2)
+            if len(parts) == 3:
+                specs.append(SelectorSpec(field_name, "attr", parts[2], attr=parts[1]))
+            else:
+                logger.error(f"❌ Invalid attribute selector format: {selector}")
+                specs.append(SelectorSpec(field_name, "attr", "", attr=None))
+        elif selector.startswith("all:"):
+            specs.append(SelectorSpec(field_name, "all", selector[4:]))
+        elif selector.startswith("html:"):
+            specs.append(SelectorSpec(field_name, "html", selector[5:]))
+        else:
+            specs.append(SelectorSpec(field_name, "text", selector))
+    return specs
+
+# Runs in the page: extracts every field in one evaluation instead of one CDP round trip per element.
+# Selectors that are not plain CSS (Playwright's text=, xpath=, >> chains) land in errors so the
+# caller can fall back to element handles for just those fields.
+EXTRACT_SCRIPT = """
+(specs) => {
+    const data = {};
+    const missing = [];
+    const errors = {};
+    for (const spec of specs) {
+        if (!spec.selector) {
+            data[spec.field] = null;
+            continue;
+        }
+        try {
+            if (spec.kind === 'all') {
+                data[spec.field] = Array.from(
+                    document.querySelectorAll(spec.selector),
+                    (el) => (el.textContent || '').trim()
+                ).filter((text) => text.length > 0);
+                continue;
+            }
+            const el = document.querySelector(spec.selector);
+            if (!el) {
+                data[spec.field] = null;
+                missing.push(spec.field);
+            } else if (spec.kind === 'attr') {
+                data[spec.field] = el.getAttribute(spec.attr);
+            } else if (spec.kind === 'html') {
+                data[spec.field] = el.outerHTML;
+            } else {
+                data[spec.field] = el.textContent;
+            }
+        } catch (e) {
+            data[spec.field] = null;
+            errors[spec.field] = String(e && e.message || e);
+        }
+    }
+    return {data, missing, errors};
+}
+"""
+
+async def extract_with_handles(page, spec: SelectorSpec) -> Any:
+    """Extract one field through Playwright element handles (any selector engine)"""
+    if spec.kind == "all":
+        values = []
+        for element in await page.query_selector_all(spec.selector):
+            text = await element.text_content()
+            if text and text.strip():
+                values.append(text.strip())
+        return values
+
+    element = await page.query_selector(spec.selector)
+    if not element:
+        return None
+    if spec.kind == "attr":
+        return await element.get_attribute(spec.attr)
+    if spec.kind == "html":
+        return await element.evaluate("(el) => el.outerHTML")
+    return await element.text_content()
+
+async def extract_selectors(page, selectors: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Extract every selector from page with a single page.evaluate call. The
+    result has the same shape the per-selector loop produced: one key per
+    field, None for missing elements, lists for all: selectors.
+    """
+    specs = parse_selectors(selectors)
+    result = await page.evaluate(EXTRACT_SCRIPT, [spec.as_dict() for spec in specs])
+    extracted_data = result["data"]
+
+    for field_name in result["missing"]:
+        logger.warning(f"⚠️ Element not found for {field_name}: {selectors[field_name]}")
+
+    if result["errors"]:
+        by_field = {spec.field: spec for spec in specs}
+        for field_name, error in result["errors"].items():
+            try:
+                extracted_data[field_name] = await extract_with_handles(page, by_field[field_name])
+            except Exception as e:
+                logger.error(f"❌ Error extracting {field_name} with selector {selectors[field_name]}: {e}")
+                extracted_data[field_name] = None
+
+    return extracted_data
+
+def extract_from_soup(soup, selectors: Dict[str, str]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Apply the same selector syntax to a parsed BeautifulSoup document.
+    Returns (data, unmatched) where unmatched lists fields whose selector
+    found nothing (or an empty list for all:). Raises ValueError for
+    selectors soupsieve cannot parse, such as Playwright-only engines.
+    """
+    data: Dict[str, Any] = {}
+    unmatched: List[str] = []
+    for spec in parse_selectors(selectors):
+        if not spec.selector:
+            data[spec.field] = None
+            continue
+        try:
+            if spec.kind == "all":
+                values = [el.get_text() for el in soup.select(spec.selector)]
+                data[spec.field] = [text.strip() for text in values if text and text.strip()]
+                if not data[spec.field]:
+                    unmatched.append(spec.field)
+                continue
+            element = soup.select_one(spec.selector)
+        except Exception as e:
+            raise ValueError(f"unsupported selector for {spec.field}: {spec.selector}") from e
+
+        if element is None:
+            data[spec.field] = None
+            unmatched.append(spec.field)
+        elif spec.kind == "attr":
+            value = element.get(spec.attr)
+            # class and rel are multi-valued in BeautifulSoup; the DOM returns the raw string
+            data[spec.field] = " ".join(value) if isinstance(value, list) else value
+        elif spec.kind == "html":
+            data[spec.field] = str(element)
+        else:
+            data[spec.field] = element.get_text()
+    return data, unmatched
+
+def clean_extracted(extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Strip strings and drop empty list items, turning blank values into None"""
+    cleaned_data = {}
+    for key, value in extracted_data.items():
+        if isinstance(value, str):
+            cleaned_data[key] = value.strip() if value else None
+        elif isinstance(value, list):
+            cleaned_data[key] = [item.strip() if isinstance(item, str) else item for item in value if item]
+        else:
+            cleaned_data[key] = value
+    return cleaned_data
@@ -0,0 +1,409 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from dataclasses import asdict
+from multiprocessing.connection import Connection, wait
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def _default_workers() -> int:
+    # Each worker runs its own Chromium; one per two cores leaves room for the API and the renderers
+    return max(1, (os.cpu_count() or 2) // 2)
+
+# "auto" sizes the pool from the CPU count; 0 keeps scraping in the API process
+_configured = os.getenv("SCRAPE_WORKER_PROCESSES", "auto").strip().lower()
+SCRAPE_WORKER_PROCESSES = _default_workers() if _configured == "auto" else int(_configured)
+SCRAPE_WORKER_JOB_TIMEOUT = float(os.getenv("SCRAPE_WORKER_JOB_TIMEOUT_SECONDS", "120"))
+# A job whose worker crashed is handed to another worker this many times before failing
+SCRAPE_WORKER_MAX_ATTEMPTS = int(os.getenv("SCRAPE_WORKER_MAX_ATTEMPTS", "2"))
+# A worker still rendering this long after its job was cancelled is killed and restarted
+SCRAPE_WORKER_CANCEL_GRACE = float(os.getenv("SCRAPE_WORKER_CANCEL_GRACE_SECONDS", "10"))
+# How long collect_metrics waits for workers to answer before using their last report
+SCRAPE_WORKER_METRICS_TIMEOUT = float(os.getenv("SCRAPE_WORKER_METRICS_TIMEOUT_SECONDS", "2"))
+_MONITOR_INTERVAL = 1.0
+
+def _worker_main(worker_id: int, inbox, outbox, busy_seconds, busy_flags):
+    """
+    Entry point of a worker process: one PlaywrightService, jobs read from
+    this worker's own pipe. The pipe also carries cancel messages for the
+    job in progress and metrics requests, answered at once even mid-job;
+    None asks the worker to finish the job and exit.
+    """
+    # Imported here so the API process never loads Playwright on behalf of its workers
+    from playwright_service import PlaywrightService
+
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [scrape-worker-{worker_id}] %(levelname)s %(message)s")
+    service = PlaywrightService()
+
+    def service_metrics():
+        return {
+            "pool": service.pool.get_metrics(),
+            "browser": service.supervisor.get_metrics(),
+            "resource_blocking": service.blocker.get_stats()
+        }
+
+    async def render(job):
+        busy_flags[worker_id] = 1
+        started = time.monotonic()
+        try:
+            result = await service.extract_dynamic_data(**job["kwargs"])
+            payload = asdict(result)
+        except asyncio.CancelledError:
+            payload = {"success": False, "data": {}, "message": "Scrape cancelled", "execution_time": 0, "errors": ["cancelled"]}
+        except Exception as e:
+            payload = {"success": False, "data": {}, "message": f"Worker error: {e}", "execution_time": 0, "errors": [str(e)]}
+        finally:
+            busy_seconds[worker_id] += time.monotonic() - started
+            busy_flags[worker_id] = 0
+        outbox.send({
+            "job_id": job["id"],
+            "worker": worker_id,
+            "result": payload,
+            "metrics": service_metrics()
+        })
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        await service.warm_up()
+        current: Optional[asyncio.Task] = None
+        try:
+            while True:
+                try:
+                    message = await loop.run_in_executor(None, inbox.recv)
+                except EOFError:
+                    break  # the API process is gone
+                if message is None:
+                    break
+                if message.get("type") == "cancel":
+                    if current is not None and current.get_name() == message["job_id"]:
+                        current.cancel()
+                    continue
+                if message.get("type") == "metrics":
+                    outbox.send({"type": "metrics", "worker": worker_id, "metrics": service_metrics()})
+                    continue
+                current = asyncio.create_task(render(message), name=message["id"])
+            if current is not None:
+                await asyncio.gather(current, return_exceptions=True)
+        finally:
+            await service.close()
+
+    asyncio.run(run())
+
+class ScrapeWorkerPool:
+    """
+    Runs PlaywrightService in separate worker processes so rendering never
+    competes with the API's event loop or memory.
+
+    API code calls extract_dynamic_data() exactly as on PlaywrightService;
+    the call becomes a job in the pool's backlog and the coroutine resolves
+    when a worker posts the result. Each worker has its own pair of pipes
+    and runs one job at a time, so the pool always knows which worker holds
+    which job, and a killed worker cannot leave a shared queue lock behind.
+    A monitor restarts any worker that exits unexpectedly; the job it was
+    running is requeued, up to SCRAPE_WORKER_MAX_ATTEMPTS. A job that times
+    out is dropped from the backlog or cancelled in its worker, and a worker
+    that ignores the cancel for SCRAPE_WORKER_CANCEL_GRACE_SECONDS is killed.
+    """
+
+    def __init__(self, processes: int = None):
+        self.processes = processes or SCRAPE_WORKER_PROCESSES
+        self._ctx = multiprocessing.get_context("spawn")
+        self._busy_seconds = None
+        self._busy_flags = None
+        self._workers: List[Optional[multiprocessing.Process]] = []
+        self._inboxes: List[Optional[Connection]] = []
+        self._outboxes: List[Optional[Connection]] = []
+        self._backlog: Deque[Dict[str, Any]] = deque()
+        self._running: Dict[int, str] = {}  # worker id -> job id
+        self._cancelled_at: Dict[int, float] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._job_payloads: Dict[str, Dict[str, Any]] = {}
+        self._worker_metrics: Dict[int, Dict[str, Any]] = {}
+        self._metrics_waiters: Dict[int, List[asyncio.Future]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader: Optional[threading.Thread] = None
+        self._reader_stop = threading.Event()
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._started_at = None
+        self._stopping = False
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "requeued": 0, "timeouts": 0, "cancelled": 0, "killed": 0, "restarts": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._started_at is not None and not self._stopping
+
+    def _spawn(self, worker_id: int):
+        job_reader, job_writer = self._ctx.Pipe(duplex=False)
+        result_reader, result_writer = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, job_reader, result_writer, self._busy_seconds, self._busy_flags),
+            name=f"scrape-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        # The child holds its own copies; closing ours lets either side see EOF when the other dies
+        job_reader.close()
+        result_writer.close()
+        if self._inboxes[worker_id] is not None:
+            self._inboxes[worker_id].close()
+        self._workers[worker_id] = process
+        self._inboxes[worker_id] = job_writer
+        self._outboxes[worker_id] = result_reader
+
+    async def start(self):
+        if self._started_at is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._busy_seconds = self._ctx.Array("d", self.processes, lock=False)
+        self._busy_flags = self._ctx.Array("i", self.processes, lock=False)
+        self._workers = [None] * self.processes
+        self._inboxes = [None] * self.processes
+        self._outboxes = [None] * self.processes
+        for worker_id in range(self.processes):
+            self._spawn(worker_id)
+        self._started_at = time.monotonic()
+        self._reader_stop.clear()
+        self._reader = threading.Thread(target=self._read_results, name="scrape-worker-results", daemon=True)
+        self._reader.start()
+        self._monitor_task = asyncio.create_task(self._monitor())
+        logger.info(f"🧵 Started {self.processes} scrape worker processes")
+
+    def _read_results(self):
+        """Blocking reader thread: hands worker results to the event loop"""
+        closed = set()
+        while not self._reader_stop.is_set():
+            connections = [conn for conn in self._outboxes if conn is not None and conn not in closed]
+            if not connections:
+                self._reader_stop.wait(_MONITOR_INTERVAL)
+                continue
+            for conn in wait(connections, timeout=_MONITOR_INTERVAL):
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    # The worker exited; the monitor restarts it with fresh pipes
+                    closed.add(conn)
+                    conn.close()
+                    continue
+                self._loop.call_soon_threadsafe(self._on_message, message)
+
+    def _on_message(self, message: Dict[str, Any]):
+        if message.get("type") == "metrics":
+            self._worker_metrics[message["worker"]] = message["metrics"]
+            for waiter in self._metrics_waiters.pop(message["worker"], []):
+                if not waiter.done():
+                    waiter.set_result(None)
+            return
+        job_id, worker_id = message["job_id"], message["worker"]
+        if self._running.get(worker_id) == job_id:
+            del self._running[worker_id]
+            self._cancelled_at.pop(worker_id, None)
+        self._job_payloads.pop(job_id, None)
+        self._worker_metrics[worker_id] = message.get("metrics") or {}
+        future = self._pending.pop(job_id, None)
+        if future is not None and not future.done():
+            future.set_result(message["result"])
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand backlog jobs to idle workers, one job per worker"""
+        for worker_id, process in enumerate(self._workers):
+            if not self._backlog or self._stopping:
+                return
+            if worker_id in self._running or process is None or not process.is_alive():
+                continue
+            job = self._backlog.popleft()
+            self._running[worker_id] = job["id"]
+            try:
+                self._inboxes[worker_id].send(job)
+            except (OSError, ValueError):
+                # Died since the liveness check; the monitor requeues the job with the restart
+                pass
+
+    async def _monitor(self):
+        while not self._stopping:
+            await asyncio.sleep(_MONITOR_INTERVAL)
+            now = time.monotonic()
+            for worker_id, process in enumerate(self._workers):
+                if process is None or self._stopping:
+                    continue
+                cancelled_at = self._cancelled_at.get(worker_id)
+                if process.is_alive() and cancelled_at is not None and now - cancelled_at > SCRAPE_WORKER_CANCEL_GRACE:
+                    logger.warning(f"⚠️ Scrape worker {worker_id} ignored a cancel for {now - cancelled_at:.0f}s; killing it")
+                    self.stats["killed"] += 1
+                    process.kill()
+                    await asyncio.to_thread(process.join, 5)
+                if process.is_alive():
+                    continue
+                logger.error(f"💥 Scrape worker {worker_id} exited with code {process.exitcode}; restarting")
+                self.stats["restarts"] += 1
+                self._busy_flags[worker_id] = 0
+                self._recover_job(worker_id)
+                self._spawn(worker_id)
+            self._dispatch()
+
+    def _recover_job(self, worker_id: int):
+        self._cancelled_at.pop(worker_id, None)
+        job_id = self._running.pop(worker_id, None)
+        job = self._job_payloads.get(job_id)
+        future = self._pending.get(job_id)
+        if job is None or future is None or future.done():
+            return  # nobody is waiting for it any more
+        job["attempts"] += 1
+        if job["attempts"] <= SCRAPE_WORKER_MAX_ATTEMPTS:
+            self.stats["requeued"] += 1
+            self._backlog.appendleft(job)
+        else:
+            self._pending.pop(job_id, None)
+            self._job_payloads.pop(job_id, None)
+            future.set_result({
+                "success": False,
+                "data": {},
+                "message": "Scrape worker crashed while rendering this page",
+                "execution_time": 0,
+                "errors": ["worker_crashed"]
+            })
+
+    def _cancel(self, job_id: str):
+        """Drop a job nobody waits for: unqueue it, or tell its worker to stop rendering"""
+        job = self._job_payloads.get(job_id)
+        if job is not None and job in self._backlog:
+            self._backlog.remove(job)
+            return
+        for worker_id, running_id in self._running.items():
+            if running_id == job_id:
+                self.stats["cancelled"] += 1
+                self._cancelled_at[worker_id] = time.monotonic()
+                try:
+                    self._inboxes[worker_id].send({"type": "cancel", "job_id": job_id})
+                except (OSError, ValueError):
+                    pass
+                return
+
+    async def collect_metrics(self, timeout: float = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Pool, browser and resource-blocking stats per worker, asked for over
+        each worker's pipe; a worker that does not answer within timeout
+        (still warming up, say) is reported with its last known stats.
+        """
+        if self.running:
+            waiters = []
+            for worker_id, process in enumerate(self._workers):
+                if process is None or not process.is_alive():
+                    continue
+                waiter = self._loop.create_future()
+                try:
+                    self._inboxes[worker_id].send({"type": "metrics"})
+                except (OSError, ValueError):
+                    continue
+                self._metrics_waiters.setdefault(worker_id, []).append(waiter)
+                waiters.append(waiter)
+            if waiters:
+                await asyncio.wait(waiters, timeout=SCRAPE_WORKER_METRICS_TIMEOUT if timeout is None else timeout)
+            for waiter in waiters:
+                waiter.cancel()
+            for worker_id in list(self._metrics_waiters):
+                self._metrics_waiters[worker_id] = [waiter for waiter in self._metrics_waiters[worker_id] if not waiter.done()]
+                if not self._metrics_waiters[worker_id]:
+                    del self._metrics_waiters[worker_id]
+        return dict(self._worker_metrics)
+
+    async def extract_dynamic_data(self, url: str, selectors: Dict[str, str], wait_for_element: str = None, **kwargs):
+        """Same contract as PlaywrightService.extract_dynamic_data, run in a worker process"""
+        from automation_result import AutomationResult
+
+        job_id = str(uuid.uuid4())
+        job = {
+            "id": job_id,
+            "attempts": 1,
+            "kwargs": {"url": url, "selectors": selectors, "wait_for_element": wait_for_element, **kwargs}
+        }
+        future = self._loop.create_future()
+        self._pending[job_id] = future
+        self._job_payloads[job_id] = job
+        self.stats["submitted"] += 1
+        self._backlog.append(job)
+        self._dispatch()
+
+        try:
+            payload = await asyncio.wait_for(asyncio.shield(future), timeout=SCRAPE_WORKER_JOB_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self._cancel(job_id)
+            payload = {
+                "success": False,
+                "data": {},
+                "message": f"Scrape did not finish within {SCRAPE_WORKER_JOB_TIMEOUT:.0f}s",
+                "execution_time": SCRAPE_WORKER_JOB_TIMEOUT,
+                "errors": ["timeout"]
+            }
+        finally:
+            self._pending.pop(job_id, None)
+            self._job_payloads.pop(job_id, None)
+
+        self.stats["completed" if payload.get("success") else "failed"] += 1
+        return AutomationResult(**payload)
+
+    async def stop(self):
+        if self._started_at is None:
+            return
+        self._stopping = True
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+        for inbox in self._inboxes:
+            try:
+                inbox.send(None)
+            except (OSError, ValueError):
+                pass
+        for process in self._workers:
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, 15)
+            if process.is_alive():
+                process.terminate()
+        self._reader_stop.set()
+        await asyncio.to_thread(self._reader.join, 5)
+        for conn in [*self._inboxes, *self._outboxes]:
+            conn.close()
+        for future in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+        self._backlog.clear()
+        self._running.clear()
+        self._cancelled_at.clear()
+        self._metrics_waiters.clear()
+        self._started_at = None
+        self._stopping = False
+
+    def get_metrics(self) -> Dict[str, Any]:
+        if self._started_at is None:
+            return {"processes": self.processes, "running": False, **self.stats}
+        uptime = max(time.monotonic() - self._started_at, 1e-6)
+        return {
+            "processes": self.processes,
+            "running": True,
+            **self.stats,
+            "in_flight": len(self._pending),
+            "queued": len(self._backlog),
+            "busy_workers": sum(self._busy_flags),
+            # Share of worker time spent rendering since start
+            "utilization": round(sum(self._busy_seconds) / (uptime * self.processes), 3),
+            "workers": [
+                {
+                    "id": worker_id,
+                    "alive": bool(process and process.is_alive()),
+                    "pid": process.pid if process else None,
+                    "busy": bool(self._busy_flags[worker_id]),
+                    "busy_seconds": round(self._busy_seconds[worker_id], 1),
+                    "service": self._worker_metrics.get(worker_id)
+                }
+                for worker_id, process in enumerate(self._workers)
+            ]
+        }
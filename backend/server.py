@@ -1,23 +1,33 @@
 from fastapi import FastAPI, APIRouter, HTTPException
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 import uuid
 from datetime import datetime
 import json
 
 # Import our enhanced hybrid AI system
 from advanced_hybrid_ai import detect_intent, generate_friendly_draft, handle_general_chat, advanced_hybrid_ai
-from webhook_handler import send_approved_action
 from playwright_service import playwright_service, AutomationResult
+from scrape_engine import ScrapeEngine, close_scrape_client
+from scrape_cache import ScrapeCache
+from scrape_crawler import ScrapeCrawler, expand_urls
+from scrape_workers import ScrapeWorkerPool, SCRAPE_WORKER_PROCESSES
 from direct_automation_handler import direct_automation_handler
+from structured_data import StructuredDataExtractor
 from gmail_oauth_service import GmailOAuthService
+from webhook_handler import close_http_client, webhook_batcher
+from approval_queue import ApprovalQueue
+from gmail_token_refresher import GmailTokenRefresher
+from outbound_email_queue import OutboundEmailQueue, OUTBOUND_EMAIL_MAX_BULK
+from logging_config import configure_logging, shutdown_logging
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -30,17 +40,30 @@ db = client[os.environ['DB_NAME']]
 # Initialize Gmail OAuth service with database connection
 gmail_oauth_service = GmailOAuthService(db=db)
 
+# Refreshes Gmail tokens before they expire so requests rarely wait on Google
+gmail_token_refresher = GmailTokenRefresher(db, gmail_oauth_service)
+
+# Durable queue for delivering approved actions to n8n in the background
+approval_queue = ApprovalQueue(db)
+
+# Durable queue of outgoing Gmail messages, sent by background workers
+outbound_email_queue = OutboundEmailQueue(db, gmail_oauth_service)
+
+# Selector scrapes: plain HTTP first, Chromium when needed, results cached per (url, selectors)
+# Chromium runs in worker processes unless SCRAPE_WORKER_PROCESSES=0 keeps it in the API process
+scrape_workers = ScrapeWorkerPool() if SCRAPE_WORKER_PROCESSES > 0 else None
+scrape_engine = ScrapeEngine(scrape_workers or playwright_service, cache=ScrapeCache(db))
+scrape_crawler = ScrapeCrawler(scrape_engine, db)
+direct_automation_handler.product_extractor = StructuredDataExtractor(scrape_engine)
+
 # Create the main app without a prefix
 app = FastAPI()
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: queued, structured and off the event loop
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Models
@@ -74,11 +97,38 @@ class ApprovalRequest(BaseModel):
     approved: bool
     edited_data: Optional[dict] = None
 
+class OutboundEmail(BaseModel):
+    to: str
+    subject: Optional[str] = None
+    body: Optional[str] = None
+    cc: Optional[str] = None
+    bcc: Optional[str] = None
+
+class BulkEmailRequest(BaseModel):
+    session_id: str
+    subject: Optional[str] = None  # default for every email
+    body: Optional[str] = None  # default for every email
+    recipients: List[str] = []  # same subject and body to each address
+    emails: List[OutboundEmail] = []  # individually composed emails
+    sender_email: Optional[str] = None
+
 class WebAutomationRequest(BaseModel):
     session_id: str
     automation_type: str  # "web_scraping", "linkedin_insights", "email_automation", "data_extraction"
     parameters: dict
 
+class CrawlRequest(BaseModel):
+    session_id: str
+    selectors: dict
+    urls: List[str] = []
+    url_pattern: Optional[str] = None  # e.g. "https://shop.example/list?page={page}"
+    start_page: int = 1
+    end_page: Optional[int] = None
+    wait_for_element: Optional[str] = None
+    resource_policy: Optional[Union[str, dict]] = None
+    engine: Optional[str] = None  # "auto", "http" or "browser"
+    use_cache: bool = True
+
 # Helper functions
 def convert_objectid_to_str(doc):
     """Convert MongoDB ObjectId to string for JSON serialization"""
@@ -107,7 +157,7 @@ def convert_objectid_to_str(doc):
 @api_router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     try:
-        logger.info(f"🚀 Advanced Hybrid AI Chat: {request.message}")
+        logger.info("🚀 Advanced Hybrid AI Chat: %s", request.message)
         
         # Use advanced hybrid processing with sophisticated routing
         intent_data, response_text, routing_decision = await advanced_hybrid_ai.process_message(
@@ -115,8 +165,8 @@ async def chat(request: ChatRequest):
             request.session_id
         )
         
-        logger.info(f"🧠 Advanced Routing: {routing_decision.primary_model.value} (confidence: {routing_decision.confidence:.2f})")
-        logger.info(f"💡 Routing Logic: {routing_decision.reasoning}")
+        logger.info("🧠 Advanced Routing: %s (confidence: %.2f)", routing_decision.primary_model.value, routing_decision.confidence)
+        logger.debug("💡 Routing Logic: %s", routing_decision.reasoning)
         
         # Check if this is a direct automation intent
         intent = intent_data.get("intent", "general_chat")
@@ -124,7 +174,7 @@ async def chat(request: ChatRequest):
         
         if is_direct_automation:
             # Handle direct automation - bypass AI response generation and approval modal
-            logger.info(f"🔄 Direct automation detected: {intent}")
+            logger.info("🔄 Direct automation detected: %s", intent)
             
             # Process the automation directly
             automation_result = await direct_automation_handler.process_direct_automation(intent_data, request.session_id)
@@ -143,7 +193,7 @@ async def chat(request: ChatRequest):
             # No approval needed for direct automation
             needs_approval = False
             
-            logger.info(f"✅ Direct automation completed: {intent} - Success: {automation_result['success']}")
+            logger.info("✅ Direct automation completed: %s - Success: %s", intent, automation_result['success'])
             
         else:
             # Traditional flow for non-direct automation intents
@@ -156,10 +206,13 @@ async def chat(request: ChatRequest):
                 if intent_data.get("intent") == "web_scraping" and intent_data.get("url"):
                     # Execute web scraping directly if we have URL and selectors
                     try:
-                        automation_result = await playwright_service.extract_dynamic_data(
+                        automation_result = await scrape_engine.scrape(
                             intent_data.get("url"),
                             intent_data.get("selectors", {}),
-                            intent_data.get("wait_for_element")
+                            intent_data.get("wait_for_element"),
+                            tenant=request.session_id,
+                            resource_policy=intent_data.get("resource_policy"),
+                            use_cache=intent_data.get("use_cache", True)
                         )
                         
                         # Update response with automation results
@@ -167,6 +220,9 @@ async def chat(request: ChatRequest):
                             response_text += f"\n\n🔍 **Web Scraping Results:**\n{json.dumps(automation_result.data, indent=2)}"
                             intent_data["automation_result"] = automation_result.data
                             intent_data["automation_success"] = True
+                            intent_data["automation_engine"] = automation_result.engine
+                            intent_data["automation_cached"] = automation_result.cached
+                            intent_data["automation_cache_age"] = automation_result.cache_age
                             needs_approval = False  # No approval needed for successful scraping
                         else:
                             response_text += f"\n\n⚠️ **Scraping Error:** {automation_result.message}"
@@ -202,7 +258,7 @@ async def chat(request: ChatRequest):
 @api_router.post("/approve")
 async def approve_action(request: ApprovalRequest):
     try:
-        logger.info(f"Received approval request: {request}")
+        logger.debug("Received approval request: %s", request)
         
         # Get the message from database
         message = await db.chat_messages.find_one({"id": request.message_id})
@@ -219,29 +275,20 @@ async def approve_action(request: ApprovalRequest):
         
         # Use edited data if provided, otherwise use original intent data
         final_data = request.edited_data if request.edited_data else message["intent_data"]
-        logger.info(f"Sending to n8n with data: {final_data}")
         
-        # Send to n8n using our webhook handler
-        n8n_response = await send_approved_action(
-            final_data, 
-            message["user_id"], 
-            message["session_id"]
-        )
+        # Record the approval and hand delivery to the background workers
+        job = await approval_queue.enqueue_approval(message, final_data, request.edited_data)
+        if not job:
+            raise HTTPException(status_code=409, detail="Approval could not be queued")
         
-        # Update message in database with approval status and n8n response
-        await db.chat_messages.update_one(
-            {"id": request.message_id},
-            {"$set": {
-                "approved": request.approved, 
-                "n8n_response": n8n_response,
-                "edited_data": request.edited_data
-            }}
-        )
+        logger.info("Queued approval job %s for message %s", job['id'], request.message_id)
         
         return {
             "success": True,
-            "message": "Action executed successfully!" if n8n_response.get("success") else "Action sent but n8n had issues",
-            "n8n_response": n8n_response
+            "message": "Action approved and queued for delivery",
+            "job_id": job["id"],
+            "status": job["status"],
+            "status_url": f"/api/approve/status/{request.message_id}"
         }
         
     except HTTPException:
@@ -251,6 +298,20 @@ async def approve_action(request: ApprovalRequest):
         logger.error(f"Approval error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/approve/status/{message_id}")
+async def get_approval_status(message_id: str):
+    """Get n8n delivery status for an approved message"""
+    try:
+        status = await approval_queue.get_status(message_id)
+        if not status:
+            raise HTTPException(status_code=404, detail="Message not found")
+        return status
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Approval status error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/history/{session_id}")
 async def get_chat_history(session_id: str):
     try:
@@ -336,7 +397,15 @@ async def execute_web_automation(request: WebAutomationRequest):
             if not url or not selectors:
                 raise HTTPException(status_code=400, detail="URL and selectors are required for web scraping")
             
-            result = await playwright_service.extract_dynamic_data(url, selectors, wait_for_element)
+            result = await scrape_engine.scrape(
+                url,
+                selectors,
+                wait_for_element,
+                tenant=request.session_id,
+                resource_policy=request.parameters.get("resource_policy"),
+                mode=request.parameters.get("engine"),
+                use_cache=request.parameters.get("use_cache", True)
+            )
             
         elif request.automation_type == "linkedin_insights":
             # LinkedIn insights will be handled via Gmail API integration in the future
@@ -359,6 +428,8 @@ async def execute_web_automation(request: WebAutomationRequest):
             "success": result.success if result else False,
             "message": result.message if result else "Unknown error",
             "execution_time": result.execution_time if result else 0,
+            "engine": result.engine if result else None,
+            "cached": result.cached if result else False,
             "timestamp": datetime.utcnow()
         }
         
@@ -369,6 +440,9 @@ async def execute_web_automation(request: WebAutomationRequest):
             "data": result.data if result else {},
             "message": result.message if result else "Automation failed",
             "execution_time": result.execution_time if result else 0,
+            "engine": result.engine if result else None,
+            "cached": result.cached if result else False,
+            "cache_age_seconds": result.cache_age if result else None,
             "automation_id": automation_record["id"]
         }
         
@@ -378,6 +452,33 @@ async def execute_web_automation(request: WebAutomationRequest):
         logger.error(f"Web automation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/web-automation/crawl")
+async def crawl_web_pages(request: CrawlRequest):
+    """
+    Apply the same selectors to many URLs (a list and/or a {page} pattern).
+    Results stream back as NDJSON, one line per URL as it finishes, then a
+    summary line with done=true.
+    """
+    if not request.selectors:
+        raise HTTPException(status_code=400, detail="Selectors are required for crawling")
+    try:
+        urls = expand_urls(request.urls, request.url_pattern, request.start_page, request.end_page)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        scrape_crawler.stream_ndjson(
+            request.session_id,
+            urls,
+            request.selectors,
+            wait_for_element=request.wait_for_element,
+            resource_policy=request.resource_policy,
+            mode=request.engine,
+            use_cache=request.use_cache
+        ),
+        media_type="application/x-ndjson"
+    )
+
 @api_router.get("/automation-history/{session_id}")
 async def get_automation_history(session_id: str):
     """Get automation history for a session"""
@@ -591,24 +692,87 @@ async def gmail_send_email(request: dict):
         if not all([to, subject, body]):
             raise HTTPException(status_code=400, detail="to, subject, and body are required")
         
-        result = gmail_oauth_service.send_email(
+        result = await gmail_oauth_service.send_email(
             to=to,
             subject=subject,
             body=body,
             sender_email=request.get('from'),
             cc=request.get('cc'),
-            bcc=request.get('bcc')
+            bcc=request.get('bcc'),
+            session_id=request.get('session_id')
         )
         return result
     except Exception as e:
         logger.error(f"Gmail send error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/gmail/profile")
+async def gmail_profile(session_id: str):
+    """Connected Gmail user's profile, served from cache and revalidated in the background"""
+    try:
+        return await gmail_oauth_service.get_cached_profile(session_id)
+    except Exception as e:
+        logger.error(f"Gmail profile error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/gmail/send/bulk")
+async def gmail_send_bulk(request: BulkEmailRequest):
+    """Queue many emails for background sending; returns job ids immediately"""
+    try:
+        emails = [OutboundEmail(to=address) for address in request.recipients] + request.emails
+        if not emails:
+            raise HTTPException(status_code=400, detail="recipients or emails are required")
+        if len(emails) > OUTBOUND_EMAIL_MAX_BULK:
+            raise HTTPException(status_code=400, detail=f"At most {OUTBOUND_EMAIL_MAX_BULK} emails per request")
+        
+        composed = []
+        for email in emails:
+            subject = email.subject or request.subject
+            body = email.body or request.body
+            if not subject or not body:
+                raise HTTPException(status_code=400, detail=f"subject and body are required for {email.to}")
+            composed.append({"to": email.to, "subject": subject, "body": body, "cc": email.cc, "bcc": email.bcc})
+        
+        status = await gmail_oauth_service.get_auth_status(request.session_id)
+        if not status.get("authenticated"):
+            raise HTTPException(status_code=401, detail="Gmail authentication required. Please complete OAuth2 flow.")
+        
+        queued = await outbound_email_queue.enqueue_emails(request.session_id, composed, request.sender_email)
+        return {
+            "success": True,
+            "message": f"Queued {len(queued['job_ids'])} emails for sending",
+            "batch_id": queued["batch_id"],
+            "job_ids": queued["job_ids"],
+            "scheduled_until": queued["scheduled_until"],
+            "status_url": f"/api/gmail/send/batch/{queued['batch_id']}"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Gmail bulk send error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/gmail/send/status/{job_id}")
+async def gmail_send_status(job_id: str):
+    """Delivery status of one queued email"""
+    status = await outbound_email_queue.get_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Email job not found")
+    return status
+
+@api_router.get("/gmail/send/batch/{batch_id}")
+async def gmail_send_batch_status(batch_id: str):
+    """Delivery counts for a bulk send"""
+    status = await outbound_email_queue.get_batch_status(batch_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Email batch not found")
+    return status
+
 @api_router.get("/gmail/email/{message_id}")
-async def gmail_get_email(message_id: str):
+async def gmail_get_email(message_id: str, session_id: str = None):
     """Get specific email content using Gmail API"""
     try:
-        result = gmail_oauth_service.get_email_content(message_id)
+        result = await gmail_oauth_service.get_email_content(message_id, session_id)
         return result
     except Exception as e:
         logger.error(f"Gmail get email error: {e}")
@@ -621,6 +785,49 @@ async def root():
 async def root():
     return {"message": "Elva AI Backend with Advanced Hybrid Routing! 🤖✨🧠", "version": "2.0"}
 
+async def browser_metrics() -> Dict[str, Any]:
+    """
+    Pool, browser and resource-blocking stats from wherever pages render.
+    With scrape workers the API process's own browser sits idle, so each
+    field holds the workers' stats, collected over their pipes, instead.
+    """
+    if scrape_workers:
+        reported = await scrape_workers.collect_metrics()
+        return {
+            field: {
+                "scope": "workers",
+                "by_worker": {str(worker_id): metrics.get(field) for worker_id, metrics in sorted(reported.items())}
+            }
+            for field in ("pool", "browser", "resource_blocking")
+        }
+    return {
+        "pool": {"scope": "in_process", **playwright_service.pool.get_metrics()},
+        "browser": {"scope": "in_process", **playwright_service.supervisor.get_metrics()},
+        "resource_blocking": {"scope": "in_process", **playwright_service.blocker.get_stats()}
+    }
+
+# Runtime metrics for the background pipelines
+@api_router.get("/metrics")
+async def get_metrics():
+    browser = await browser_metrics()
+    return {
+        "gmail": {
+            "quota": gmail_oauth_service.quota.get_metrics(),
+            "client_cache": gmail_oauth_service.clients.get_stats(),
+            "body_cache": gmail_oauth_service.bodies.get_stats(),
+            "mailbox_mirror": gmail_oauth_service.mirror.stats if gmail_oauth_service.mirror else None,
+            "token_refresher": gmail_token_refresher.stats
+        },
+        "webhook_batcher": webhook_batcher.stats,
+        "browser_pool": browser["pool"],
+        "browser": browser["browser"],
+        "resource_blocking": browser["resource_blocking"],
+        "scrape_engine": scrape_engine.get_metrics(),
+        "scrape_crawler": scrape_crawler.get_stats(),
+        "scrape_workers": scrape_workers.get_metrics() if scrape_workers else None,
+        "structured_data": direct_automation_handler.product_extractor.get_stats()
+    }
+
 # Health check endpoint - Enhanced for advanced hybrid system
 @api_router.get("/health")
 async def health_check():
@@ -630,6 +837,7 @@ async def health_check():
         
         # Get Gmail OAuth status (default session for health check)
         gmail_status = await gmail_oauth_service.get_auth_status('health_check')
+        browser = await browser_metrics()
         
         health_status = {
             "status": "healthy",
@@ -640,12 +848,18 @@ async def health_check():
                 "credentials_configured": gmail_status.get('credentials_configured', False),
                 "authenticated": gmail_status.get('authenticated', False),
                 "scopes": gmail_oauth_service.scopes,
+                "client_cache": gmail_oauth_service.clients.get_stats(),
+                "body_cache": gmail_oauth_service.bodies.get_stats(),
+                "token_refresher": gmail_token_refresher.stats,
+                "mailbox_mirror": gmail_oauth_service.mirror.stats if gmail_oauth_service.mirror else None,
                 "endpoints": [
                     "/api/gmail/auth",
                     "/api/gmail/callback", 
                     "/api/gmail/status",
                     "/api/gmail/inbox",
                     "/api/gmail/send",
+                    "/api/gmail/send/bulk",
+                    "/api/gmail/profile",
                     "/api/gmail/email/{id}"
                 ]
             },
@@ -683,7 +897,9 @@ async def health_check():
                 "browser": "chromium",
                 "capabilities": [
                     "dynamic_data_extraction", "web_scraping"
-                ]
+                ],
+                "pool": browser["pool"],
+                "supervisor": browser["browser"]
             }
         }
         
@@ -702,8 +918,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_background_workers():
+    await approval_queue.start()
+    await gmail_token_refresher.start()
+    await outbound_email_queue.start()
+    try:
+        await scrape_engine.cache.ensure_indexes()
+    except Exception as e:
+        logger.warning(f"Scrape cache index creation failed: {e}")
+    if gmail_oauth_service.mirror:
+        await gmail_oauth_service.mirror.start()
+    if scrape_workers:
+        await scrape_workers.start()
+    else:
+        # Launch the browser in the background so startup is not held up by Chromium
+        asyncio.create_task(playwright_service.warm_up())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await approval_queue.stop()
+    await gmail_token_refresher.stop()
+    await outbound_email_queue.stop()
+    if gmail_oauth_service.mirror:
+        await gmail_oauth_service.mirror.stop()
+    await webhook_batcher.flush_all()
+    await close_http_client()
+    await close_scrape_client()
+    gmail_oauth_service.close()
     client.close()
     # Close Playwright service
-    await playwright_service.close()
\ No newline at end of file
+    if scrape_workers:
+        await scrape_workers.stop()
+    await playwright_service.close()
+    shutdown_logging()
\ No newline at end of file
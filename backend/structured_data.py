@@ -0,0 +1,384 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from automation_result import AutomationResult
+from scrape_cache import CachedScrape, cache_key
+from scrape_engine import HTML_PARSER, HttpScrapeMiss, ScrapeEngine
+
+logger = logging.getLogger(__name__)
+
+# Render the page in the browser when the static HTML carries no usable product data
+STRUCTURED_DATA_BROWSER_FALLBACK = os.getenv("STRUCTURED_DATA_BROWSER_FALLBACK", "true").lower() == "true"
+STRUCTURED_DATA_MAX_PRODUCTS = int(os.getenv("STRUCTURED_DATA_MAX_PRODUCTS", "50"))
+
+# The browser fallback asks for the rendered document and parses it like a fetched one
+RENDERED_SELECTORS = {"document": "html:html"}
+# Cache entries for structured extraction are keyed apart from selector scrapes of the same URL
+_CACHE_SELECTORS = {"structured_data": "product"}
+
+_PRODUCT_TYPES = {"product", "productgroup", "individualproduct", "productmodel"}
+# Digits with separators; a space only counts as a thousands separator ("1 234,50")
+_PRICE_RE = re.compile(r"\d(?:[\d.,]|\s(?=\d{3}\b))*")
+_CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "INR": "₹", "JPY": "¥"}
+_AVAILABILITY = {
+    value.lower(): value
+    for value in ("InStock", "OutOfStock", "PreOrder", "BackOrder", "SoldOut", "LimitedAvailability", "Discontinued", "OnlineOnly")
+}
+
+def _types(node: Dict[str, Any]) -> List[str]:
+    value = node.get("@type") or []
+    values = value if isinstance(value, list) else [value]
+    # "http://schema.org/Product" and "Product" are the same type
+    return [str(v).rsplit("/", 1)[-1].lower() for v in values]
+
+def parse_price(value: Any) -> Optional[float]:
+    """Number from "1,299.99", "$ 1.299,99", "1299" or a number; None when there is none"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = _PRICE_RE.search(value)
+    if not match:
+        return None
+    number = re.sub(r"\s", "", match.group()).rstrip(".,")
+    if "," in number and "." in number:
+        # Whichever separator comes last is the decimal point
+        decimal = "," if number.rfind(",") > number.rfind(".") else "."
+        number = number.replace("." if decimal == "," else ",", "").replace(",", ".")
+    elif "," in number:
+        whole, _, fraction = number.rpartition(",")
+        number = f"{whole.replace(',', '')}.{fraction}" if len(fraction) <= 2 else number.replace(",", "")
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+def _availability(value: Any) -> Optional[str]:
+    if not value:
+        return None
+    # schema.org URLs ("https://schema.org/InStock") and OpenGraph words ("in stock") both occur
+    text = str(value).rsplit("/", 1)[-1].strip()
+    return _AVAILABILITY.get(re.sub(r"[\s_-]", "", text).lower(), text)
+
+def _first(value: Any) -> Any:
+    return value[0] if isinstance(value, list) and value else value
+
+def _text(value: Any) -> Optional[str]:
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("url") or value.get("@id")
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _make_product(
+    source: str,
+    name: Any = None,
+    price: Any = None,
+    currency: Any = None,
+    rating: Any = None,
+    review_count: Any = None,
+    availability: Any = None,
+    url: Any = None,
+    image: Any = None
+) -> Dict[str, Any]:
+    count = parse_price(_text(review_count)) if review_count is not None else None
+    return {
+        "name": _text(name),
+        "price": parse_price(_first(price)),
+        "currency": (_text(currency) or "").upper() or None,
+        "rating": parse_price(_text(rating)) if rating is not None else None,
+        "review_count": int(count) if count is not None else None,
+        "availability": _availability(_text(availability)),
+        "url": _text(url),
+        "image": _text(image),
+        "source": source
+    }
+
+def _offer_fields(offers: Any) -> Tuple[Any, Any, Any]:
+    """(price, currency, availability) from the first Offer or AggregateOffer carrying a price"""
+    candidates = offers if isinstance(offers, list) else [offers]
+    for offer in candidates:
+        if not isinstance(offer, dict):
+            continue
+        specification = _first(offer.get("priceSpecification")) or {}
+        price = offer.get("price") or offer.get("lowPrice") or (specification.get("price") if isinstance(specification, dict) else None)
+        if price is None:
+            continue
+        currency = offer.get("priceCurrency") or (specification.get("priceCurrency") if isinstance(specification, dict) else None)
+        return price, currency, offer.get("availability")
+    return None, None, None
+
+def _jsonld_product(node: Dict[str, Any]) -> Dict[str, Any]:
+    price, currency, availability = _offer_fields(node.get("offers"))
+    rating = node.get("aggregateRating") if isinstance(node.get("aggregateRating"), dict) else {}
+    return _make_product(
+        "json-ld",
+        name=node.get("name"),
+        price=price,
+        currency=currency,
+        rating=rating.get("ratingValue"),
+        review_count=rating.get("reviewCount") or rating.get("ratingCount"),
+        availability=availability,
+        url=node.get("url"),
+        image=node.get("image")
+    )
+
+def _walk_jsonld(node: Any, products: List[Dict[str, Any]]):
+    if isinstance(node, list):
+        for item in node:
+            _walk_jsonld(item, products)
+    elif isinstance(node, dict):
+        if _PRODUCT_TYPES.intersection(_types(node)):
+            # Offers and variants inside a product are part of it, not products of their own
+            products.append(_jsonld_product(node))
+            return
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                _walk_jsonld(value, products)
+
+def jsonld_products(soup: BeautifulSoup) -> List[Dict[str, Any]]:
+    """Products in <script type="application/ld+json"> blocks, including @graph and ItemList"""
+    products: List[Dict[str, Any]] = []
+    for script in soup.find_all("script", type=re.compile(r"application/ld\+json", re.IGNORECASE)):
+        raw = script.string or script.get_text()
+        if not raw or not raw.strip():
+            continue
+        try:
+            # strict=False tolerates raw newlines inside strings, which CMSes emit
+            document = json.loads(raw, strict=False)
+        except ValueError:
+            logger.debug("Skipping unparsable JSON-LD block (%d chars)", len(raw))
+            continue
+        _walk_jsonld(document, products)
+    return products
+
+def _microdata_value(element) -> Any:
+    if element.has_attr("itemscope"):
+        return _microdata_item(element)
+    if element.has_attr("content"):
+        return element["content"]
+    for attr in ("href", "src") if element.name in ("a", "link", "img", "source") else ():
+        if element.has_attr(attr):
+            return element[attr]
+    if element.name == "meta":
+        return None
+    return element.get_text(" ", strip=True)
+
+def _microdata_item(scope) -> Dict[str, Any]:
+    """itemprop values that belong to scope itself, not to an itemscope nested inside it"""
+    item: Dict[str, Any] = {"@type": scope.get("itemtype", "")}
+    for element in scope.find_all(attrs={"itemprop": True}):
+        owner = element.find_parent(attrs={"itemscope": True})
+        if owner is not scope:
+            continue
+        for prop in element["itemprop"].split():
+            item.setdefault(prop, _microdata_value(element))
+    return item
+
+def microdata_products(soup: BeautifulSoup) -> List[Dict[str, Any]]:
+    """Products marked up with itemscope/itemtype="https://schema.org/Product\""""
+    products = []
+    for scope in soup.find_all(attrs={"itemscope": True, "itemtype": re.compile(r"schema\.org/Product", re.IGNORECASE)}):
+        # Skip products nested in another product (variants, accessories)
+        if scope.find_parent(attrs={"itemscope": True, "itemtype": re.compile(r"schema\.org/Product", re.IGNORECASE)}):
+            continue
+        item = _microdata_item(scope)
+        offers = item.get("offers") if isinstance(item.get("offers"), dict) else {}
+        rating = item.get("aggregateRating") if isinstance(item.get("aggregateRating"), dict) else {}
+        products.append(_make_product(
+            "microdata",
+            name=item.get("name"),
+            price=offers.get("price") or offers.get("lowPrice") or item.get("price"),
+            currency=offers.get("priceCurrency") or item.get("priceCurrency"),
+            rating=rating.get("ratingValue"),
+            review_count=rating.get("reviewCount") or rating.get("ratingCount"),
+            availability=offers.get("availability") or item.get("availability"),
+            url=item.get("url"),
+            image=item.get("image")
+        ))
+    return products
+
+def opengraph_product(soup: BeautifulSoup) -> Optional[Dict[str, Any]]:
+    """The page-level product from og:/product: meta tags, or None without a price"""
+    meta = {}
+    for tag in soup.find_all("meta"):
+        key = (tag.get("property") or tag.get("name") or "").lower()
+        if key.startswith(("og:", "product:")) and tag.get("content") and key not in meta:
+            meta[key] = tag["content"]
+    price = meta.get("product:price:amount") or meta.get("og:price:amount")
+    if price is None:
+        return None
+    return _make_product(
+        "opengraph",
+        name=meta.get("og:title"),
+        price=price,
+        currency=meta.get("product:price:currency") or meta.get("og:price:currency"),
+        availability=meta.get("product:availability") or meta.get("og:availability"),
+        url=meta.get("og:url"),
+        image=meta.get("og:image")
+    )
+
+def extract_products(html: str) -> List[Dict[str, Any]]:
+    """
+    Products embedded in html as JSON-LD, microdata or OpenGraph, in that
+    order of preference. A page with a single product has its missing
+    fields filled from the other sources. CPU-bound; call it off the loop.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    products = jsonld_products(soup) or microdata_products(soup)
+    opengraph = opengraph_product(soup)
+    if not products and opengraph is not None:
+        products = [opengraph]
+    elif len(products) == 1:
+        for extra in microdata_products(soup) + ([opengraph] if opengraph else []):
+            for field_name, value in extra.items():
+                if products[0].get(field_name) is None:
+                    products[0][field_name] = value
+    products = [product for product in products if product["name"] or product["price"] is not None]
+    return products[:STRUCTURED_DATA_MAX_PRODUCTS]
+
+def format_price(price: Optional[float], currency: Optional[str]) -> str:
+    if price is None:
+        return "n/a"
+    symbol = _CURRENCY_SYMBOLS.get(currency or "")
+    if symbol:
+        return f"{symbol}{price:,.2f}"
+    return f"{price:,.2f} {currency}" if currency else f"{price:,.2f}"
+
+class StructuredDataExtractor:
+    """
+    Price, name, rating and availability of product pages from the
+    structured data they embed (JSON-LD, microdata, OpenGraph).
+
+    One plain GET and a parse answer most product pages; the browser is
+    only used when the static HTML has no product with a price (or the
+    fetch fails), and then the rendered document goes through the same
+    parser. Results share the ScrapeEngine's cache, with conditional
+    revalidation for pages fetched over HTTP.
+    """
+
+    def __init__(self, engine: Optional[ScrapeEngine] = None):
+        self.engine = engine or ScrapeEngine()
+        self.metrics = {"http": 0, "browser": 0, "misses": 0, "http_seconds_total": 0.0, "browser_seconds_total": 0.0}
+        self.sources = defaultdict(int)
+        self.fallbacks = defaultdict(int)
+
+    async def _from_http(self, url: str, validators: Optional[Dict[str, str]]):
+        """(products, response); products is None when validators matched. Raises HttpScrapeMiss."""
+        html, response = await self.engine.fetch(url, validators)
+        if html is None:
+            return None, response
+        products = await asyncio.to_thread(extract_products, html)
+        if not products:
+            raise HttpScrapeMiss("no_structured_data")
+        if all(product["price"] is None for product in products):
+            raise HttpScrapeMiss("no_price")
+        return products, response
+
+    async def _from_browser(self, url: str, tenant: Optional[str], use_cache: bool) -> Tuple[List[Dict[str, Any]], AutomationResult]:
+        rendered = await self.engine.scrape(url, RENDERED_SELECTORS, tenant=tenant, mode="browser", use_cache=use_cache)
+        document = rendered.data.get("document") if rendered.success else None
+        if not document:
+            return [], rendered
+        return await asyncio.to_thread(extract_products, document), rendered
+
+    def _result(self, url: str, products: List[Dict[str, Any]], engine: str, start_time: float, **extra) -> AutomationResult:
+        for product in products:
+            self.sources[product["source"]] += 1
+        return AutomationResult(
+            success=True,
+            data={"url": url, "count": len(products), "products": products},
+            message=f"Found {len(products)} product(s) in the structured data of {url}",
+            execution_time=time.time() - start_time,
+            engine=engine,
+            **extra
+        )
+
+    async def extract(self, url: str, tenant: str = None, mode: str = None, use_cache: bool = True) -> AutomationResult:
+        """
+        Products on url. mode "http" never renders, "browser" always does,
+        anything else tries HTTP first and falls back when
+        STRUCTURED_DATA_BROWSER_FALLBACK allows.
+        """
+        start_time = time.time()
+        cache = self.engine.cache if use_cache else None
+        # Only HTTP results are stored under this key, so it is shared across tenants;
+        # the engine caches a browser fallback's rendered document per tenant
+        key_mode = mode if mode in ("http", "browser") else "auto"
+        key = cache_key(url, _CACHE_SELECTORS, mode=key_mode) if cache is not None else None
+        entry = await cache.get(key) if key else None
+        if entry is not None and cache.is_fresh(entry):
+            return self._result(url, entry.data["products"], entry.engine, start_time, cached=True, cache_age=round(entry.age, 1))
+
+        reason = "forced" if mode == "browser" else None
+        if reason is None:
+            validators = entry.conditional_headers() if entry is not None and entry.engine == "http" and entry.revalidatable else None
+            try:
+                products, response = await self._from_http(url, validators)
+                if products is None:
+                    await cache.mark_revalidated(entry)
+                    return self._result(url, entry.data["products"], entry.engine, start_time, cached=True, cache_age=round(entry.age, 1))
+                result = self._result(url, products, "http", start_time)
+                self.metrics["http"] += 1
+                self.metrics["http_seconds_total"] += result.execution_time
+                logger.info(f"⚡ Read {len(products)} product(s) from the structured data of {url} in {result.execution_time:.2f}s")
+                if key:
+                    await cache.put(CachedScrape(
+                        key=key,
+                        url=url,
+                        data=result.data,
+                        engine="http",
+                        fetched_at=time.time(),
+                        etag=response.headers.get("etag"),
+                        last_modified=response.headers.get("last-modified")
+                    ))
+                return result
+            except HttpScrapeMiss as miss:
+                reason = miss.reason
+                if mode == "http" or not STRUCTURED_DATA_BROWSER_FALLBACK:
+                    self.metrics["misses"] += 1
+                    return AutomationResult(
+                        success=False,
+                        data={"url": url, "count": 0, "products": []},
+                        message=f"No product data found on {url} over HTTP: {reason}",
+                        execution_time=time.time() - start_time,
+                        errors=[reason],
+                        engine="http"
+                    )
+
+        self.fallbacks[reason] += 1
+        logger.info(f"🌐 Rendering {url} for structured data ({reason})")
+        products, rendered = await self._from_browser(url, tenant, use_cache)
+        self.metrics["browser"] += 1
+        self.metrics["browser_seconds_total"] += time.time() - start_time
+        if not products:
+            self.metrics["misses"] += 1
+            return AutomationResult(
+                success=False,
+                data={"url": url, "count": 0, "products": []},
+                message=rendered.message if not rendered.success else f"No product data found on {url}",
+                execution_time=time.time() - start_time,
+                errors=rendered.errors or [reason],
+                engine="browser"
+            )
+        # The rendered document is already cached by the engine under RENDERED_SELECTORS
+        return self._result(url, products, "browser", start_time, cached=rendered.cached, cache_age=rendered.cache_age)
+
+    def get_stats(self) -> Dict[str, Any]:
+        answered = self.metrics["http"] + self.metrics["browser"]
+        return {
+            **self.metrics,
+            "http_share": self.metrics["http"] / answered if answered else 0.0,
+            "sources": dict(self.sources),
+            "fallbacks": dict(self.fallbacks)
+        }
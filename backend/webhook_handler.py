@@ -1,8 +1,11 @@
 import os
+import gzip
+import json
+import asyncio
 import httpx
 import logging
 from dotenv import load_dotenv
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -10,49 +13,92 @@ logger = logging.getLogger(__name__)
 # N8N webhook URL from environment
 N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "https://kumararpit9468.app.n8n.cloud/webhook/elva-entry")
 
-async def send_to_n8n(webhook_data: dict) -> dict:
+# Connection pool settings for the shared n8n client
+N8N_HTTP2 = os.getenv("N8N_HTTP2", "true").lower() == "true"
+N8N_MAX_CONNECTIONS = int(os.getenv("N8N_MAX_CONNECTIONS", "20"))
+N8N_MAX_KEEPALIVE = int(os.getenv("N8N_MAX_KEEPALIVE_CONNECTIONS", "10"))
+N8N_KEEPALIVE_EXPIRY = float(os.getenv("N8N_KEEPALIVE_EXPIRY", "60"))
+N8N_CONNECT_TIMEOUT = float(os.getenv("N8N_CONNECT_TIMEOUT", "5"))
+N8N_READ_TIMEOUT = float(os.getenv("N8N_READ_TIMEOUT", "30"))
+N8N_WRITE_TIMEOUT = float(os.getenv("N8N_WRITE_TIMEOUT", "10"))
+N8N_POOL_TIMEOUT = float(os.getenv("N8N_POOL_TIMEOUT", "5"))
+
+# Opt-in batching: collect payloads for a short window and send one gzip array per destination
+N8N_BATCH_MODE = os.getenv("N8N_BATCH_MODE", "false").lower() == "true"
+N8N_BATCH_WINDOW_MS = float(os.getenv("N8N_BATCH_WINDOW_MS", "250"))
+N8N_BATCH_MAX_SIZE = int(os.getenv("N8N_BATCH_MAX_SIZE", "100"))
+N8N_BATCH_INTENTS = [i.strip() for i in os.getenv("N8N_BATCH_INTENTS", "add_todo,set_reminder").split(",") if i.strip()]
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
     """
-    Send approved action data to n8n webhook
-    
-    Args:
-        webhook_data (dict): Formatted data to send to n8n
-        
-    Returns:
-        dict: Response from n8n webhook or error information
+    Get the app-scoped pooled client used for n8n deliveries.
+    Connections are kept alive and reused, so only the first delivery to the
+    n8n endpoint pays the TCP+TLS handshake.
     """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        http2 = N8N_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("h2 package not installed, n8n client falling back to HTTP/1.1")
+                http2 = False
+
+        _http_client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=N8N_MAX_CONNECTIONS,
+                max_keepalive_connections=N8N_MAX_KEEPALIVE,
+                keepalive_expiry=N8N_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=N8N_CONNECT_TIMEOUT,
+                read=N8N_READ_TIMEOUT,
+                write=N8N_WRITE_TIMEOUT,
+                pool=N8N_POOL_TIMEOUT
+            ),
+            headers={"Content-Type": "application/json"}
+        )
+    return _http_client
+
+async def close_http_client():
+    """Close the shared n8n client; called from the app shutdown hook"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def _post_to_n8n(url: str, **request_kwargs) -> dict:
+    """Post to an n8n webhook through the pooled client and normalize the outcome"""
     try:
-        logger.info(f"Sending data to n8n webhook: {N8N_WEBHOOK_URL}")
-        logger.info(f"Webhook payload: {webhook_data}")
+        client = get_http_client()
+        response = await client.post(url, **request_kwargs)
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                N8N_WEBHOOK_URL, 
-                json=webhook_data,
-                headers={"Content-Type": "application/json"}
-            )
-            
-            # Log response details
-            logger.info(f"N8N webhook response status: {response.status_code}")
-            logger.info(f"N8N webhook response headers: {response.headers}")
-            
-            response.raise_for_status()
-            
-            # Try to parse JSON response
-            try:
-                response_data = response.json()
-                logger.info(f"N8N webhook response data: {response_data}")
-                return {
-                    "success": True,
-                    "status_code": response.status_code,
-                    "data": response_data
-                }
-            except Exception:
-                # If response is not JSON, return text
-                return {
-                    "success": True,
-                    "status_code": response.status_code,
-                    "data": response.text
-                }
+        # Log response details
+        logger.info("N8N webhook response status: %s (%s)", response.status_code, response.http_version)
+        logger.debug("N8N webhook response headers: %s", response.headers)
+        
+        response.raise_for_status()
+        
+        # Try to parse JSON response
+        try:
+            response_data = response.json()
+            logger.debug("N8N webhook response data: %s", response_data)
+            return {
+                "success": True,
+                "status_code": response.status_code,
+                "data": response_data
+            }
+        except Exception:
+            # If response is not JSON, return text
+            return {
+                "success": True,
+                "status_code": response.status_code,
+                "data": response.text
+            }
                 
     except httpx.TimeoutException as e:
         error_msg = f"N8N webhook timeout: {str(e)}"
@@ -82,6 +128,168 @@ async def send_to_n8n(webhook_data: dict) -> dict:
             "message": error_msg
         }
 
+async def send_to_n8n(webhook_data: dict, url: str = None, idempotency_key: str = None) -> dict:
+    """
+    Send approved action data to n8n webhook
+    
+    Args:
+        webhook_data (dict): Formatted data to send to n8n
+        url (str): Destination webhook, defaults to N8N_WEBHOOK_URL
+        idempotency_key (str): Sent as the Idempotency-Key header when given
+        
+    Returns:
+        dict: Response from n8n webhook or error information
+    """
+    url = url or N8N_WEBHOOK_URL
+    logger.info("Sending %s to n8n webhook: %s", webhook_data.get("intent"), url)
+    logger.debug("Webhook payload: %s", webhook_data)
+    
+    headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+    return await _post_to_n8n(url, json=webhook_data, headers=headers)
+
+def _split_batch_response(result: dict, items: List[dict]) -> List[dict]:
+    """
+    Map a batch response back to its items.
+    
+    n8n may answer with a list in request order, an object with a "results"
+    list, or results tagged with message_id. Anything else (including a failed
+    request) applies to every item in the batch.
+    """
+    if not result.get("success"):
+        return [dict(result) for _ in items]
+
+    data = result.get("data")
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        data = data["results"]
+
+    if isinstance(data, list) and data:
+        by_message_id = {
+            entry.get("message_id"): entry
+            for entry in data
+            if isinstance(entry, dict) and entry.get("message_id")
+        }
+        if by_message_id:
+            entries = [by_message_id.get(item.get("message_id")) for item in items]
+        elif len(data) == len(items):
+            entries = data
+        else:
+            entries = None
+
+        if entries is not None:
+            results = []
+            for entry in entries:
+                if entry is None:
+                    results.append({
+                        "success": False,
+                        "error": "missing_batch_result",
+                        "message": "n8n batch response did not include this item"
+                    })
+                    continue
+                item_success = entry.get("success", True) if isinstance(entry, dict) else True
+                item_result = {
+                    "success": bool(item_success),
+                    "status_code": result["status_code"],
+                    "data": entry,
+                    "batched": True
+                }
+                if not item_success:
+                    item_result["error"] = "item_error"
+                    item_result["message"] = entry.get("message") or entry.get("error") or "n8n rejected batch item"
+                results.append(item_result)
+            return results
+
+    return [{**result, "batched": True} for _ in items]
+
+async def send_batch_to_n8n(items: List[dict], url: str = None) -> List[dict]:
+    """
+    Send several formatted payloads to n8n as one gzip-compressed JSON array
+    
+    Args:
+        items (list): Formatted webhook payloads
+        url (str): Destination webhook, defaults to N8N_WEBHOOK_URL
+        
+    Returns:
+        list: One result dict per item, in the same order
+    """
+    url = url or N8N_WEBHOOK_URL
+    body = gzip.compress(json.dumps(items, default=str).encode("utf-8"))
+    logger.info("Sending batch of %d items to n8n webhook: %s (%d bytes gzipped)", len(items), url, len(body))
+    
+    result = await _post_to_n8n(
+        url,
+        content=body,
+        headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            "X-Elva-Batch-Size": str(len(items))
+        }
+    )
+    return _split_batch_response(result, items)
+
+class WebhookBatcher:
+    """
+    Collects payloads per destination for a short window and delivers each
+    group as a single compressed request. Callers await their own item's result.
+    """
+    
+    def __init__(self, window_ms: float, max_size: int):
+        self.window = window_ms / 1000.0
+        self.max_size = max(1, max_size)
+        self._pending: Dict[str, List[Tuple[dict, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._inflight = set()
+        self.stats = {"items": 0, "requests": 0}
+    
+    async def submit(self, webhook_data: dict, url: str = None) -> dict:
+        url = url or N8N_WEBHOOK_URL
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(url, [])
+        batch.append((webhook_data, future))
+        
+        if len(batch) >= self.max_size:
+            self._flush(url)
+        elif url not in self._timers:
+            self._timers[url] = asyncio.create_task(self._flush_later(url))
+        
+        return await future
+    
+    async def _flush_later(self, url: str):
+        await asyncio.sleep(self.window)
+        self._timers.pop(url, None)
+        self._flush(url)
+    
+    def _flush(self, url: str):
+        timer = self._timers.pop(url, None)
+        if timer and timer is not asyncio.current_task():
+            timer.cancel()
+        batch = self._pending.pop(url, [])
+        if batch:
+            task = asyncio.create_task(self._deliver(url, batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+    
+    async def _deliver(self, url: str, batch: List[Tuple[dict, asyncio.Future]]):
+        items = [item for item, _ in batch]
+        self.stats["items"] += len(items)
+        self.stats["requests"] += 1
+        try:
+            results = await send_batch_to_n8n(items, url)
+        except Exception as e:
+            results = [{"success": False, "error": "unexpected_error", "message": str(e)} for _ in items]
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+    
+    async def flush_all(self):
+        """Deliver everything still waiting for its window; used on shutdown"""
+        for url in list(self._pending):
+            self._flush(url)
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+webhook_batcher = WebhookBatcher(N8N_BATCH_WINDOW_MS, N8N_BATCH_MAX_SIZE)
+
 def validate_webhook_data(webhook_data: dict) -> bool:
     """
     Validate webhook data before sending to n8n
@@ -107,23 +315,37 @@ def validate_webhook_data(webhook_data: dict) -> bool:
     
     return True
 
-async def send_approved_action(intent_data: dict, user_id: str, session_id: str) -> dict:
+def build_webhook_payload(intent_data: dict, user_id: str, session_id: str, message_id: str = None) -> dict:
     """
-    High-level function to send approved action to n8n
+    Format intent data into the payload n8n receives
     
     Args:
         intent_data (dict): Intent data from LLM
         user_id (str): User identifier
         session_id (str): Session identifier
+        message_id (str): Originating chat message, used to map batched results
         
     Returns:
-        dict: Result of webhook call
+        dict: Webhook payload
     """
     from advanced_hybrid_ai import format_intent_for_webhook
     
-    # Format data for webhook
     webhook_data = format_intent_for_webhook(intent_data, user_id, session_id)
+    if message_id:
+        webhook_data["message_id"] = message_id
+    return webhook_data
+
+async def deliver_webhook(webhook_data: dict, idempotency_key: str = None) -> dict:
+    """
+    Validate and deliver a formatted payload to n8n
     
+    Args:
+        webhook_data (dict): Payload from build_webhook_payload
+        idempotency_key (str): Stable key for this delivery so n8n can drop replays
+        
+    Returns:
+        dict: Result of webhook call
+    """
     # Validate data
     if not validate_webhook_data(webhook_data):
         return {
@@ -132,5 +354,28 @@ async def send_approved_action(intent_data: dict, user_id: str, session_id: str)
             "message": "Invalid webhook data format"
         }
     
+    if idempotency_key:
+        webhook_data = {**webhook_data, "idempotency_key": idempotency_key}
+    
+    # Bursty low-stakes intents can share one request when batching is enabled
+    if N8N_BATCH_MODE and webhook_data["intent"] in N8N_BATCH_INTENTS:
+        return await webhook_batcher.submit(webhook_data)
+    
     # Send to n8n
-    return await send_to_n8n(webhook_data)
\ No newline at end of file
+    return await send_to_n8n(webhook_data, idempotency_key=idempotency_key)
+
+async def send_approved_action(intent_data: dict, user_id: str, session_id: str, message_id: str = None) -> dict:
+    """
+    High-level function to send approved action to n8n
+    
+    Args:
+        intent_data (dict): Intent data from LLM
+        user_id (str): User identifier
+        session_id (str): Session identifier
+        message_id (str): Originating chat message, used to map batched results
+        
+    Returns:
+        dict: Result of webhook call
+    """
+    webhook_data = build_webhook_payload(intent_data, user_id, session_id, message_id)
+    return await deliver_webhook(webhook_data)
@@ -0,0 +1,226 @@
+"""
+Local fake of the Gmail REST API used by the Gmail benchmarks.
+
+Serves a synthetic mailbox for users/me: messages.list, messages.get
+(metadata and full), getProfile, history.list and the multipart batch
+endpoint (batchPath "batch"). Every HTTP request, batched or not, costs one
+simulated RTT, so round-trip savings show up the way they would against Google.
+"""
+
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+SENDERS = [
+    ("Sarah Johnson", "sarah@acme.io"), ("GitHub", "noreply@github.com"),
+    ("Product Hunt", "hello@producthunt.com"), ("Mike Chen", "mike@example.com"),
+    ("Stripe", "receipts@stripe.com"), ("Priya Patel", "priya@startup.dev")
+]
+WORDS = (
+    "quarterly planning invoice launch meeting review design release update weekly "
+    "report budget roadmap hiring customer feedback demo contract travel security"
+).split()
+
+
+def build_mailbox(size: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    messages = []
+    for i in range(size):
+        name, address = SENDERS[i % len(SENDERS)]
+        subject = " ".join(rng.choice(WORDS) for _ in range(4)).capitalize()
+        snippet = " ".join(rng.choice(WORDS) for _ in range(18))
+        sent = start + timedelta(minutes=37 * i)
+        labels = ["INBOX"] + (["UNREAD"] if i % 3 == 0 else []) + (["IMPORTANT"] if i % 7 == 0 else [])
+        messages.append({
+            "id": f"{0x18a000000 + i:x}",
+            "threadId": f"{0x18a000000 + i // 2:x}",
+            "labelIds": labels,
+            "snippet": snippet,
+            "historyId": str(1000 + i),
+            "internalDate": str(int(sent.timestamp() * 1000)),
+            "headers": [
+                {"name": "From", "value": f"{name} <{address}>"},
+                {"name": "To", "value": "me@example.com"},
+                {"name": "Subject", "value": subject},
+                {"name": "Date", "value": format_datetime(sent)}
+            ],
+            "body": f"Hello,\n\n{snippet}.\n\n" + "Details follow. " * 50
+        })
+    # Newest first, like Gmail
+    messages.reverse()
+    return messages
+
+
+class FakeGmailState:
+    def __init__(self, mailbox_size: int, rtt: float):
+        self.messages = build_mailbox(mailbox_size)
+        self.by_id = {m["id"]: m for m in self.messages}
+        self.rtt = rtt
+        self.history_id = 1000 + mailbox_size
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def matches(self, message: dict, query: str) -> bool:
+        for term in (query or "").split():
+            if term == "is:unread" and "UNREAD" not in message["labelIds"]:
+                return False
+            if term == "in:inbox" and "INBOX" not in message["labelIds"]:
+                return False
+            if term.startswith("from:") and term[5:].lower() not in message["headers"][0]["value"].lower():
+                return False
+            if term.startswith("subject:") and term[8:].lower() not in message["headers"][2]["value"].lower():
+                return False
+            if ":" not in term and term.lower() not in (message["headers"][2]["value"] + " " + message["snippet"]).lower():
+                return False
+        return True
+
+    def message_resource(self, message: dict, fmt: str) -> dict:
+        resource = {
+            "id": message["id"],
+            "threadId": message["threadId"],
+            "labelIds": message["labelIds"],
+            "snippet": message["snippet"],
+            "historyId": message["historyId"],
+            "internalDate": message["internalDate"]
+        }
+        if fmt == "full":
+            data = base64.urlsafe_b64encode(message["body"].encode()).decode()
+            resource["payload"] = {
+                "mimeType": "multipart/alternative",
+                "headers": message["headers"],
+                "parts": [
+                    {"partId": "0", "mimeType": "text/plain", "body": {"size": len(message["body"]), "data": data}}
+                ]
+            }
+        else:
+            resource["payload"] = {"mimeType": "multipart/alternative", "headers": message["headers"]}
+        return resource
+
+    def dispatch(self, method: str, target: str):
+        """Handle one API call; returns (status, json-serializable body)"""
+        parsed = urlparse(target)
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        path = parsed.path.rstrip("/")
+        prefix = "/gmail/v1/users/me"
+
+        if method == "GET" and path == f"{prefix}/messages":
+            matching = [m for m in self.messages if self.matches(m, params.get("q", ""))]
+            offset = int(params.get("pageToken", "0"))
+            limit = min(500, int(params.get("maxResults", "100")))
+            page = matching[offset:offset + limit]
+            body = {
+                "messages": [{"id": m["id"], "threadId": m["threadId"]} for m in page],
+                "resultSizeEstimate": len(matching)
+            }
+            if offset + limit < len(matching):
+                body["nextPageToken"] = str(offset + limit)
+            return 200, body
+
+        if method == "GET" and path.startswith(f"{prefix}/messages/"):
+            message = self.by_id.get(path.rsplit("/", 1)[-1])
+            if not message:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            return 200, self.message_resource(message, params.get("format", "full"))
+
+        if method == "GET" and path == f"{prefix}/profile":
+            return 200, {
+                "emailAddress": "me@example.com",
+                "messagesTotal": len(self.messages),
+                "threadsTotal": len(self.messages) // 2,
+                "historyId": str(self.history_id)
+            }
+
+        if method == "GET" and path == f"{prefix}/history":
+            return 200, {"history": [], "historyId": str(self.history_id)}
+
+        return 404, {"error": {"code": 404, "message": f"Unknown route {method} {path}"}}
+
+
+class FakeGmailHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: FakeGmailState = None
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_network(self):
+        with self.state.lock:
+            self.state.requests += 1
+        time.sleep(self.state.rtt)
+
+    def do_GET(self):
+        self._simulate_network()
+        status, body = self.state.dispatch("GET", self.path)
+        self._send(status, json.dumps(body).encode(), "application/json; charset=UTF-8")
+
+    def do_POST(self):
+        self._simulate_network()
+        length = int(self.headers.get("Content-Length", 0))
+        payload = self.rfile.read(length)
+        if not self.path.startswith("/batch"):
+            self._send(404, b"{}", "application/json")
+            return
+
+        boundary = self.headers["Content-Type"].split("boundary=", 1)[1].strip('"')
+        out_boundary = f"batch_{uuid.uuid4().hex}"
+        chunks = []
+        for part in payload.decode().split(f"--{boundary}")[1:]:
+            part = part.replace("\r\n", "\n").strip("\n")
+            if part.startswith("--"):
+                break
+            part_headers, _, inner = part.partition("\n\n")
+            content_id = next(
+                (line.split(":", 1)[1].strip() for line in part_headers.split("\n") if line.lower().startswith("content-id")),
+                "<unknown + 0>"
+            )
+            request_line = inner.split("\n", 1)[0]
+            method, target, _ = request_line.split(" ", 2)
+            status, body = self.state.dispatch(method, target)
+            reason = "OK" if status == 200 else "Not Found"
+            chunks.append(
+                f"--{out_boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id[1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {reason}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(body)}\r\n"
+            )
+        chunks.append(f"--{out_boundary}--\r\n")
+        self._send(200, "".join(chunks).encode(), f"multipart/mixed; boundary={out_boundary}")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_gmail(mailbox_size: int = 600, rtt: float = 0.02):
+    """Start the fake API in a background thread; returns (root_url, state)"""
+    state = FakeGmailState(mailbox_size, rtt)
+    handler = type("BoundFakeGmailHandler", (FakeGmailHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/", state
+
+
+def build_fake_service(root_url: str):
+    """Build a googleapiclient Gmail service pointed at the fake server"""
+    import httplib2
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document = json.loads(get_static_doc("gmail", "v1"))
+    # rootUrl also drives the batch endpoint, which client_options would not redirect
+    document["rootUrl"] = root_url
+    return build_from_document(document, http=httplib2.Http())
@@ -0,0 +1,175 @@
+"""
+Local static site used by the scraping benchmarks.
+
+Serves a product listing page (/listing) with a configurable number of
+items, each with a name, price, link and rating attribute, so selector
+extraction can be measured on large lists without touching the network.
+
+/article is a typical heavy page: images, a stylesheet with a web font, a
+video and an analytics script. The analytics script is linked through
+"localhost" rather than 127.0.0.1 so it looks third-party to the browser
+(block it with block_domains=["localhost"]).
+
+/infinite is an infinite-scroll feed: it starts with one batch of items and
+fetches the next batch from /items?page=N whenever the reader nears the
+bottom, until infinite_pages batches have loaded.
+
+/products/<name> serves the saved product pages in benchmarks/fixtures
+(<name>.html): JSON-LD, microdata and OpenGraph product pages, a JSON-LD
+ItemList listing, and a client-rendered page whose product data only
+exists after its script runs.
+
+Every request costs one simulated RTT.
+"""
+
+import threading
+import time
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+PRODUCT_FIXTURES = sorted(path.stem for path in FIXTURES_DIR.glob("*.html"))
+
+# Selectors the benchmarks extract from /listing
+LISTING_SELECTORS = {
+    "title": "text:h1.page-title",
+    "first_link": "attr:href:ul.products li a",
+    "names": "all:ul.products li .name",
+    "prices": "all:ul.products li .price",
+    "ratings": "all:ul.products li .rating",
+    "missing": "text:.does-not-exist"
+}
+
+
+def article_html(port: int, images: int) -> str:
+    figures = "\n".join(f'<img src="/img/{i}.jpg" alt="figure {i}">' for i in range(images))
+    return (
+        "<!doctype html><html><head><title>Article</title>"
+        '<link rel="stylesheet" href="/style.css">'
+        f'<script src="http://localhost:{port}/analytics.js"></script>'
+        "</head><body>"
+        '<h1 class="headline">Quarterly results beat expectations</h1>'
+        '<p class="byline">By Sam Rivera</p>'
+        + "".join(f'<p class="body">Paragraph {i} of the story.</p>' for i in range(20))
+        + figures
+        + '<video src="/video.mp4" autoplay muted></video>'
+        "</body></html>"
+    )
+
+
+INFINITE_BATCH = 20
+
+
+def infinite_html() -> str:
+    return """<!doctype html><html><head><title>Feed</title></head><body>
+<h1>Feed</h1><ul id="feed"></ul>
+<script>
+let next = 0, loading = false, done = false;
+async function load() {
+  if (loading || done) return;
+  loading = true;
+  const response = await fetch('/items?page=' + next);
+  const html = await response.text();
+  if (!html) { done = true; } else {
+    document.getElementById('feed').insertAdjacentHTML('beforeend', html);
+    next += 1;
+  }
+  loading = false;
+}
+window.addEventListener('scroll', () => {
+  if (window.scrollY + window.innerHeight >= document.body.scrollHeight - 200) load();
+});
+load();
+</script></body></html>"""
+
+
+def items_html(page: int) -> str:
+    start = page * INFINITE_BATCH
+    return "".join(
+        f'<li class="item" style="height:80px">Item {i}</li>' for i in range(start, start + INFINITE_BATCH)
+    )
+
+
+def listing_html(items: int) -> str:
+    rows = "\n".join(
+        f'<li class="product" data-sku="SKU-{i:05d}">'
+        f'<a href="/product/{i}"><span class="name">Product {i}</span></a> '
+        f'<span class="price">${(i * 7) % 500 + 9.99:.2f}</span> '
+        f'<span class="rating" data-stars="{i % 5 + 1}">{i % 5 + 1} stars</span></li>'
+        for i in range(items)
+    )
+    return (
+        "<!doctype html><html><head><title>Listing</title></head><body>"
+        f'<h1 class="page-title">All products ({items})</h1>'
+        f'<ul class="products">\n{rows}\n</ul>'
+        "</body></html>"
+    )
+
+
+class FixtureSiteState:
+    def __init__(self, items: int, rtt: float, asset_kb: int = 200, infinite_pages: int = 5):
+        self.items = items
+        self.infinite_pages = infinite_pages
+        self.rtt = rtt
+        self.asset = b"\0" * (asset_kb * 1024)
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.pages = {
+            "/listing": ("text/html; charset=utf-8", listing_html(items).encode()),
+            "/style.css": ("text/css", b"@font-face{font-family:F;src:url(/font.woff2)} body{font-family:F}"),
+            "/analytics.js": ("application/javascript", b"window.__tracked = true;"),
+            "/infinite": ("text/html; charset=utf-8", infinite_html().encode())
+        }
+        for name in PRODUCT_FIXTURES:
+            self.pages[f"/products/{name}"] = ("text/html; charset=utf-8", (FIXTURES_DIR / f"{name}.html").read_bytes())
+
+    def set_port(self, port: int, images: int = 12):
+        self.pages["/article"] = ("text/html; charset=utf-8", article_html(port, images).encode())
+
+    def dispatch(self, path: str, query: str = ""):
+        """Return (status, content_type, body) for a GET"""
+        if path == "/items":
+            page = int(parse_qs(query).get("page", ["0"])[0])
+            body = items_html(page).encode() if page < self.infinite_pages else b""
+            return 200, "text/html; charset=utf-8", body
+        if path.startswith("/img/") or path in ("/font.woff2", "/video.mp4"):
+            content_type = {"/font.woff2": "font/woff2", "/video.mp4": "video/mp4"}.get(path, "image/jpeg")
+            return 200, content_type, self.asset
+        page = self.pages.get(path)
+        if page is None:
+            return 404, "text/plain", b"not found"
+        return 200, page[0], page[1]
+
+
+class FixtureSiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: FixtureSiteState = None
+
+    def do_GET(self):
+        time.sleep(self.state.rtt)
+        parsed = urlparse(self.path)
+        status, content_type, body = self.state.dispatch(parsed.path, parsed.query)
+        with self.state.lock:
+            self.state.requests += 1
+            self.state.bytes_sent += len(body)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_site(items: int = 200, rtt: float = 0.0, infinite_pages: int = 5):
+    """Start the site in a background thread; returns (root_url, state)"""
+    state = FixtureSiteState(items, rtt, infinite_pages=infinite_pages)
+    handler = type("BoundFixtureSiteHandler", (FixtureSiteHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    state.set_port(server.server_address[1])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", state
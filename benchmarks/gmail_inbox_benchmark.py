@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Gmail Inbox Fetch Benchmark for Elva AI
+Compares the old one-request-per-message metadata loop with the batched fetch
+in GmailOAuthService, against the local fake Gmail server, as max_results
+grows from 10 to 500.
+
+Usage:
+    python benchmarks/gmail_inbox_benchmark.py --rtt-ms 40
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from google.auth.credentials import AnonymousCredentials  # noqa: E402
+from fake_gmail_server import start_fake_gmail, build_fake_service  # noqa: E402
+from gmail_oauth_service import GmailOAuthService  # noqa: E402
+
+
+def fetch_sequential(service, query: str, max_results: int) -> int:
+    """The old check_inbox loop: list, then one messages.get per id"""
+    results = service.users().messages().list(userId='me', q=query, maxResults=max_results).execute()
+    fetched = 0
+    for message in results.get('messages', []):
+        service.users().messages().get(
+            userId='me', id=message['id'], format='metadata', metadataHeaders=['From', 'Subject', 'Date']
+        ).execute()
+        fetched += 1
+    return fetched
+
+
+def fetch_batched(gmail: GmailOAuthService, service, query: str, max_results: int) -> int:
+    async def fetch():
+        credentials = AnonymousCredentials()
+        message_ids = await gmail._list_message_ids("bench", service, credentials, query, max_results)
+        return len(await gmail._fetch_message_metadata("bench", service, credentials, message_ids))
+    return asyncio.run(fetch())
+
+
+def measure(fn, state, repeat: int):
+    timings = []
+    requests_before = state.requests
+    count = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, (state.requests - requests_before) // repeat, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="simulated round trip per HTTP request")
+    parser.add_argument("--sizes", default="10,50,100,250,500")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    root_url, state = start_fake_gmail(mailbox_size=600, rtt=args.rtt_ms / 1000.0)
+    service = build_fake_service(root_url)
+    gmail = GmailOAuthService()
+    query = "in:inbox"
+
+    print(f"Fake Gmail at {root_url} (rtt={args.rtt_ms}ms)\n")
+    print(f"{'max_results':>11}{'seq ms':>10}{'seq reqs':>10}{'batch ms':>10}{'batch reqs':>12}{'speedup':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        seq_ms, seq_reqs, seq_count = measure(lambda: fetch_sequential(service, query, size), state, args.repeat)
+        batch_ms, batch_reqs, batch_count = measure(lambda: fetch_batched(gmail, service, query, size), state, args.repeat)
+        assert seq_count == batch_count, (seq_count, batch_count)
+        print(f"{size:>11}{seq_ms:>10.0f}{seq_reqs:>10}{batch_ms:>10.0f}{batch_reqs:>12}{seq_ms / batch_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Gmail Search Benchmark for Elva AI
+Compares answering inbox search queries from the local inverted index
+(gmail_search_index.MailboxIndex, built from mirrored metadata) with the API
+path check_inbox takes otherwise (messages.list + batched metadata fetch),
+against the local fake Gmail server.
+
+Usage:
+    python benchmarks/gmail_search_benchmark.py --rtt-ms 40 --mailbox-size 2000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from google.auth.credentials import AnonymousCredentials  # noqa: E402
+from fake_gmail_server import build_mailbox, start_fake_gmail, build_fake_service  # noqa: E402
+from gmail_oauth_service import GmailOAuthService  # noqa: E402
+from gmail_search_index import MailboxIndex  # noqa: E402
+
+# Queries whose semantics the fake server and the index agree on
+# Free-text terms are left out: Gmail matches them against bodies, so the index declines them
+QUERIES = ["is:unread", "from:stripe", "subject:invoice", "subject:budget is:unread", "from:mike subject:roadmap"]
+
+
+def mirrored_documents(mailbox_size: int) -> list:
+    """The documents GmailMailboxMirror would hold for the fake mailbox"""
+    documents = []
+    for message in build_mailbox(mailbox_size):
+        headers = {h["name"]: h["value"] for h in message["headers"]}
+        documents.append({
+            "id": message["id"],
+            "thread_id": message["threadId"],
+            "snippet": message["snippet"],
+            "from": headers["From"],
+            "subject": headers["Subject"],
+            "date": headers["Date"],
+            "labels": message["labelIds"],
+            "internal_date": int(message["internalDate"])
+        })
+    return documents
+
+
+async def api_search(gmail: GmailOAuthService, service, query: str, max_results: int) -> list:
+    credentials = AnonymousCredentials()
+    message_ids = await gmail._list_message_ids("bench", service, credentials, query, max_results)
+    messages = await gmail._fetch_message_metadata("bench", service, credentials, message_ids)
+    return [message["id"] for message in messages]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="simulated round trip per HTTP request")
+    parser.add_argument("--mailbox-size", type=int, default=2000)
+    parser.add_argument("--max-results", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200, help="local queries per measurement")
+    args = parser.parse_args()
+
+    root_url, _ = start_fake_gmail(mailbox_size=args.mailbox_size, rtt=args.rtt_ms / 1000.0)
+    service = build_fake_service(root_url)
+    gmail = GmailOAuthService()
+
+    started = time.perf_counter()
+    index = MailboxIndex(mirrored_documents(args.mailbox_size))
+    build_ms = (time.perf_counter() - started) * 1000
+    posting_bytes = sum(posting.itemsize * len(posting) for posting in index.postings.values())
+    print(f"Fake Gmail at {root_url} (rtt={args.rtt_ms}ms)")
+    print(f"Index: {len(index)} messages, {len(index.postings)} terms, "
+          f"{posting_bytes / 1024:.0f} KiB of postings, built in {build_ms:.0f}ms\n")
+
+    print(f"{'query':<28}{'hits':>6}{'api ms':>10}{'index us':>11}{'speedup':>11}")
+    for query in QUERIES:
+        started = time.perf_counter()
+        api_ids = asyncio.run(api_search(gmail, service, query, args.max_results))
+        api_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            local = index.search(query, args.max_results)
+        local_us = (time.perf_counter() - started) / args.repeat * 1e6
+
+        assert [message["id"] for message in local] == api_ids, query
+        print(f"{query:<28}{len(local):>6}{api_ms:>10.0f}{local_us:>11.1f}{api_ms * 1000 / local_us:>10.0f}x")
+
+    gmail.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Logging Overhead Benchmark for Elva AI
+Measures how much time the request path spends on logging, comparing the old
+synchronous basicConfig setup (f-strings, full payloads at INFO) with the
+queued pipeline from logging_config (lazy %-formatting, payloads at DEBUG,
+sampling and truncation). Output goes to /dev/null so only CPU cost is measured.
+
+Usage:
+    python benchmarks/logging_benchmark.py --requests 20000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import logging_config  # noqa: E402
+
+INTENT_DATA = {
+    "intent": "send_email",
+    "recipient_name": "Sarah Johnson",
+    "recipient_email": "sarah@example.com",
+    "subject": "Quarterly planning follow-up",
+    "body": "Hi Sarah, " + "thanks for the detailed notes from the planning session. " * 20,
+    "_routing_info": {"model": "sequential", "confidence": 0.92, "reasoning": "professional email " * 5}
+}
+WEBHOOK_DATA = {
+    "user_id": "default_user",
+    "session_id": "5f1c2c1e-7f0b-4f5e-9c55-3d2d0a4b9b11",
+    "intent": "send_email",
+    "data": INTENT_DATA,
+    "timestamp": "2025-01-01T00:00:00Z",
+    "routing_info": INTENT_DATA["_routing_info"]
+}
+HEADERS = {f"x-n8n-header-{i}": "value-" * 8 for i in range(12)}
+
+
+def request_old(chat_logger, webhook_logger):
+    """Log calls made by one chat + approval round trip before the change"""
+    chat_logger.info(f"🚀 Advanced Hybrid AI Chat: {INTENT_DATA['body'][:200]}")
+    chat_logger.info(f"🧠 Advanced Routing: sequential (confidence: {0.92:.2f})")
+    chat_logger.info(f"💡 Routing Logic: {INTENT_DATA['_routing_info']['reasoning']}")
+    chat_logger.info(f"Received approval request: {INTENT_DATA}")
+    chat_logger.info(f"Sending to n8n with data: {INTENT_DATA}")
+    webhook_logger.info(f"Sending data to n8n webhook: https://example.app.n8n.cloud/webhook/elva-entry")
+    webhook_logger.info(f"Webhook payload: {WEBHOOK_DATA}")
+    webhook_logger.info(f"N8N webhook response status: {200}")
+    webhook_logger.info(f"N8N webhook response headers: {HEADERS}")
+    webhook_logger.info(f"N8N webhook response data: {WEBHOOK_DATA}")
+
+
+def request_new(chat_logger, webhook_logger):
+    """The same round trip with the converted log calls"""
+    chat_logger.info("🚀 Advanced Hybrid AI Chat: %s", INTENT_DATA['body'][:200])
+    chat_logger.info("🧠 Advanced Routing: %s (confidence: %.2f)", "sequential", 0.92)
+    chat_logger.debug("💡 Routing Logic: %s", INTENT_DATA['_routing_info']['reasoning'])
+    chat_logger.debug("Received approval request: %s", INTENT_DATA)
+    chat_logger.info("Queued approval job %s for message %s", "job-id", "message-id")
+    webhook_logger.info("Sending %s to n8n webhook: %s", WEBHOOK_DATA["intent"], "https://example.app.n8n.cloud/webhook/elva-entry")
+    webhook_logger.debug("Webhook payload: %s", WEBHOOK_DATA)
+    webhook_logger.info("N8N webhook response status: %s (%s)", 200, "HTTP/1.1")
+    webhook_logger.debug("N8N webhook response headers: %s", HEADERS)
+    webhook_logger.debug("N8N webhook response data: %s", WEBHOOK_DATA)
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+
+def run(label, make_request, requests):
+    chat_logger = logging.getLogger("server")
+    webhook_logger = logging.getLogger("webhook_handler")
+    started = time.perf_counter()
+    for _ in range(requests):
+        make_request(chat_logger, webhook_logger)
+    caller = time.perf_counter() - started
+    return label, caller
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="webhook_handler INFO sampling for the new pipeline")
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    results = []
+
+    # Before: synchronous handler on the calling thread
+    reset_root()
+    logging.basicConfig(stream=devnull, level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    results.append(run("sync basicConfig, f-strings", request_old, args.requests))
+
+    # After: queued pipeline, lazy formatting, payloads at DEBUG.
+    # Unbounded queue so no record is dropped and the comparison stays fair.
+    logging_config.LOG_QUEUE_SIZE = 0
+    for label, sample_spec in (("queued JSON pipeline", ""), ("queued JSON + sampling", f"webhook_handler={args.sample_rate}")):
+        reset_root()
+        logging_config.LOG_SAMPLE_RATES = sample_spec
+        logging_config.configure_logging(stream=devnull)
+        label, caller = run(label, request_new, args.requests)
+        drain_started = time.perf_counter()
+        logging_config.shutdown_logging()
+        results.append((label, caller))
+        print(f"  ({label}: background thread drained in {time.perf_counter() - drain_started:.2f}s)")
+
+    print(f"\n{'pipeline':<32}{'caller us/request':>20}{'vs baseline':>14}")
+    baseline = results[0][1]
+    for label, caller in results:
+        per_request = caller / args.requests * 1e6
+        print(f"{label:<32}{per_request:>20.1f}{caller / baseline * 100:>13.1f}%")
+
+    devnull.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+n8n Webhook Delivery Benchmark for Elva AI
+Compares a fresh httpx.AsyncClient per delivery (the old behaviour) with the
+pooled keep-alive client in webhook_handler, against a local stub webhook.
+
+The stub can simulate network round trips: every new connection costs one RTT
+(plus two more with --tls for the handshake) and every request costs one RTT.
+
+Usage:
+    python benchmarks/n8n_webhook_benchmark.py --requests 200 --rtt-ms 20 --tls
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import httpx  # noqa: E402
+import webhook_handler  # noqa: E402
+
+
+class StubWebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    rtt = 0.0
+    handshake_rtts = 1
+
+    def setup(self):
+        # New connection: TCP (and optionally TLS) handshake
+        time.sleep(self.rtt * self.handshake_rtts)
+        super().setup()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        time.sleep(self.rtt)
+        body = json.dumps({"received": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _self_signed_cert(directory: str):
+    """Create a throwaway localhost certificate for the --tls mode"""
+    from datetime import datetime, timedelta
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(datetime.utcnow() - timedelta(days=1))
+        .not_valid_after(datetime.utcnow() + timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ))
+    return cert_path, key_path
+
+
+def start_stub_server(rtt: float, tls: bool, workdir: str) -> str:
+    StubWebhookHandler.rtt = rtt
+    StubWebhookHandler.handshake_rtts = 3 if tls else 1
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWebhookHandler)
+    server.daemon_threads = True
+    scheme = "http"
+    if tls:
+        cert_path, key_path = _self_signed_cert(workdir)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        # httpx honours SSL_CERT_FILE, so both clients trust the stub certificate
+        os.environ["SSL_CERT_FILE"] = cert_path
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"{scheme}://localhost:{server.server_address[1]}/webhook/elva-entry"
+
+
+def sample_payload(i: int) -> dict:
+    return {
+        "user_id": "bench_user",
+        "session_id": "bench_session",
+        "intent": "add_todo",
+        "data": {"intent": "add_todo", "task": f"Benchmark task {i}"},
+        "timestamp": "2025-01-01T00:00:00Z",
+        "routing_info": {}
+    }
+
+
+async def deliver_fresh_client(url: str, payload: dict) -> bool:
+    """Old behaviour: one client, and therefore one connection, per delivery"""
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await client.post(url, json=payload, headers={"Content-Type": "application/json"})
+        return response.status_code == 200
+
+
+async def deliver_pooled_client(url: str, payload: dict) -> bool:
+    result = await webhook_handler.send_to_n8n(payload)
+    return result["success"]
+
+
+async def run_mode(name: str, deliver, url: str, requests: int, concurrency: int) -> dict:
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            ok = await deliver(url, sample_payload(i))
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    total = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "mode": name,
+        "requests": requests,
+        "failures": failures,
+        "total_s": total,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "throughput_rps": requests / total
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--rtt-ms", type=float, default=10.0, help="simulated network round trip")
+    parser.add_argument("--tls", action="store_true", help="serve the stub over HTTPS")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = start_stub_server(args.rtt_ms / 1000.0, args.tls, workdir)
+        webhook_handler.N8N_WEBHOOK_URL = url
+        # Stub server speaks HTTP/1.1 only
+        webhook_handler.N8N_HTTP2 = False
+        logging_level = webhook_handler.logger.level
+        webhook_handler.logger.setLevel("WARNING")
+
+        print(f"Stub webhook: {url} (rtt={args.rtt_ms}ms, concurrency={args.concurrency})\n")
+        results = [
+            await run_mode("fresh client per delivery", deliver_fresh_client, url, args.requests, args.concurrency),
+            await run_mode("pooled keep-alive client", deliver_pooled_client, url, args.requests, args.concurrency)
+        ]
+        await webhook_handler.close_http_client()
+        webhook_handler.logger.setLevel(logging_level)
+
+    print(f"{'mode':<28}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>10}{'fail':>6}")
+    for r in results:
+        print(f"{r['mode']:<28}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['throughput_rps']:>10.1f}{r['failures']:>6}")
+
+    baseline, pooled = results
+    print(f"\nPer-delivery latency reduced by {(1 - pooled['mean_ms'] / baseline['mean_ms']) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
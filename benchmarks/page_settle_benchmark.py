@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Page Settle Benchmark for Elva AI
+Compares the old fixed wait in extract_dynamic_data (scroll to the bottom
+once, then sleep 2 seconds) with page_settle.wait_for_stable on three fixture
+pages: a static listing, where nothing lazy-loads, a long static listing
+many viewports tall, and an infinite-scroll feed that fetches batches as the
+reader scrolls. Reports time spent waiting and how many items were on the
+page afterwards.
+
+Requires playwright and a Chromium build (CHROMIUM_PATH overrides the
+bundled one).
+
+Usage:
+    python benchmarks/page_settle_benchmark.py --rtt-ms 100 --infinite-pages 5 --long-items 3000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from playwright.async_api import async_playwright  # noqa: E402
+from fixture_site import start_fixture_site  # noqa: E402
+from page_settle import wait_for_stable  # noqa: E402
+
+FIXTURES = {
+    "static listing": ("short", "/listing", "ul.products li"),
+    "long listing": ("long", "/listing", "ul.products li"),
+    "infinite feed": ("short", "/infinite", "#feed li")
+}
+
+
+async def fixed_sleep(page):
+    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+    await asyncio.sleep(2)
+
+
+async def adaptive(page):
+    await wait_for_stable(page, scroll=True, timeout_ms=30000)
+
+
+async def run(args):
+    rtt = args.rtt_ms / 1000.0
+    roots = {
+        "short": start_fixture_site(items=100, rtt=rtt, infinite_pages=args.infinite_pages)[0],
+        "long": start_fixture_site(items=args.long_items, rtt=rtt)[0]
+    }
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(
+            headless=True,
+            executable_path=os.getenv("CHROMIUM_PATH") or None,
+            args=["--no-sandbox", "--disable-dev-shm-usage"]
+        )
+        context = await browser.new_context(viewport={"width": 1920, "height": 1080})
+        print(
+            f"rtt={args.rtt_ms}ms, feed has {args.infinite_pages} batches, "
+            f"long listing has {args.long_items} items, {args.repeat} runs each\n"
+        )
+        print(f"{'fixture':<16}{'strategy':<12}{'wait ms':>10}{'items':>8}")
+
+        for fixture, (site, path, item_selector) in FIXTURES.items():
+            for name, strategy in (("sleep(2)", fixed_sleep), ("adaptive", adaptive)):
+                timings, counts = [], []
+                for _ in range(args.repeat):
+                    page = await context.new_page()
+                    await page.goto(f"{roots[site]}{path}", wait_until="domcontentloaded")
+                    started = time.perf_counter()
+                    await strategy(page)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    counts.append(await page.locator(item_selector).count())
+                    await page.close()
+                print(f"{fixture:<16}{name:<12}{statistics.median(timings):>10.0f}{min(counts):>8}")
+
+        await browser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, default=100.0, help="simulated round trip per request")
+    parser.add_argument("--infinite-pages", type=int, default=5, help="batches the feed serves")
+    parser.add_argument("--long-items", type=int, default=3000, help="items on the long listing")
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Resource Blocking Benchmark for Elva AI
+Loads the fixture site's heavy /article page (images, web font, video and a
+third-party analytics script) with each resource policy from
+resource_blocking and reports page load time, requests reaching the server
+and bytes transferred.
+
+Requires playwright and a Chromium build (CHROMIUM_PATH overrides the
+bundled one).
+
+Usage:
+    python benchmarks/resource_blocking_benchmark.py --rtt-ms 30 --asset-kb 200 --repeat 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from playwright.async_api import async_playwright  # noqa: E402
+from fixture_site import start_fixture_site  # noqa: E402
+from resource_blocking import ResourceBlocker, resolve_policy  # noqa: E402
+from scrape_selectors import extract_selectors  # noqa: E402
+
+SELECTORS = {"headline": "text:h1.headline", "byline": "text:.byline", "paragraphs": "all:p.body"}
+
+POLICIES = {
+    "none": "none",
+    "fast": {"block_domains": ["localhost"]},
+    "fast, keep css": {"block_domains": ["localhost"], "block_stylesheets": False}
+}
+
+
+async def run(args):
+    root_url, state = start_fixture_site(rtt=args.rtt_ms / 1000.0)
+    state.asset = b"\0" * (args.asset_kb * 1024)
+    blocker = ResourceBlocker()
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(
+            headless=True,
+            executable_path=os.getenv("CHROMIUM_PATH") or None,
+            args=["--no-sandbox", "--disable-dev-shm-usage"]
+        )
+        print(f"/article with {args.asset_kb} KiB assets, rtt={args.rtt_ms}ms, {args.repeat} loads per policy\n")
+        print(f"{'policy':<16}{'median ms':>11}{'requests':>10}{'KiB':>9}")
+
+        baseline = None
+        for name, policy in POLICIES.items():
+            timings = []
+            state.requests = state.bytes_sent = 0
+            for _ in range(args.repeat):
+                # Fresh context per load so the HTTP cache does not hide the transfer
+                context = await browser.new_context()
+                page = await context.new_page()
+                started = time.perf_counter()
+                async with blocker.apply(page, resolve_policy(policy, SELECTORS)):
+                    await page.goto(f"{root_url}/article", wait_until="load")
+                    data = await extract_selectors(page, SELECTORS)
+                timings.append((time.perf_counter() - started) * 1000)
+                await context.close()
+
+            baseline = baseline or data
+            assert data == baseline, f"policy {name} changed the extracted data"
+            print(f"{name:<16}{statistics.median(timings):>11.0f}{state.requests / args.repeat:>10.1f}"
+                  f"{state.bytes_sent / args.repeat / 1024:>9.0f}")
+
+        await browser.close()
+    print(f"\nblocked by type: {blocker.get_stats()['blocked_by_type']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, default=30.0, help="simulated round trip per request")
+    parser.add_argument("--asset-kb", type=int, default=200, help="size of each image/font/video")
+    parser.add_argument("--repeat", type=int, default=10)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Selector Extraction Benchmark for Elva AI
+Compares the old per-selector extraction (query_selector + text_content per
+element, one CDP round trip each) with scrape_selectors.extract_selectors,
+which evaluates every selector in a single page.evaluate call, on a local
+static listing page.
+
+Requires playwright and a Chromium build (CHROMIUM_PATH overrides the path
+the service uses).
+
+Usage:
+    python benchmarks/scrape_extraction_benchmark.py --items 200 --repeat 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from playwright.async_api import async_playwright  # noqa: E402
+from fixture_site import LISTING_SELECTORS, start_fixture_site  # noqa: E402
+from scrape_selectors import extract_selectors, extract_with_handles, parse_selectors  # noqa: E402
+
+
+async def extract_per_selector(page, selectors: dict) -> dict:
+    """The extraction loop extract_dynamic_data used before"""
+    extracted = {}
+    for spec in parse_selectors(selectors):
+        extracted[spec.field] = await extract_with_handles(page, spec) if spec.selector else None
+    return extracted
+
+
+async def measure(page, extract, repeat: int) -> tuple:
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await extract(page, LISTING_SELECTORS)
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, timings
+
+
+async def run(args):
+    root_url, _ = start_fixture_site(items=args.items)
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(
+            headless=True,
+            executable_path=os.getenv("CHROMIUM_PATH") or None,
+            args=["--no-sandbox", "--disable-dev-shm-usage"]
+        )
+        page = await browser.new_page()
+        await page.goto(f"{root_url}/listing")
+
+        old, old_ms = await measure(page, extract_per_selector, args.repeat)
+        new, new_ms = await measure(page, extract_selectors, args.repeat)
+        await browser.close()
+
+    assert old == new, "single-evaluate extraction returned a different result"
+    print(f"Listing with {args.items} items, {len(LISTING_SELECTORS)} selectors, {args.repeat} runs each\n")
+    print(f"{'strategy':<16}{'median ms':>12}{'p95 ms':>10}")
+    for name, timings in (("per selector", old_ms), ("single evaluate", new_ms)):
+        p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+        print(f"{name:<16}{statistics.median(timings):>12.1f}{p95:>10.1f}")
+    print(f"\nspeedup: {statistics.median(old_ms) / statistics.median(new_ms):.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200, help="products on the listing page")
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Structured Data Benchmark for Elva AI
+Measures how fast structured_data.StructuredDataExtractor reads price, name,
+rating and availability from the saved product pages in benchmarks/fixtures:
+
+  parse    extract_products on each saved page, no network
+  http     one GET plus parse per page through the local fixture site, at
+           --concurrency, the path product pages with embedded data take
+  browser  (--browser) the same pages rendered in Chromium and parsed, the
+           fallback for pages without structured data in their static HTML
+
+Only the parse and http sections run without a browser; --browser needs
+playwright and a Chromium build (CHROMIUM_PATH overrides the path the
+service uses).
+
+Usage:
+    python benchmarks/structured_data_benchmark.py --requests 200 --concurrency 16 --rtt-ms 20
+    python benchmarks/structured_data_benchmark.py --browser --requests 40
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fixture_site import FIXTURES_DIR, PRODUCT_FIXTURES, start_fixture_site  # noqa: E402
+from scrape_engine import ScrapeEngine, close_scrape_client  # noqa: E402
+from structured_data import StructuredDataExtractor, extract_products  # noqa: E402
+
+# Pages whose static HTML carries the data; the client-rendered one needs the browser
+STATIC_FIXTURES = [name for name in PRODUCT_FIXTURES if name != "product_client_rendered"]
+
+
+def bench_parse(repeat: int):
+    print(f"{'parse':<28}{'products':>9}{'pages/s':>10}{'ms/page':>9}")
+    for name in PRODUCT_FIXTURES:
+        html = (FIXTURES_DIR / f"{name}.html").read_text()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            products = extract_products(html)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<28}{len(products):>9}{repeat / elapsed:>10.0f}{elapsed / repeat * 1000:>9.2f}")
+
+
+async def bench_extractor(extractor, urls, requests: int, concurrency: int, mode: str) -> dict:
+    slots = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(url):
+        nonlocal failures
+        async with slots:
+            started = time.perf_counter()
+            result = await extractor.extract(url, mode=mode, use_cache=False)
+            latencies.append((time.perf_counter() - started) * 1000)
+            failures += not result.success
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(urls[i % len(urls)]) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "pages_per_second": requests / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "failures": failures
+    }
+
+
+def print_row(label: str, stats: dict):
+    print(f"{label:<28}{stats['pages_per_second']:>10.1f}{stats['p50']:>9.0f}{stats['p95']:>9.0f}{stats['failures']:>10}")
+
+
+async def run(args):
+    bench_parse(args.parse_repeat)
+
+    root_url, _ = start_fixture_site(items=10, rtt=args.rtt_ms / 1000.0)
+    static_urls = [f"{root_url}/products/{name}" for name in STATIC_FIXTURES]
+    browser_service = None
+    if args.browser:
+        from playwright_service import playwright_service
+        browser_service = playwright_service
+    extractor = StructuredDataExtractor(ScrapeEngine(browser_service, cache=None))
+
+    print(f"\nrtt={args.rtt_ms}ms, {args.requests} extractions over {len(static_urls)} pages, concurrency {args.concurrency}")
+    print(f"{'path':<28}{'pages/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'failures':>10}")
+    print_row("http + structured data", await bench_extractor(extractor, static_urls, args.requests, args.concurrency, "http"))
+
+    if browser_service is not None:
+        try:
+            print_row("browser + structured data", await bench_extractor(extractor, static_urls, args.requests, args.concurrency, "browser"))
+            rendered = await extractor.extract(f"{root_url}/products/product_client_rendered", use_cache=False)
+            products = rendered.data.get("products") or []
+            print(f"\nclient-rendered page: engine={rendered.engine}, products={len(products)}, "
+                  f"{rendered.execution_time * 1000:.0f} ms ({', '.join(extractor.get_stats()['fallbacks']) or 'no fallback'})")
+        finally:
+            await browser_service.close()
+
+    await close_scrape_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="extractions per path")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="simulated round trip per request")
+    parser.add_argument("--parse-repeat", type=int, default=200, help="parses per saved page in the parse section")
+    parser.add_argument("--browser", action="store_true", help="also measure the browser path (needs Chromium)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -594,6 +594,53 @@ function ChatBox({ sessionId, gmailAuthStatus, setGmailAuthStatus, messages, set
     }
   };
 
+  const showApprovalOutcome = (status) => {
+    const delivered = status.status === 'completed' || status.status === 'delivered';
+    const outcomeMessage = {
+      id: Date.now(),
+      response: delivered ?
+        '✅ Perfect! Action executed successfully! Your request has been sent to the automation system.' :
+        `❌ The automation system could not complete your request${status.last_error ? `: ${status.last_error}` : '.'}`,
+      isUser: false,
+      timestamp: new Date()
+    };
+    setMessages(prev => [...prev, outcomeMessage]);
+
+    if (status.n8n_response) {
+      const n8nMessage = {
+        id: Date.now() + 1,
+        response: `🔗 Automation Response: ${JSON.stringify(status.n8n_response, null, 2)}`,
+        isUser: false,
+        isSystem: true,
+        timestamp: new Date()
+      };
+      setMessages(prev => [...prev, n8nMessage]);
+    }
+  };
+
+  const pollApprovalStatus = async (messageId, interval = 2000, maxPolls = 90) => {
+    for (let poll = 0; poll < maxPolls; poll++) {
+      await new Promise(resolve => setTimeout(resolve, interval));
+      try {
+        const { data } = await axios.get(`${API}/approve/status/${messageId}`);
+        if (['completed', 'delivered', 'failed'].includes(data.status)) {
+          showApprovalOutcome(data);
+          return;
+        }
+      } catch (error) {
+        console.error('Error checking approval status:', error);
+      }
+    }
+
+    const pendingMessage = {
+      id: Date.now(),
+      response: '⏳ Your request is still being delivered to the automation system. Check back in a little while.',
+      isUser: false,
+      timestamp: new Date()
+    };
+    setMessages(prev => [...prev, pendingMessage]);
+  };
+
   const handleApproval = async (approved) => {
     if (!pendingApproval) return;
 
@@ -618,26 +665,26 @@ function ChatBox({ sessionId, gmailAuthStatus, setGmailAuthStatus, messages, set
         edited_data: editMode ? finalData : null
       });
 
-      const statusMessage = {
-        id: Date.now(),
-        response: approved ? 
-          '✅ Perfect! Action executed successfully! Your request has been sent to the automation system.' : 
-          '❌ No worries! Action cancelled as requested.',
-        isUser: false,
-        timestamp: new Date()
-      };
-
-      setMessages(prev => [...prev, statusMessage]);
-
-      if (approved && response.data.n8n_response) {
-        const n8nMessage = {
-          id: Date.now() + 1,
-          response: `🔗 Automation Response: ${JSON.stringify(response.data.n8n_response, null, 2)}`,
+      if (!approved) {
+        const cancelMessage = {
+          id: Date.now(),
+          response: '❌ No worries! Action cancelled as requested.',
+          isUser: false,
+          timestamp: new Date()
+        };
+        setMessages(prev => [...prev, cancelMessage]);
+      } else if (response.data.job_id) {
+        // Delivery now runs in a background queue; report the outcome once it is known
+        const queuedMessage = {
+          id: Date.now(),
+          response: '⏳ Approved! Your request is queued for the automation system. I\'ll let you know once it\'s done.',
           isUser: false,
-          isSystem: true,
           timestamp: new Date()
         };
-        setMessages(prev => [...prev, n8nMessage]);
+        setMessages(prev => [...prev, queuedMessage]);
+        pollApprovalStatus(currentMessageId || pendingApproval.id);
+      } else {
+        showApprovalOutcome({ status: 'completed', n8n_response: response.data.n8n_response });
       }
 
     } catch (error) {
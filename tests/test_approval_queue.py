@@ -0,0 +1,151 @@
+import copy
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import approval_queue
+from approval_queue import ApprovalQueue
+from tests.test_job_queue import MemoryCollection, _matches, run
+
+
+class Collection(MemoryCollection):
+    """MemoryCollection plus the calls ApprovalQueue makes on chat_messages and approval_jobs"""
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+    async def update_one(self, query, update, session=None):
+        document = next((d for d in self.documents if _matches(d, query)), None)
+        if document is not None:
+            document.update(update.get("$set", {}))
+
+    async def delete_one(self, query):
+        self.documents = [d for d in self.documents if not _matches(d, query)]
+
+    async def find(self, query):
+        for document in [d for d in self.documents if _matches(d, query)]:
+            yield copy.deepcopy(document)
+
+
+MESSAGE = {"id": "msg-1", "user_id": "user-1", "session_id": "session-1"}
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    # The in-memory collections have no replica set to run transactions on
+    monkeypatch.setenv("APPROVAL_USE_TRANSACTIONS", "false")
+    # Formatting the n8n payload is the webhook handler's job, not the queue's
+    monkeypatch.setattr(
+        approval_queue,
+        "build_webhook_payload",
+        lambda intent_data, user_id, session_id, message_id: {**intent_data, "user_id": user_id, "message_id": message_id}
+    )
+    db = SimpleNamespace(chat_messages=Collection(), webhook_outbox=Collection(), approval_jobs=Collection())
+    db.chat_messages.documents.append(dict(MESSAGE, intent_data={"intent": "add_todo", "task": "Buy milk"}))
+    return ApprovalQueue(db)
+
+
+def deliver(monkeypatch, result):
+    sent = []
+
+    async def deliver_webhook(webhook_data, idempotency_key=None):
+        sent.append((webhook_data, idempotency_key))
+        return result
+
+    monkeypatch.setattr(approval_queue, "deliver_webhook", deliver_webhook)
+    return sent
+
+
+def test_double_approval_writes_one_outbox_entry(queue):
+    async def scenario():
+        first = await queue.enqueue_approval(MESSAGE, {"intent": "add_todo", "task": "Buy milk"})
+        second = await queue.enqueue_approval(MESSAGE, {"intent": "add_todo", "task": "Buy milk"})
+        return first, second
+
+    first, second = run(scenario())
+    assert second["id"] == first["id"]
+    assert len(queue.collection.documents) == 1
+    assert queue.db.chat_messages.documents[0]["approval_status"] == "queued"
+
+
+def test_delivery_outcome_is_written_back_to_the_message(queue, monkeypatch):
+    sent = deliver(monkeypatch, {"success": True, "message": "ok"})
+
+    async def scenario():
+        job = await queue.enqueue_approval(MESSAGE, {"intent": "add_todo", "task": "Buy milk"})
+        await queue.drain()
+        return job, await queue.get_status(MESSAGE["id"])
+
+    job, status = run(scenario())
+    assert sent[0][1] == job["id"]
+    assert sent[0][0]["message_id"] == MESSAGE["id"]
+    assert status["status"] == "completed"
+    message = queue.db.chat_messages.documents[0]
+    assert message["approval_status"] == "delivered"
+    assert message["n8n_response"] == {"success": True, "message": "ok"}
+
+
+def test_failed_delivery_is_retried_then_marked_failed(queue, monkeypatch):
+    deliver(monkeypatch, {"success": False, "error": "timeout", "message": "n8n timed out"})
+    queue.max_attempts = 2
+
+    async def scenario():
+        await queue.enqueue_approval(MESSAGE, {"intent": "add_todo", "task": "Buy milk"})
+        await queue.drain()
+        retrying = queue.db.chat_messages.documents[0]["approval_status"]
+        queue.collection.documents[0]["next_attempt_at"] = datetime.utcnow()
+        await queue.drain()
+        return retrying, queue.db.chat_messages.documents[0]["approval_status"]
+
+    assert run(scenario()) == ("retrying", "failed")
+
+
+@pytest.mark.parametrize("result, transient", [
+    ({"error": "timeout"}, True),
+    ({"error": "http_error", "status_code": 503}, True),
+    ({"error": "http_error", "status_code": 429}, True),
+    ({"error": "http_error", "status_code": 400}, False),
+    ({"error": "invalid_payload"}, False)
+])
+def test_only_timeouts_and_server_errors_are_transient(queue, result, transient):
+    assert queue.is_transient_failure(result) is transient
+
+
+def test_orphaned_approval_gets_its_outbox_entry_back(queue):
+    queue.db.chat_messages.documents[0].update(
+        approval_status="queued",
+        approval_job_id="job-1",
+        approval_queued_at=datetime.utcnow() - timedelta(minutes=5)
+    )
+
+    async def scenario():
+        return await queue.reconcile_orphans(), await queue.reconcile_orphans()
+
+    assert run(scenario()) == (1, 0)
+    entry = queue.collection.documents[0]
+    assert (entry["id"], entry["idempotency_key"], entry["status"]) == ("job-1", "job-1", "pending")
+
+
+def test_legacy_jobs_move_into_the_outbox(queue):
+    lease = datetime.utcnow() + timedelta(minutes=2)
+    for job_id, status, locked_until in (("old-1", "pending", None), ("old-2", "processing", lease), ("old-3", "completed", None)):
+        queue.db.approval_jobs.documents.append(dict(
+            MESSAGE,
+            id=job_id,
+            message_id=MESSAGE["id"],
+            payload={"intent_data": {"intent": "add_todo", "task": "Buy milk"}},
+            status=status,
+            attempts=1,
+            locked_until=locked_until
+        ))
+
+    assert run(queue.migrate_legacy_jobs()) == 2
+    entries = {entry["id"]: entry for entry in queue.collection.documents}
+    assert set(entries) == {"old-1", "old-2"}
+    assert entries["old-1"]["idempotency_key"] == "old-1"
+    assert entries["old-1"]["payload"]["webhook_data"]["message_id"] == MESSAGE["id"]
+    assert entries["old-2"]["status"] == "pending"
+    assert entries["old-2"]["attempts"] == 1
+    assert entries["old-2"]["next_attempt_at"] >= lease
+    assert [job["id"] for job in queue.db.approval_jobs.documents] == ["old-3"]
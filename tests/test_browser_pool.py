@@ -0,0 +1,132 @@
+import asyncio
+
+from browser_pool import PagePool
+
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+
+    async def goto(self, url):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+    def is_closed(self):
+        return self.closed
+
+
+class FakeContext:
+    def __init__(self, generation):
+        self.generation = generation
+        self.pages = []
+        self.closed = False
+
+    async def new_page(self):
+        page = FakePage()
+        self.pages.append(page)
+        return page
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.generation = 0
+        self.contexts = []
+
+    async def new_context(self):
+        context = FakeContext(self.generation)
+        self.contexts.append(context)
+        return context
+
+
+def make_pool(browser, **kwargs):
+    async def prepare_page(page):
+        pass
+
+    return PagePool(
+        browser.new_context,
+        prepare_page,
+        is_stale=lambda context: context.generation != browser.generation,
+        **kwargs
+    )
+
+
+def test_new_tenant_takes_over_a_warmed_context_and_page():
+    async def scenario():
+        browser = FakeBrowser()
+        pool = make_pool(browser, max_pages=4)
+        await pool.warm(2)
+        warmed_pages = {page for context in browser.contexts for page in context.pages}
+        assert pool.get_metrics()["spare_contexts"] == 2
+
+        async with pool.page("session-a") as page:
+            assert page in warmed_pages
+        async with pool.page("session-b") as page:
+            assert page in warmed_pages
+        # The spares are replaced in the background for the next tenants
+        await asyncio.sleep(0)
+        await pool._top_up_task
+        metrics = pool.get_metrics()
+        await pool.close()
+        return metrics
+
+    metrics = asyncio.run(scenario())
+    assert metrics["spares_adopted"] == 2
+    assert metrics["spare_contexts"] == 2
+    assert metrics["contexts"] == 2
+
+
+def test_tenants_never_share_a_context():
+    async def scenario():
+        browser = FakeBrowser()
+        pool = make_pool(browser, max_pages=4)
+        await pool.warm(2)
+        async with pool.page("session-a") as first:
+            pass
+        async with pool.page("session-b") as second:
+            pass
+        async with pool.page("session-a") as again:
+            pass
+        await pool.close()
+        return first, second, again
+
+    first, second, again = asyncio.run(scenario())
+    assert again is first
+    assert second is not first
+
+
+def test_idle_pages_are_capped_across_tenants():
+    async def scenario():
+        browser = FakeBrowser()
+        pool = make_pool(browser, max_pages=8, max_contexts=16, max_idle_pages=3)
+        for index in range(6):
+            async with pool.page(f"session-{index}"):
+                pass
+        metrics = pool.get_metrics()
+        await pool.close()
+        return metrics
+
+    metrics = asyncio.run(scenario())
+    assert metrics["idle_pages"] == 3
+    assert metrics["idle_pages_evicted"] == 3
+
+
+def test_stale_spares_are_closed_instead_of_adopted():
+    async def scenario():
+        browser = FakeBrowser()
+        pool = make_pool(browser, max_pages=4)
+        await pool.warm(1)
+        stale = browser.contexts[0]
+        browser.generation += 1
+        async with pool.page("session-a"):
+            pass
+        await pool.close()
+        return stale, pool.metrics
+
+    stale, metrics = asyncio.run(scenario())
+    assert stale.closed
+    assert metrics["spares_adopted"] == 0
@@ -0,0 +1,44 @@
+import asyncio
+import gc
+
+from gmail_client_cache import GmailClientCache
+from gmail_oauth_service import GmailOAuthService
+
+
+class FakeClient:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.size = 0
+
+    def measure(self):
+        return 0
+
+
+def test_evicted_and_invalidated_sessions_are_reported():
+    forgotten = []
+    cache = GmailClientCache(max_entries=2, on_evict=forgotten.append)
+    for session_id in ("a", "b", "c"):
+        cache.put(FakeClient(session_id))
+    cache.put(FakeClient("c"))  # replacing a client is not an eviction
+    cache.invalidate("b")
+    cache.invalidate("unknown")
+    assert forgotten == ["a", "b"]
+    assert len(cache) == 1
+
+
+def test_per_session_state_is_bounded_by_the_client_cache():
+    service = GmailOAuthService()
+    service.clients.max_entries = 2
+
+    async def scenario():
+        for index in range(5):
+            session_id = f"session-{index}"
+            await service._run_blocking(session_id, lambda: None)
+            service._activity_marked[session_id] = 0.0
+            service.clients.put(FakeClient(session_id))
+
+    asyncio.run(scenario())
+    gc.collect()
+    assert set(service._activity_marked) == {"session-3", "session-4"}
+    assert len(service._user_slots) == 0
+    service._executor.shutdown()
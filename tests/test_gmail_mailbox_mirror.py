@@ -0,0 +1,100 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import gmail_mailbox_mirror
+from gmail_mailbox_mirror import GmailMailboxMirror, in_scope, sync_scope
+
+
+class MessageStore:
+    """gmail_messages as a dict of id -> document, with the calls _incremental_sync makes"""
+
+    def __init__(self, documents):
+        self.documents = {document["id"]: dict(document) for document in documents}
+
+    def find(self, query, projection=None):
+        ids = query["id"]["$in"]
+        matches = [{"id": message_id} for message_id in ids if message_id in self.documents]
+        return SimpleNamespace(to_list=lambda length=None: asyncio.sleep(0, matches))
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            message_id = operation._filter["id"]
+            if message_id in self.documents or operation._upsert:
+                self.documents.setdefault(message_id, {"id": message_id}).update(operation._doc["$set"])
+
+    async def delete_many(self, query):
+        for message_id in query["id"]["$in"]:
+            self.documents.pop(message_id, None)
+
+
+class FakeGmail:
+    """Answers history.list with a scripted page and metadata fetches from a fixed mailbox"""
+
+    def __init__(self, history, mailbox):
+        self.history = history
+        self.mailbox = mailbox
+        self.fetched = []
+        self.service = SimpleNamespace(users=lambda: SimpleNamespace(history=lambda: SimpleNamespace(list=lambda **kwargs: history)))
+
+    async def _execute(self, session_id, request, credentials):
+        return request
+
+    async def _fetch_message_metadata(self, session_id, service, credentials, message_ids):
+        self.fetched.extend(message_ids)
+        return [self.mailbox[message_id] for message_id in message_ids]
+
+    def _format_email_metadata(self, msg):
+        return {"id": msg["id"], "labels": msg["labelIds"]}
+
+
+def relabel(message_id, labels, kind="labelsAdded"):
+    return {kind: [{"message": {"id": message_id, "labelIds": labels}}]}
+
+
+def run_sync(history, mirrored, mailbox):
+    gmail = FakeGmail({"history": history, "historyId": "200"}, mailbox)
+    mirror = GmailMailboxMirror(SimpleNamespace(gmail_messages=MessageStore(mirrored), gmail_sync_state=None), gmail)
+
+    async def save_state(*args, **kwargs):
+        pass
+
+    mirror._save_state = save_state
+    client = SimpleNamespace(service=gmail.service, credentials=None)
+    result = asyncio.run(mirror._incremental_sync("s1", client, "100"))
+    return result, mirror.messages.documents, gmail.fetched
+
+
+@pytest.fixture(autouse=True)
+def inbox_or_unread_scope(monkeypatch):
+    monkeypatch.setattr(gmail_mailbox_mirror, "MIRROR_SCOPE", sync_scope("in:inbox OR is:unread"))
+
+
+def test_in_scope():
+    assert in_scope(["UNREAD", "CATEGORY_UPDATES"])
+    assert in_scope(["INBOX"])
+    assert not in_scope(["CATEGORY_UPDATES"])
+    assert not in_scope(["INBOX", "TRASH"])
+
+
+def test_unmirrored_message_marked_unread_again_is_fetched():
+    mailbox = {"old": {"id": "old", "labelIds": ["UNREAD", "CATEGORY_UPDATES"], "internalDate": "1"}}
+    result, documents, fetched = run_sync([relabel("old", ["UNREAD", "CATEGORY_UPDATES"])], [], mailbox)
+    assert fetched == ["old"]
+    assert documents["old"]["labels"] == ["UNREAD", "CATEGORY_UPDATES"]
+    assert result["added"] == 1
+
+
+def test_mirrored_message_is_relabeled_without_a_fetch():
+    mirrored = [{"id": "m1", "labels": ["INBOX", "UNREAD"]}]
+    result, documents, fetched = run_sync([relabel("m1", ["INBOX"], "labelsRemoved")], mirrored, {})
+    assert fetched == []
+    assert documents["m1"]["labels"] == ["INBOX"]
+    assert result["relabeled"] == 1
+
+
+def test_relabel_outside_scope_is_ignored():
+    result, documents, fetched = run_sync([relabel("archived", ["STARRED"])], [], {})
+    assert fetched == [] and documents == {}
+    assert result == {"success": True, "mode": "incremental", "added": 0, "deleted": 0, "relabeled": 0}
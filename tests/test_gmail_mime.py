@@ -0,0 +1,70 @@
+import base64
+
+from gmail_mime import BodyCache, decode_text_part, is_attachment, part_charset, select_text_parts
+
+
+def encode(text: str, charset: str = "utf-8") -> str:
+    return base64.urlsafe_b64encode(text.encode(charset)).decode().rstrip("=")
+
+
+def leaf(mime_type, text="", headers=None, filename=""):
+    return {"mimeType": mime_type, "filename": filename, "headers": headers or [], "body": {"data": encode(text)}}
+
+
+def test_alternative_prefers_plain_text():
+    payload = {"mimeType": "multipart/alternative", "parts": [leaf("text/html", "<p>hi</p>"), leaf("text/plain", "hi")]}
+    assert [part["mimeType"] for part in select_text_parts(payload)] == ["text/plain"]
+
+
+def test_alternative_falls_back_to_html():
+    payload = {"mimeType": "multipart/alternative", "parts": [leaf("text/html", "<p>hi</p>")]}
+    assert [part["mimeType"] for part in select_text_parts(payload)] == ["text/html"]
+
+
+def test_mixed_keeps_inline_text_and_skips_attachments():
+    attachment = leaf("text/plain", "secret", headers=[{"name": "Content-Disposition", "value": "attachment; filename=a.txt"}])
+    payload = {"mimeType": "multipart/mixed", "parts": [
+        {"mimeType": "multipart/alternative", "parts": [leaf("text/plain", "body")]},
+        leaf("text/plain", "footer"),
+        attachment,
+        leaf("image/png", filename="logo.png")
+    ]}
+    assert is_attachment(attachment)
+    assert len(select_text_parts(payload)) == 2
+
+
+def test_charset_from_content_type():
+    part = leaf("text/plain", headers=[{"name": "content-type", "value": 'text/plain; charset="ISO-8859-1"'}])
+    assert part_charset(part) == "ISO-8859-1"
+    assert part_charset(leaf("text/plain")) == "utf-8"
+
+
+def test_decode_plain_text_in_declared_charset():
+    data = base64.urlsafe_b64encode("Café\r\nbye".encode("latin-1")).decode()
+    assert decode_text_part(data, "text/plain", "latin-1") == "Café\nbye"
+
+
+def test_decode_html_drops_scripts_and_keeps_blocks():
+    html = "<html><head><title>t</title><style>p{}</style></head><body><p>Hello   <b>there</b></p><script>x()</script><div>Bye</div></body></html>"
+    assert decode_text_part(encode(html), "text/html") == "Hello there\n\nBye"
+
+
+def test_decode_stops_at_limit():
+    assert decode_text_part(encode("x" * 500), "text/plain", limit=100) == "x" * 100
+
+
+def test_body_cache_evicts_least_recently_used():
+    cache = BodyCache(max_bytes=2500)  # room for four of these entries
+    for message_id in "abcd":
+        cache.put("s", message_id, {"body": message_id * 50})
+    assert cache.get("s", "a") is not None
+    cache.put("s", "e", {"body": "e" * 50})
+    assert cache.get("s", "b") is None
+    assert cache.get("s", "a") is not None
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_body_cache_skips_huge_messages():
+    cache = BodyCache(max_bytes=4000)
+    cache.put("s", "big", {"body": "x" * 1000})
+    assert cache.get("s", "big") is None
@@ -0,0 +1,55 @@
+from gmail_search_index import GmailSearchIndex, MailboxIndex, tokenize
+
+MESSAGES = [
+    {"id": "a", "internal_date": 1, "from": "Stripe <billing@stripe.com>", "subject": "Your invoice is ready", "labels": ["INBOX"]},
+    {"id": "b", "internal_date": 3, "from": "Mike Ross <mike@example.com>", "subject": "Q3 roadmap review", "labels": ["INBOX", "UNREAD"]},
+    {"id": "c", "internal_date": 2, "from": "Stripe <billing@stripe.com>", "subject": "Invoice overdue", "labels": ["INBOX", "UNREAD", "STARRED"]},
+    {"id": "d", "internal_date": 4, "from": "Me <me@example.com>", "subject": "Re: roadmap", "labels": ["SENT"]},
+]
+
+
+def ids(results):
+    return [message["id"] for message in results]
+
+
+def test_tokenize_lowercases_and_splits_on_punctuation():
+    assert tokenize("Mike Ross <Mike@Example.com>") == ["mike", "ross", "mike", "example", "com"]
+
+
+def test_label_operators_newest_first():
+    index = MailboxIndex(MESSAGES)
+    assert ids(index.search("is:unread", 10)) == ["b", "c"]
+    assert ids(index.search("in:inbox is:read", 10)) == ["a"]
+    assert ids(index.search("is:starred", 10)) == ["c"]
+
+
+def test_from_and_subject_terms_combine():
+    index = MailboxIndex(MESSAGES)
+    assert ids(index.search("from:stripe", 10)) == ["c", "a"]
+    assert ids(index.search("subject:invoice is:unread", 10)) == ["c"]
+    assert ids(index.search("from:mike subject:roadmap", 10)) == ["b"]
+
+
+def test_quoted_phrase_must_be_adjacent():
+    index = MailboxIndex(MESSAGES)
+    assert ids(index.search('subject:"roadmap review"', 10)) == ["b"]
+    assert index.search('subject:"review roadmap"', 10) == []
+
+
+def test_max_results_caps_the_list():
+    assert ids(MailboxIndex(MESSAGES).search("in:inbox", 2)) == ["b", "c"]
+
+
+def test_unsupported_queries_return_none():
+    index = MailboxIndex(MESSAGES)
+    for query in ["", "invoice", "to:mike", "is:unread OR is:starred", "-from:stripe", "after:2024/01/01", 'subject:"unclosed']:
+        assert index.search(query, 10) is None, query
+
+
+def test_index_cache_rebuilds_on_new_version():
+    cache = GmailSearchIndex(max_sessions=1)
+    index = cache.put("s1", MESSAGES, version=1)
+    assert cache.get("s1", 1) is index
+    assert cache.get("s1", 2) is None
+    cache.put("s2", MESSAGES, version=1)
+    assert cache.get("s1", 1) is None
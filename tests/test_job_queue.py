@@ -0,0 +1,183 @@
+import asyncio
+import copy
+from datetime import datetime, timedelta
+
+import pytest
+
+import job_queue
+from job_queue import MongoJobQueue
+
+
+def _matches(document, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(document, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(key)
+            if "$lte" in condition and (value is None or value > condition["$lte"]):
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$nin" in condition and value in condition["$nin"]:
+                return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+
+class MemoryCollection:
+    """The slice of the motor collection API MongoJobQueue uses, held in a list"""
+
+    def __init__(self):
+        self.documents = []
+
+    async def insert_one(self, document, session=None):
+        self.documents.append(copy.deepcopy(document))
+
+    async def find_one(self, query):
+        return next((copy.deepcopy(d) for d in self.documents if _matches(d, query)), None)
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=None, session=None):
+        candidates = [d for d in self.documents if _matches(d, query)]
+        for field, direction in reversed(sort or []):
+            candidates.sort(key=lambda d: d[field], reverse=direction < 0)
+        if not candidates:
+            return None
+        document = candidates[0]
+        document.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            document[field] = document.get(field, 0) + amount
+        return copy.deepcopy(document)
+
+
+class ScriptedQueue(MongoJobQueue):
+    """Jobs return whatever result their payload names"""
+
+    def __init__(self, **kwargs):
+        super().__init__(MemoryCollection(), name="test", **kwargs)
+        self.finished = []
+
+    async def process(self, job):
+        return job["payload"]["result"]
+
+    def is_transient_failure(self, result):
+        return result.get("error") == "timeout"
+
+    async def on_finished(self, job, status, result, session=None):
+        self.finished.append((job["id"], status))
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_a_queue_must_define_process():
+    with pytest.raises(TypeError):
+        MongoJobQueue(MemoryCollection())
+
+
+def test_claim_takes_each_due_job_once_oldest_first():
+    async def scenario():
+        queue = ScriptedQueue()
+        now = datetime.utcnow()
+        await queue.enqueue({}, job_id="late", next_attempt_at=now - timedelta(seconds=1))
+        await queue.enqueue({}, job_id="early", next_attempt_at=now - timedelta(seconds=10))
+        await queue.enqueue({}, job_id="future", next_attempt_at=now + timedelta(minutes=5))
+        claimed = [await queue.claim() for _ in range(3)]
+        return queue, claimed
+
+    queue, (first, second, third) = run(scenario())
+    assert (first["id"], second["id"], third) == ("early", "late", None)
+    assert first["status"] == "processing"
+    assert first["attempts"] == 1
+    assert first["worker_id"] == queue.worker_id
+    assert first["locked_until"] > datetime.utcnow()
+
+
+def test_expired_lease_is_reclaimed():
+    async def scenario():
+        queue = ScriptedQueue(visibility_timeout=60)
+        await queue.enqueue({}, job_id="job")
+        await queue.claim()
+        queue.collection.documents[0]["locked_until"] = datetime.utcnow() - timedelta(seconds=1)
+        return await queue.claim()
+
+    job = run(scenario())
+    assert job["id"] == "job"
+    assert job["attempts"] == 2
+
+
+def test_success_and_permanent_failure_finish_the_job():
+    async def scenario():
+        queue = ScriptedQueue()
+        await queue.enqueue({"result": {"success": True}}, job_id="ok")
+        await queue.enqueue({"result": {"success": False, "error": "invalid", "message": "bad payload"}}, job_id="bad")
+        await queue.drain()
+        return queue, await queue.get_job("ok"), await queue.get_job("bad")
+
+    queue, ok, bad = run(scenario())
+    assert ok["status"] == "completed" and ok["finished_at"]
+    assert bad["status"] == "failed"
+    assert bad["last_error"] == "bad payload"
+    assert sorted(queue.finished) == [("bad", "failed"), ("ok", "completed")]
+
+
+def test_transient_failure_retries_with_backoff_until_max_attempts():
+    async def scenario():
+        queue = ScriptedQueue(max_attempts=3, backoff_base=10, backoff_max=300)
+        await queue.enqueue({"result": {"success": False, "error": "timeout"}}, job_id="flaky")
+        history = []
+        for _ in range(3):
+            before = datetime.utcnow()
+            assert await queue.drain() == 1
+            job = await queue.get_job("flaky")
+            history.append((job["status"], job["attempts"], (job["next_attempt_at"] - before).total_seconds()))
+            # Make the retry due now instead of waiting out the backoff
+            queue.collection.documents[0]["next_attempt_at"] = datetime.utcnow()
+        return history
+
+    (status1, attempts1, delay1), (status2, attempts2, delay2), (status3, attempts3, _) = run(scenario())
+    assert (status1, attempts1) == ("pending", 1)
+    assert 5 <= delay1 <= 10.5
+    assert (status2, attempts2) == ("pending", 2)
+    assert 10 <= delay2 <= 20.5
+    assert (status3, attempts3) == ("failed", 3)
+
+
+def test_exception_counts_as_transient():
+    class RaisingQueue(ScriptedQueue):
+        async def process(self, job):
+            raise RuntimeError("boom")
+
+    async def scenario():
+        queue = RaisingQueue()
+        await queue.enqueue({}, job_id="job")
+        await queue.drain()
+        return await queue.get_job("job")
+
+    job = run(scenario())
+    assert job["status"] == "pending"
+    assert job["last_error"] == "boom"
+
+
+def test_deferred_job_keeps_its_attempt_budget():
+    async def scenario():
+        queue = ScriptedQueue()
+        await queue.enqueue({"result": {"defer_seconds": 30}}, job_id="job")
+        await queue.drain()
+        return await queue.get_job("job")
+
+    job = run(scenario())
+    assert job["status"] == "pending"
+    assert job["attempts"] == 0
+    assert job["next_attempt_at"] > datetime.utcnow() + timedelta(seconds=25)
+
+
+@pytest.mark.parametrize("attempts, expected", [(0, 2), (1, 2), (2, 4), (4, 16), (9, 300)])
+def test_backoff_doubles_up_to_the_cap(monkeypatch, attempts, expected):
+    queue = ScriptedQueue(backoff_base=2, backoff_max=300)
+    monkeypatch.setattr(job_queue.random, "uniform", lambda low, high: high)
+    assert queue.backoff_delay(attempts) == expected
+    monkeypatch.setattr(job_queue.random, "uniform", lambda low, high: low)
+    assert queue.backoff_delay(attempts) == expected / 2
@@ -0,0 +1,41 @@
+from resource_blocking import HEAVY_RESOURCE_TYPES, POLICIES, resolve_policy
+
+
+def test_fast_policy_blocks_heavy_types_stylesheets_and_trackers():
+    fast = POLICIES["fast"]
+    assert fast.should_block("image", "https://shop.example.com/a.png")
+    assert fast.should_block("font", "https://shop.example.com/a.woff2")
+    assert fast.should_block("stylesheet", "https://shop.example.com/a.css")
+    assert fast.should_block("script", "https://www.google-analytics.com/analytics.js")
+    assert fast.should_block("xhr", "https://stats.g.doubleclick.net/collect")
+    assert not fast.should_block("script", "https://shop.example.com/app.js")
+    assert not fast.should_block("xhr", "https://notdoubleclick.net/api")
+
+
+def test_the_scraped_page_is_never_blocked():
+    fast = POLICIES["fast"]
+    assert not fast.should_block("document", "https://www.tiktok.com/@shop")
+    assert not fast.should_block("other", "https://doubleclick.net/landing", is_navigation=True)
+
+
+def test_none_policy_blocks_nothing():
+    assert not POLICIES["none"].blocks_anything
+    assert not POLICIES["none"].should_block("image", "https://doubleclick.net/a.gif")
+
+
+def test_stylesheets_kept_when_layout_matters():
+    assert resolve_policy("fast").block_stylesheets
+    assert not resolve_policy("fast", wait_for_element="#results").block_stylesheets
+    assert not resolve_policy("fast", screenshots=True).block_stylesheets
+    assert not resolve_policy("fast", selectors={"buy": "text:button:visible"}).block_stylesheets
+    # Everything else in the policy still applies
+    assert resolve_policy("fast", wait_for_element="#results").block_types == HEAVY_RESOURCE_TYPES
+
+
+def test_custom_and_unknown_policies():
+    custom = resolve_policy({"block_types": ["media"], "block_domains": ["cdn.example.net"], "block_stylesheets": False})
+    assert custom.name == "custom"
+    assert custom.should_block("media", "https://shop.example.com/v.mp4")
+    assert not custom.should_block("image", "https://shop.example.com/a.png")
+    assert custom.should_block("script", "https://img.cdn.example.net/x.js")
+    assert resolve_policy("does-not-exist") is POLICIES["none"]
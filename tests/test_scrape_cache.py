@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+
+from automation_result import AutomationResult
+from scrape_cache import ScrapeCache, cache_key, normalize_url
+from scrape_engine import HttpScrapeMiss, ScrapeEngine, close_scrape_client, get_scrape_client
+
+
+def test_normalize_url():
+    assert normalize_url(" HTTPS://Shop.Example.COM?q=Laptop#reviews ") == "https://shop.example.com/?q=Laptop"
+    assert normalize_url("https://shop.example.com/Path/") == "https://shop.example.com/Path/"
+
+
+def test_key_ignores_selector_order_whitespace_and_fragment():
+    first = cache_key("https://shop.example.com/p#top", {"name": " h1 ", "price": ".price"})
+    second = cache_key("HTTPS://SHOP.example.com/p", {"price": ".price", "name": "h1"})
+    assert first == second
+
+
+def test_key_changes_with_selectors_and_wait_for_element():
+    base = cache_key("https://shop.example.com/p", {"name": "h1"})
+    assert cache_key("https://shop.example.com/p", {"name": "h2"}) != base
+    assert cache_key("https://shop.example.com/p", {"title": "h1"}) != base
+    assert cache_key("https://shop.example.com/p", {"name": "h1"}, wait_for_element=".ready") != base
+    assert cache_key("https://shop.example.com/p?page=2", {"name": "h1"}) != base
+
+
+def test_key_separates_engine_modes_and_tenants():
+    url, selectors = "https://shop.example.com/p", {"name": "h1"}
+    keys = {
+        cache_key(url, selectors, mode="http"),
+        cache_key(url, selectors, mode="browser"),
+        cache_key(url, selectors, mode="browser", tenant="session-a"),
+        cache_key(url, selectors, mode="browser", tenant="session-b")
+    }
+    assert len(keys) == 4
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.tenants = []
+
+    async def extract_dynamic_data(self, url, selectors, wait_for_element=None, tenant=None, resource_policy=None):
+        self.tenants.append(tenant)
+        return AutomationResult(success=True, data={"name": f"seen by {tenant}"}, message="ok", execution_time=0.0)
+
+
+def make_engine(http_data):
+    engine = ScrapeEngine(browser_service=FakeBrowser(), cache=ScrapeCache(ttl=60))
+
+    async def scrape_http(url, selectors, validators=None):
+        if http_data is None:
+            raise HttpScrapeMiss("js_rendering")
+        return dict(http_data), httpx.Response(200)
+
+    engine.scrape_http = scrape_http
+    return engine
+
+
+def test_http_results_are_shared_across_tenants():
+    engine = make_engine({"name": "Laptop"})
+
+    async def scenario():
+        first = await engine.scrape("https://shop.example.com/p", {"name": "h1"}, tenant="session-a")
+        second = await engine.scrape("https://shop.example.com/p", {"name": "h1"}, tenant="session-b")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.engine == "http" and not first.cached
+    assert second.cached and second.data == {"name": "Laptop"}
+
+
+def test_browser_results_stay_with_their_tenant():
+    engine = make_engine(None)
+
+    async def scenario():
+        first = await engine.scrape("https://shop.example.com/p", {"name": "h1"}, tenant="session-a")
+        other = await engine.scrape("https://shop.example.com/p", {"name": "h1"}, tenant="session-b")
+        again = await engine.scrape("https://shop.example.com/p", {"name": "h1"}, tenant="session-a")
+        return first, other, again
+
+    first, other, again = asyncio.run(scenario())
+    assert other.data == {"name": "seen by session-b"} and not other.cached
+    assert again.cached and again.data == first.data
+    assert engine.browser.tenants == ["session-a", "session-b"]
+
+
+def test_scrape_client_keeps_no_cookies():
+    async def scenario():
+        client = get_scrape_client()
+        response = httpx.Response(
+            200,
+            headers={"set-cookie": "session=abc; Path=/"},
+            request=httpx.Request("GET", "https://shop.example.com/p")
+        )
+        client.cookies.extract_cookies(response)
+        cookies = dict(client.cookies)
+        await close_scrape_client()
+        return cookies
+
+    assert asyncio.run(scenario()) == {}
@@ -0,0 +1,39 @@
+import pytest
+
+import scrape_crawler
+from scrape_crawler import expand_urls
+
+
+def test_pattern_expands_inclusive_range_after_explicit_urls():
+    assert expand_urls(["https://a.example/"], "https://a.example/list?page={page}", 2, 4) == [
+        "https://a.example/",
+        "https://a.example/list?page=2",
+        "https://a.example/list?page=3",
+        "https://a.example/list?page=4"
+    ]
+
+
+def test_duplicates_and_blanks_are_dropped_in_order():
+    assert expand_urls([" https://b.example ", "https://a.example", "", "https://b.example"]) == [
+        "https://b.example",
+        "https://a.example"
+    ]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"urls": ["  "]},
+    {"url_pattern": "https://a.example/list", "end_page": 3},
+    {"url_pattern": "https://a.example/{page}"},
+    {"url_pattern": "https://a.example/{page}", "start_page": 5, "end_page": 4}
+])
+def test_invalid_crawls_raise(kwargs):
+    with pytest.raises(ValueError):
+        expand_urls(**kwargs)
+
+
+def test_crawl_size_is_capped(monkeypatch):
+    monkeypatch.setattr(scrape_crawler, "SCRAPE_CRAWL_MAX_URLS", 3)
+    assert len(expand_urls(url_pattern="https://a.example/{page}", end_page=3)) == 3
+    with pytest.raises(ValueError):
+        expand_urls(url_pattern="https://a.example/{page}", end_page=4)
@@ -0,0 +1,75 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from scrape_selectors import SelectorSpec, extract_from_soup, parse_selectors
+
+HTML = """
+<html><body>
+  <h1 class="title main"> Laptops </h1>
+  <ul class="products">
+    <li><a href="/p/1" class="link primary">One</a><span class="price">$10</span></li>
+    <li><a href="/p/2">Two</a><span class="price"> </span></li>
+  </ul>
+</body></html>
+"""
+
+
+def test_parse_selector_forms():
+    specs = parse_selectors({
+        "title": "text:h1",
+        "link": "attr:href:ul a",
+        "names": "all:li a",
+        "bare": "h1.title",
+        "broken": "attr:href"
+    })
+    assert specs == [
+        SelectorSpec("title", "text", "h1"),
+        SelectorSpec("link", "attr", "ul a", attr="href"),
+        SelectorSpec("names", "all", "li a"),
+        SelectorSpec("bare", "text", "h1.title"),
+        SelectorSpec("broken", "attr", "", attr=None)
+    ]
+
+
+def test_attr_selector_keeps_colons_in_css():
+    [spec] = parse_selectors({"link": "attr:href:li:first-child a"})
+    assert (spec.attr, spec.selector) == ("href", "li:first-child a")
+
+
+def test_extract_from_soup_matches_every_kind():
+    soup = BeautifulSoup(HTML, "html.parser")
+    data, unmatched = extract_from_soup(soup, {
+        "title": "text:h1",
+        "link": "attr:href:ul a",
+        "classes": "attr:class:ul a",
+        "names": "all:li a",
+        "prices": "all:.price",
+        "missing": "text:.nope",
+        "broken": "attr:href"
+    })
+    assert data["title"] == " Laptops "
+    assert data["link"] == "/p/1"
+    assert data["classes"] == "link primary"
+    assert data["names"] == ["One", "Two"]
+    assert data["prices"] == ["$10"]
+    assert data["missing"] is None and data["broken"] is None
+    assert unmatched == ["missing"]
+
+
+def test_html_selector_returns_outer_html():
+    assert parse_selectors({"block": "html:ul"}) == [SelectorSpec("block", "html", "ul")]
+    data, unmatched = extract_from_soup(BeautifulSoup(HTML, "html.parser"), {"first": "html:li a", "none": "html:table"})
+    assert data["first"] == '<a class="link primary" href="/p/1">One</a>'
+    assert data["none"] is None
+    assert unmatched == ["none"]
+
+
+def test_empty_all_selector_is_unmatched():
+    _, unmatched = extract_from_soup(BeautifulSoup(HTML, "html.parser"), {"ratings": "all:.rating"})
+    assert unmatched == ["ratings"]
+
+
+def test_playwright_only_selector_raises():
+    with pytest.raises(ValueError):
+        extract_from_soup(BeautifulSoup(HTML, "html.parser"), {"title": "text=Laptops >> nth=0"})
+
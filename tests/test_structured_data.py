@@ -0,0 +1,74 @@
+from pathlib import Path
+
+import pytest
+
+from structured_data import extract_products, format_price, parse_price
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "benchmarks" / "fixtures"
+
+
+def fixture(name: str) -> str:
+    return (FIXTURES_DIR / f"{name}.html").read_text()
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1,299.99", 1299.99),
+    ("$ 1.299,99", 1299.99),
+    ("€139,90", 139.9),
+    ("1,299", 1299.0),
+    ("1299", 1299.0),
+    ("Rs. 1,499.00", 1499.0),
+    (249, 249.0),
+    (19.5, 19.5),
+    ("call for price", None),
+    (None, None),
+    (True, None)
+])
+def test_parse_price(value, expected):
+    assert parse_price(value) == expected
+
+
+def test_jsonld_product():
+    [product] = extract_products(fixture("product_jsonld"))
+    assert product == {
+        "name": "Aurora X2 Noise-Cancelling Headphones",
+        "price": 249.99,
+        "currency": "USD",
+        "rating": 4.6,
+        "review_count": 2310,
+        "availability": "InStock",
+        "url": "https://store.example/p/aurora-x2",
+        "image": "https://store.example/img/ax2-front.jpg",
+        "source": "json-ld"
+    }
+
+
+def test_microdata_product():
+    [product] = extract_products(fixture("product_microdata"))
+    assert product["source"] == "microdata"
+    assert (product["name"], product["price"], product["currency"]) == ("Trailblazer 2 Waterproof Hiking Boots", 139.9, "EUR")
+    assert (product["rating"], product["review_count"], product["availability"]) == (4.3, 856, "LimitedAvailability")
+
+
+def test_opengraph_product():
+    [product] = extract_products(fixture("product_opengraph"))
+    assert product["source"] == "opengraph"
+    assert (product["name"], product["price"], product["currency"]) == ("Ceramic Pour-Over Coffee Set", 1499.0, "INR")
+    assert product["rating"] is None
+
+
+def test_itemlist_listing():
+    products = extract_products(fixture("listing_itemlist"))
+    assert len(products) == 24
+    assert (products[0]["name"], products[0]["price"]) == ("Laptop Model 1", 499.99)
+    assert products[-1]["url"] == "https://shop.example/p/laptop-24"
+    assert all(product["source"] == "json-ld" for product in products)
+
+
+def test_client_rendered_page_has_no_static_data():
+    assert extract_products(fixture("product_client_rendered")) == []
+
+
+def test_format_price():
+    assert format_price(1299.5, "USD") == "$1,299.50"
+    assert format_price(None, "USD") == "n/a"
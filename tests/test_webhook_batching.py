@@ -0,0 +1,41 @@
+from webhook_handler import _split_batch_response
+
+ITEMS = [{"message_id": "m1"}, {"message_id": "m2"}]
+
+
+def test_failed_request_applies_to_every_item():
+    result = {"success": False, "error": "timeout", "message": "n8n timed out"}
+    split = _split_batch_response(result, ITEMS)
+    assert split == [result, result]
+    assert split[0] is not split[1]
+
+
+def test_list_in_request_order():
+    result = {"success": True, "status_code": 200, "data": [{"id": 1}, {"id": 2}]}
+    split = _split_batch_response(result, ITEMS)
+    assert [entry["data"] for entry in split] == [{"id": 1}, {"id": 2}]
+    assert all(entry["success"] and entry["batched"] for entry in split)
+
+
+def test_results_tagged_with_message_id_are_matched_out_of_order():
+    result = {"success": True, "status_code": 200, "data": {"results": [
+        {"message_id": "m2", "sent": True},
+        {"message_id": "m1", "success": False, "error": "bad recipient"}
+    ]}}
+    first, second = _split_batch_response(result, ITEMS)
+    assert not first["success"]
+    assert first["error"] == "item_error"
+    assert first["message"] == "bad recipient"
+    assert second["success"] and second["data"]["sent"]
+
+
+def test_missing_tagged_result_is_reported():
+    result = {"success": True, "status_code": 200, "data": [{"message_id": "m1"}]}
+    first, second = _split_batch_response(result, ITEMS)
+    assert first["success"]
+    assert second == {"success": False, "error": "missing_batch_result", "message": "n8n batch response did not include this item"}
+
+
+def test_unmatched_shape_applies_whole_response():
+    result = {"success": True, "status_code": 200, "data": {"ok": True}}
+    assert _split_batch_response(result, ITEMS) == [{**result, "batched": True}] * 2